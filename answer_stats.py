@@ -0,0 +1,204 @@
+"""
+Tracks how quickly staff answer questions while callers are on hold.
+
+The agent uses these measurements to size the hold budget in wait_for_answer:
+long enough to catch the usual answer, short enough not to hold callers for a
+full minute when nobody is responding. Latencies are kept per hour of day and
+per number of active dashboard sessions, since both change response times.
+
+Each call may run in its own process, so hold outcomes are not kept in memory
+only: wait_for_answer records them on the HOLD_ENDED events of the change
+feed, and each tenant's tracker replays and then follows that feed.
+"""
+import math
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+import change_feed
+import knowledge_manager
+import tenants
+
+# Hold budget bounds in seconds
+DEFAULT_WAIT_SECONDS = 60
+MIN_WAIT_SECONDS = 15
+MAX_WAIT_SECONDS = 120
+
+# Number of recent holds considered per window
+WINDOW_SIZE = 50
+
+# Samples needed before a window's latencies are trusted
+MIN_SAMPLES = 5
+
+# Active staff counts at or above this share one bucket
+MAX_STAFF_BUCKET = 3
+
+# Outcomes recorded on HOLD_ENDED events
+HOLD_ANSWERED = "answered"
+HOLD_TIMED_OUT = "timeout"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _staff_bucket(staff_online: int) -> int:
+    return min(staff_online, MAX_STAFF_BUCKET)
+
+
+class AnswerLatencyTracker:
+    """Rolling windows of ask-to-answer latencies; timed-out holds count as misses."""
+
+    def __init__(self, window_size: int = WINDOW_SIZE):
+        self.window_size = window_size
+        # Each entry is the latency in seconds, or None for a hold that timed out
+        self._samples: Deque[Optional[float]] = deque(maxlen=window_size)
+        self._by_hour: Dict[int, Deque[Optional[float]]] = {}
+        self._by_staff: Dict[int, Deque[Optional[float]]] = {}
+        self._lock = threading.Lock()
+        self._feed: Optional[change_feed.FeedReader] = None
+
+    def _record(self, sample: Optional[float], hour: Optional[int], staff_online: Optional[int]) -> None:
+        self._samples.append(sample)
+
+        if hour is None:
+            hour = datetime.now().hour
+        self._by_hour.setdefault(hour, deque(maxlen=self.window_size)).append(sample)
+
+        if staff_online is not None:
+            bucket = _staff_bucket(staff_online)
+            self._by_staff.setdefault(bucket, deque(maxlen=self.window_size)).append(sample)
+
+    def record_answer(self, latency_seconds: float, hour: Optional[int] = None,
+                      staff_online: Optional[int] = None) -> None:
+        """Record a question answered while the caller was holding."""
+        self._record(latency_seconds, hour, staff_online)
+
+    def record_timeout(self, hour: Optional[int] = None, staff_online: Optional[int] = None) -> None:
+        """Record a hold that ended without an answer."""
+        self._record(None, hour, staff_online)
+
+    def refresh(self, feed_file: str) -> None:
+        """
+        Add the hold outcomes recorded in a change feed since the last refresh.
+
+        The first refresh replays the feed, and its rotated predecessor, so a
+        new process starts from the holds of earlier calls.
+        """
+        with self._lock:
+            events = []
+            if self._feed is None or self._feed.path != feed_file:
+                if self._feed is not None:
+                    self._feed.close()
+                rotated = f"{feed_file}.1"
+                if os.path.exists(rotated):
+                    reader = change_feed.FeedReader(rotated, from_start=True)
+                    events = reader.poll()
+                    reader.close()
+                self._feed = change_feed.FeedReader(feed_file, from_start=True)
+            events.extend(self._feed.poll())
+
+            for event in events:
+                if event.get('event') != change_feed.HOLD_ENDED:
+                    continue
+                # Windowed by when the hold ended and how many staff were present at the time
+                hour = datetime.fromtimestamp(event.get('ts', time.time())).hour
+                staff_online = event.get('staff_online')
+                if event.get('outcome') == HOLD_ANSWERED:
+                    self.record_answer(float(event.get('latency', 0.0)), hour=hour, staff_online=staff_online)
+                elif event.get('outcome') == HOLD_TIMED_OUT:
+                    self.record_timeout(hour=hour, staff_online=staff_online)
+
+    def approx_bytes(self) -> int:
+        windows = [self._samples, *self._by_hour.values(), *self._by_staff.values()]
+        return 1024 + 60 * sum(len(samples) for samples in windows)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._feed is not None:
+                self._feed.close()
+                self._feed = None
+
+    @staticmethod
+    def _summarize(samples) -> dict:
+        answered = [s for s in samples if s is not None]
+        return {
+            'samples': len(samples),
+            'answered': len(answered),
+            'timeouts': len(samples) - len(answered),
+            'p50': percentile(answered, 50) if answered else None,
+            'p90': percentile(answered, 90) if answered else None,
+        }
+
+    def stats(self) -> dict:
+        """Summary of the overall window and the per-hour / per-staff windows."""
+        return {
+            **self._summarize(self._samples),
+            'by_hour': {hour: self._summarize(s) for hour, s in sorted(self._by_hour.items())},
+            'by_staff': {bucket: self._summarize(s) for bucket, s in sorted(self._by_staff.items())},
+        }
+
+    def _window_for(self, hour: int, staff_online: Optional[int]):
+        """Pick the most specific window that has enough samples."""
+        candidates = []
+        if staff_online is not None:
+            candidates.append(self._by_staff.get(_staff_bucket(staff_online)))
+        candidates.append(self._by_hour.get(hour))
+        candidates.append(self._samples)
+
+        for samples in candidates:
+            if samples is not None and len(samples) >= MIN_SAMPLES:
+                return samples
+        return None
+
+    def wait_budget(self, check_interval: int = 3, staff_online: Optional[int] = None,
+                    hour: Optional[int] = None) -> int:
+        """
+        Choose how long the next caller should be held.
+
+        Args:
+            check_interval: Seconds between answer checks, added as slack
+            staff_online: Number of active dashboard sessions, None if unknown
+            hour: Hour of day to use, defaults to now
+
+        Returns:
+            Hold budget in seconds; 0 means don't hold at all
+        """
+        # Nobody is at the dashboard: go straight to the callback path
+        if staff_online == 0:
+            return 0
+
+        if hour is None:
+            hour = datetime.now().hour
+
+        samples = self._window_for(hour, staff_online)
+        if samples is None:
+            return DEFAULT_WAIT_SECONDS
+
+        answered = [s for s in samples if s is not None]
+        timeout_ratio = 1 - len(answered) / len(samples)
+
+        # Staff are mostly not answering: don't keep callers waiting for nothing
+        if timeout_ratio >= 0.5 or not answered:
+            return MIN_WAIT_SECONDS
+
+        budget = percentile(answered, 90) * 1.25 + check_interval
+        return int(min(MAX_WAIT_SECONDS, max(MIN_WAIT_SECONDS, budget)))
+
+
+def get_latency_tracker() -> AnswerLatencyTracker:
+    """Tracker of the tenant being served, caught up with the holds in its change feed."""
+    tracker = tenants.tenant_cache.get('latency', AnswerLatencyTracker)
+    tracker.refresh(change_feed.feed_path(knowledge_manager.knowledge_file()))
+    return tracker
+
+
+def hold_budget(check_interval: int = 3, staff_online: Optional[int] = None) -> int:
+    """AnswerLatencyTracker.wait_budget of the tenant being served."""
+    return get_latency_tracker().wait_budget(check_interval, staff_online=staff_online)
@@ -0,0 +1,205 @@
+"""
+Suggests existing answers for a pending question.
+
+Staff often type an answer the knowledge base already holds for a
+near-identical question. This index covers answered rows of the knowledge
+base and the LEARNED_QA section of prompts.py (where answered rows end up
+after archiving). It ranks prior answers by the similarity of their
+questions to the pending one.
+
+The index is an inverted index over the same hashed n-gram features used
+for clustering, weighted by inverse document frequency. A lookup only
+touches the postings of the query's features, so it takes a few
+milliseconds even for large knowledge bases. After the first build, the
+index is kept current from the change feed. It is only rebuilt after a
+bulk import, or once enough deleted entries have piled up. Each tenant
+(salon branch) has its own index, kept in tenants.tenant_cache.
+"""
+import heapq
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import change_feed
+import knowledge_manager
+import tenants
+from question_clusters import features
+
+logger = logging.getLogger(__name__)
+
+# Suggestions scoring below this are not worth showing
+MIN_SCORE = 0.2
+
+# Entries scored exactly per lookup, after a rough pass over the postings
+CANDIDATES = 20
+
+# Postings read per lookup before the rough pass stops
+MAX_POSTINGS = 20000
+
+# Features found in more than this share of entries are skipped in the rough pass
+COMMON_FEATURE_RATIO = 0.5
+
+# Rebuild once this share of indexed entries has been removed
+REBUILD_RATIO = 0.25
+
+_QA_PAIR_RE = re.compile(r"^Q:\s*(.+?)\s*\nA:\s*(.*?)\s*$", re.MULTILINE)
+
+
+def learned_qa_pairs(prompt_file: Optional[str] = None) -> List[Tuple[str, str]]:
+    """Question/answer pairs from the LEARNED_QA section of a prompt file (the current tenant's by default)."""
+    return [(q, a) for q, a in _QA_PAIR_RE.findall(knowledge_manager.read_learned_qa(prompt_file)) if a]
+
+
+class SuggestionIndex:
+    """Inverted index from question features to previously given answers."""
+
+    def __init__(self, prompt_file: Optional[str] = None):
+        # Fixed at creation: the index belongs to the tenant being served then
+        self.prompt_file = prompt_file or knowledge_manager.learned_qa_file()
+        self._lock = threading.Lock()
+        self._feed: Optional[change_feed.FeedReader] = None
+        self._prompt_mtime = None
+        self._reset()
+
+    def _reset(self) -> None:
+        # doc id -> (question, answer, source, norm); None once removed
+        self._docs: List[Optional[Tuple[str, str, str, float]]] = []
+        self._by_question: Dict[str, int] = {}
+        self._postings: Dict[int, Dict[int, int]] = {}
+        self._removed = 0
+
+    def _add(self, question: str, answer: str, source: str) -> None:
+        key = question.lower().strip()
+        if key in self._by_question:
+            self._remove(key)
+        counts = Counter(features(question))
+        doc_id = len(self._docs)
+        self._docs.append((question, answer, source, math.sqrt(sum(c * c for c in counts.values()))))
+        self._by_question[key] = doc_id
+        for feature, count in counts.items():
+            self._postings.setdefault(feature, {})[doc_id] = count
+
+    def _remove(self, key: str) -> None:
+        doc_id = self._by_question.pop(key, None)
+        if doc_id is None:
+            return
+        question = self._docs[doc_id][0]
+        for feature in set(features(question)):
+            postings = self._postings.get(feature)
+            if postings is not None:
+                postings.pop(doc_id, None)
+        self._docs[doc_id] = None
+        self._removed += 1
+
+    def _rebuild(self) -> None:
+        self._reset()
+        for question, answer in learned_qa_pairs(self.prompt_file):
+            self._add(question, answer, 'learned')
+        for row in knowledge_manager.iter_questions('answered'):
+            if row['answer'].strip():
+                self._add(row['question'], row['answer'], 'knowledge_base')
+        logger.info(f"Built answer suggestion index with {len(self._by_question)} entries")
+
+    def _refresh(self) -> None:
+        feed_file = change_feed.feed_path(knowledge_manager.knowledge_file())
+        try:
+            prompt_mtime = os.stat(self.prompt_file).st_mtime_ns
+        except OSError:
+            prompt_mtime = None
+
+        if self._feed is None or self._feed.path != feed_file:
+            # Start following before reading, so no change is missed in between
+            if self._feed is not None:
+                self._feed.close()
+            self._feed = change_feed.FeedReader(feed_file)
+            self._prompt_mtime = prompt_mtime
+            self._rebuild()
+            return
+
+        rebuild = prompt_mtime != self._prompt_mtime
+        for event in self._feed.poll():
+            kind = event.get('event')
+            if kind in (change_feed.ANSWERED, change_feed.USED):
+                answer = event.get('answer')
+                if answer:
+                    self._add(event['question'], answer, 'knowledge_base')
+            elif kind == change_feed.DELETED:
+                self._remove(event['question'].lower().strip())
+            elif kind == change_feed.IMPORTED:
+                rebuild = True
+
+        if rebuild or self._removed > REBUILD_RATIO * max(1, len(self._docs)):
+            self._prompt_mtime = prompt_mtime
+            self._rebuild()
+
+    def approx_bytes(self) -> int:
+        with self._lock:
+            postings = sum(len(p) for p in self._postings.values())
+            text = sum(len(doc[0]) + len(doc[1]) for doc in self._docs if doc is not None)
+            return postings * 100 + len(self._docs) * 150 + text
+
+    def close(self) -> None:
+        with self._lock:
+            if self._feed is not None:
+                self._feed.close()
+                self._feed = None
+
+    def _idf(self, feature: int, live: int) -> float:
+        postings = self._postings.get(feature)
+        return math.log(1 + live / len(postings)) if postings else 0.0
+
+    def suggest(self, question: str, k: int = 3) -> List[Dict]:
+        """
+        Prior answers for questions similar to this one.
+
+        Args:
+            question: The pending question
+            k: Maximum number of suggestions
+
+        Returns:
+            Dicts with 'question', 'answer', 'source' ('knowledge_base' or 'learned')
+            and 'score' (TF-IDF cosine similarity, 0-1), best first
+        """
+        with self._lock:
+            self._refresh()
+            live = max(1, len(self._by_question))
+            query = {f: c * self._idf(f, live) for f, c in Counter(features(question)).items()}
+            query_norm = math.sqrt(sum(w * w for w in query.values()))
+            if not query_norm:
+                return []
+
+            # Rough scores from the rarest features first, stopping once enough postings
+            # are read: common features would touch most entries and barely change the ranking
+            rough: Dict[int, float] = {}
+            touched = 0
+            for feature in sorted((f for f in query if f in self._postings), key=lambda f: len(self._postings[f])):
+                postings = self._postings[feature]
+                if rough and (touched > MAX_POSTINGS or len(postings) > COMMON_FEATURE_RATIO * live):
+                    break
+                weight = query[feature]
+                for doc_id, count in postings.items():
+                    rough[doc_id] = rough.get(doc_id, 0.0) + weight * count
+                touched += len(postings)
+            candidates = heapq.nlargest(CANDIDATES, rough, key=lambda d: rough[d] / self._docs[d][3])
+
+            # Exact TF-IDF cosine for the best candidates
+            results = []
+            for doc_id in candidates:
+                q, answer, source, _ = self._docs[doc_id]
+                doc = {f: c * self._idf(f, live) for f, c in Counter(features(q)).items()}
+                doc_norm = math.sqrt(sum(w * w for w in doc.values())) or 1.0
+                score = sum(w * doc.get(f, 0.0) for f, w in query.items()) / (query_norm * doc_norm)
+                if score >= MIN_SCORE:
+                    results.append({'question': q, 'answer': answer, 'source': source, 'score': round(score, 3)})
+
+            results.sort(key=lambda r: r['score'], reverse=True)
+            return results[:k]
+
+
+def get_suggestion_index() -> SuggestionIndex:
+    """Index of the tenant being served, shared by every dashboard request for it."""
+    return tenants.tenant_cache.get('suggestions', SuggestionIndex)
@@ -0,0 +1,80 @@
+"""
+Wakes callers on hold as soon as their question is answered.
+
+wait_for_answer checks the knowledge base every ANSWER_CHECK_INTERVAL
+seconds. In between, it waits here. One task per process follows the
+knowledge base change feed and wakes every waiter whose question was just
+answered, so an answer given to a whole cluster of similar questions
+reaches all of those callers at once rather than on their next check.
+Each tenant's knowledge base has its own feed, followed only while someone
+is waiting on it.
+"""
+import asyncio
+import logging
+from typing import Dict, List, Tuple
+
+import change_feed
+import knowledge_manager
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the change feed while anyone is waiting
+POLL_INTERVAL = 0.25
+
+
+def _key(question: str) -> str:
+    return question.lower().strip()
+
+
+class AnswerWaiter:
+    """Lets coroutines sleep until their question is answered or a timeout passes."""
+
+    def __init__(self, poll_interval: float = POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        # (feed path, normalized question) -> events of the coroutines waiting on it
+        self._waiters: Dict[Tuple[str, str], List[asyncio.Event]] = {}
+        # feed path -> task following it
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def _follow(self, path: str, feed: change_feed.FeedReader) -> None:
+        try:
+            while any(feed_path == path for feed_path, _ in self._waiters):
+                # A stat() plus reading only new lines: cheap enough for the loop
+                for event in feed.poll():
+                    if event.get('event') == change_feed.ANSWERED:
+                        for waiter in self._waiters.get((path, _key(event.get('question', ''))), []):
+                            waiter.set()
+                await asyncio.sleep(self.poll_interval)
+        except Exception as e:
+            logger.error(f"Stopped following the change feed: {e}")
+        finally:
+            feed.close()
+            del self._tasks[path]
+
+    async def wait(self, question: str, timeout: float) -> bool:
+        """
+        Sleep until the question is answered or timeout seconds pass.
+
+        Returns:
+            True if an answer for the question was recorded meanwhile
+        """
+        event = asyncio.Event()
+        path = change_feed.feed_path(knowledge_manager.knowledge_file())
+        key = (path, _key(question))
+        self._waiters.setdefault(key, []).append(event)
+        if path not in self._tasks:
+            feed = change_feed.FeedReader(path)
+            self._tasks[path] = asyncio.get_running_loop().create_task(self._follow(path, feed))
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiters[key].remove(event)
+            if not self._waiters[key]:
+                del self._waiters[key]
+
+
+# One per process; waiters from every call hosted here share the feed reader
+answer_waiter = AnswerWaiter()
@@ -0,0 +1,81 @@
+"""
+Async wrappers for the knowledge functions used by the telephony agent.
+
+knowledge_manager does blocking CSV I/O. Calling it from a tool stalls the
+event loop that also drives the call's audio, so these wrappers run it on a
+single dedicated thread instead. One thread also serializes access to the
+CSV files from every call hosted in the process. The calling context is
+copied onto the thread, so each call keeps reading and writing the files of
+its own tenant (see tenants).
+"""
+import asyncio
+import contextvars
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import answer_stats
+import change_feed
+import knowledge_manager
+from callback_scheduler import enqueue_callback as _enqueue_callback
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="knowledge-io")
+
+
+async def _run(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(context.run, fn, *args, **kwargs))
+
+
+async def add_unknown_question(question: str, caller_phone: str = "unknown") -> bool:
+    return await _run(knowledge_manager.add_unknown_question, question, caller_phone)
+
+
+async def check_for_answer(question: str):
+    return await _run(knowledge_manager.check_for_answer, question)
+
+
+async def mark_question_answered(question: str, answered_on_call: bool = False, notify: bool = True) -> bool:
+    return await _run(knowledge_manager.mark_question_answered, question, answered_on_call, notify)
+
+
+async def get_knowledge_version() -> str:
+    return await _run(knowledge_manager.get_knowledge_version)
+
+
+async def load_additional_knowledge() -> str:
+    return await _run(knowledge_manager.load_additional_knowledge)
+
+
+async def get_agent_instructions() -> str:
+    return await _run(knowledge_manager.get_agent_instructions)
+
+
+async def archive_answered_questions_to_prompt(prompt_file: Optional[str] = None) -> bool:
+    return await _run(knowledge_manager.archive_answered_questions_to_prompt, prompt_file)
+
+
+async def record_hold_started(question: str, caller_phone: str, max_wait_seconds: float) -> None:
+    until = time.time() + max_wait_seconds
+    await _run(knowledge_manager.record_change, change_feed.HOLD_STARTED,
+               question=question, caller_phone=caller_phone, until=until)
+
+
+async def record_hold_ended(question: str, caller_phone: str, **outcome) -> None:
+    await _run(knowledge_manager.record_change, change_feed.HOLD_ENDED,
+               question=question, caller_phone=caller_phone, **outcome)
+
+
+async def hold_budget(check_interval: int, staff_online: Optional[int]) -> int:
+    return await _run(answer_stats.hold_budget, check_interval, staff_online)
+
+
+async def enqueue_callback(question: str, caller_phone: str) -> bool:
+    return await _run(_enqueue_callback, question, caller_phone)
+
+
+async def send_notification_for_unanswered():
+    from sms_client import send_notification_for_unanswered as _send
+    return await _run(_send)
@@ -0,0 +1,92 @@
+"""
+Benchmark bulk import and export of the knowledge base.
+
+Generates a synthetic CSV/JSONL file, imports it into an empty knowledge
+base in a temporary directory, re-imports it (every row a duplicate), then
+exports it in both formats. Prints throughput for each step and the
+process's peak resident memory after it, which stays flat as --rows grows
+apart from the set of question keys used for deduplication.
+
+Usage:
+    python benchmarks/bench_import_export.py                 # 1,000,000 rows
+    python benchmarks/bench_import_export.py --rows 100000 --json
+"""
+import argparse
+import csv
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import knowledge_manager
+
+
+def write_source(path: str, rows: int) -> None:
+    """Write a synthetic FAQ file; every 50th row is invalid and every 20th a duplicate."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        jsonl = path.endswith('.jsonl')
+        writer = csv.DictWriter(f, fieldnames=knowledge_manager.FIELDNAMES)
+        if not jsonl:
+            writer.writeheader()
+        for i in range(rows):
+            row = {
+                'question': f"  What are the opening hours of branch {i // 20 if i % 20 == 19 else i}? ",
+                'answer': f"Branch {i} is open 9am to 5pm." if i % 3 else '',
+                'answered': 'Yes' if i % 3 else '',
+                'timestamp': '2024-01-01 09:00:00',
+                'caller_phone': f"+1 (555) {i % 10000:04d}",
+                'answered_on_call': 'false',
+            }
+            if i % 50 == 49:
+                row['question'] = ''
+            if jsonl:
+                f.write(json.dumps(row) + "\n")
+            else:
+                writer.writerow(row)
+
+
+def measure(name: str, fn):
+    started = time.perf_counter()
+    report = fn()
+    elapsed = time.perf_counter() - started
+    # ru_maxrss is in KB on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return dict(report, step=name, wall_seconds=round(elapsed, 3), peak_rss_mb=round(peak_mb, 1))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows in the generated source file")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv", help="Source file format")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, f"source.{args.format}")
+        knowledge_manager.KNOWLEDGE_FILE = os.path.join(tmp, "knowledge_base.csv")
+        write_source(source, args.rows)
+
+        results = [
+            measure("import", lambda: knowledge_manager.import_knowledge(source)),
+            measure("reimport", lambda: knowledge_manager.import_knowledge(source)),
+            measure("export_csv", lambda: knowledge_manager.export_knowledge(os.path.join(tmp, "out.csv"))),
+            measure("export_jsonl", lambda: knowledge_manager.export_knowledge(os.path.join(tmp, "out.jsonl"))),
+        ]
+
+    if args.json:
+        print(json.dumps({'rows': args.rows, 'format': args.format, 'results': results}, indent=2))
+        return 0
+
+    print(f"\n{args.rows:,} source rows ({args.format})")
+    print(f"{'step':<14} {'rows/sec':>10} {'seconds':>9} {'peak RSS MB':>12}  details")
+    for r in results:
+        details = {k: v for k, v in r.items() if k not in ('step', 'seconds', 'rows_per_sec', 'wall_seconds', 'peak_rss_mb')}
+        print(f"{r['step']:<14} {r['rows_per_sec']:>10,} {r['wall_seconds']:>9} {r['peak_rss_mb']:>12}  {details}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""
+Helpers shared by the benchmark scripts.
+"""
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentiles(values: List[float], points=(0.5, 0.95)) -> Dict:
+    """Count, requested percentiles (as p50, p95, ...) and max of values."""
+    if not values:
+        return {'count': 0}
+    values = sorted(values)
+    result = {'count': len(values)}
+    for p in points:
+        value = statistics.median(values) if p == 0.5 else values[min(len(values) - 1, int(p * len(values)))]
+        result[f"p{round(p * 100)}"] = round(value, 3)
+    result['max'] = round(values[-1], 3)
+    return result
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def start_web_ui(workdir: str, port: int, workers: int = 1) -> subprocess.Popen:
+    """Run the dashboard under uvicorn in its own process, with workdir as its working directory."""
+    # No retention sweeps: they would expire the seeded questions the checks count on
+    env = dict(os.environ, PYTHONPATH=ROOT, RETENTION_IN_WEB_UI="0")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "web_ui:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=workdir, env=env
+    )
+    url = f"http://127.0.0.1:{port}/api/presence"
+    async with aiohttp.ClientSession() as http:
+        for _ in range(100):
+            try:
+                async with http.get(url) as response:
+                    if response.status == 200:
+                        return process
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("web UI did not start")
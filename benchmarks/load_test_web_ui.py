@@ -0,0 +1,254 @@
+"""
+Load test for the staff dashboard (web_ui.py).
+
+Starts the dashboard under uvicorn against a scratch knowledge base, then
+runs concurrent virtual dashboard users replaying a traffic mix of
+/api/stats, /api/unanswered, /api/answered, /api/answer and /api/delete.
+Meanwhile, this process adds new questions the way the agent does. That
+write happens in a different process from the dashboard, as in production.
+
+Afterwards the CSV is checked against every write that succeeded. Missing
+questions, lost answers, resurrected deletions, duplicates or malformed
+rows are reported as integrity failures, and the exit code is 1.
+
+Usage:
+    python benchmarks/load_test_web_ui.py --users 20 --duration 30
+    python benchmarks/load_test_web_ui.py --rows 10000 --mix stats=50,unanswered=50 --json
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import aiohttp
+
+from common import ROOT, free_port, percentiles, start_web_ui
+
+sys.path.insert(0, ROOT)
+import knowledge_manager
+import rate_limit
+
+# The agent traffic below all comes from one number; the limiter is not under test
+rate_limit.ENABLED = False
+
+DEFAULT_MIX = "stats=30,unanswered=30,answered=20,answer=15,delete=5"
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for item in value.split(','):
+        name, weight = item.split('=')
+        mix[name.strip()] = int(weight)
+    return mix
+
+
+def seed_knowledge_base(path: str, rows: int):
+    """
+    Write a knowledge base with `rows` questions.
+
+    Returns:
+        (questions left unanswered, questions reserved for deletion)
+    """
+    unanswered, deletable = [], []
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(knowledge_manager.FIELDNAMES)
+        for i in range(rows):
+            question = f"Seeded question {i}?"
+            if i % 2 == 0:
+                writer.writerow([question, f"Seeded answer {i}.", 'yes', '2024-01-01 09:00:00', '+15550000000', 'true'])
+                continue
+            writer.writerow([question, '', 'no', '2024-01-01 09:00:00', '+15550000000', 'false'])
+            (deletable if i % 10 == 1 else unanswered).append(question)
+    return unanswered, deletable
+
+
+class LoadTest:
+    def __init__(self, base_url: str, mix: Dict[str, int], unanswered: List[str], deletable: List[str], rng: random.Random):
+        self.base_url = base_url
+        self.mix = mix
+        self.rng = rng
+        # Each write targets its own question, so expectations never conflict
+        self.to_answer = unanswered
+        self.to_delete = deletable
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.answered: Dict[str, str] = {}
+        self.deleted: List[str] = []
+        self.added: List[str] = []
+
+    async def _request(self, http: aiohttp.ClientSession, endpoint: str) -> None:
+        if endpoint == 'answer':
+            if not self.to_answer:
+                return
+            question = self.to_answer.pop()
+            answer = f"Load test answer to {question}"
+            method, path, body = 'POST', '/api/answer', {'question': question, 'answer': answer}
+        elif endpoint == 'delete':
+            if not self.to_delete:
+                return
+            question = self.to_delete.pop()
+            method, path, body = 'POST', '/api/delete', {'question': question}
+        else:
+            method, path, body = 'GET', f"/api/{endpoint}", None
+
+        started = time.perf_counter()
+        try:
+            async with http.request(method, f"{self.base_url}{path}", json=body) as response:
+                await response.read()
+                ok = response.status == 200
+        except aiohttp.ClientError:
+            ok = False
+        self.latencies[endpoint].append(time.perf_counter() - started)
+
+        if not ok:
+            self.errors[endpoint] += 1
+        elif endpoint == 'answer':
+            self.answered[question] = answer
+        elif endpoint == 'delete':
+            self.deleted.append(question)
+
+    async def user(self, http: aiohttp.ClientSession, deadline: float, think_time: float) -> None:
+        endpoints, weights = list(self.mix), list(self.mix.values())
+        while time.monotonic() < deadline:
+            await self._request(http, self.rng.choices(endpoints, weights)[0])
+            if think_time:
+                await asyncio.sleep(self.rng.uniform(0, 2 * think_time))
+
+    async def agent_writes(self, deadline: float, rate: float) -> None:
+        """Add new questions from this process, like calls arriving at the agent."""
+        i = 0
+        while rate and time.monotonic() < deadline:
+            question = f"New caller question {i}?"
+            if await asyncio.to_thread(knowledge_manager.add_unknown_question, question, "+15551234567"):
+                self.added.append(question)
+            i += 1
+            await asyncio.sleep(1 / rate)
+
+
+def check_integrity(test: LoadTest, seeded_rows: int) -> Dict:
+    """Compare the CSV with every write that was acknowledged."""
+    rows, malformed = {}, 0
+    duplicates = 0
+    with open(knowledge_manager.KNOWLEDGE_FILE, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for fields in reader:
+            if len(fields) != len(knowledge_manager.FIELDNAMES):
+                malformed += 1
+                continue
+            row = dict(zip(knowledge_manager.FIELDNAMES, fields))
+            if row['question'] in rows:
+                duplicates += 1
+            rows[row['question']] = row
+
+    lost_answers = [q for q, a in test.answered.items() if rows.get(q, {}).get('answer') != a]
+    resurrected = [q for q in test.deleted if q in rows]
+    lost_questions = [q for q in test.added if q not in rows]
+    expected_rows = seeded_rows + len(test.added) - len(test.deleted)
+
+    return {
+        'rows': len(rows),
+        'expected_rows': expected_rows,
+        'malformed_rows': malformed,
+        'duplicate_rows': duplicates,
+        'lost_answers': len(lost_answers),
+        'resurrected_deletes': len(resurrected),
+        'lost_questions': len(lost_questions),
+        'examples': (lost_answers + resurrected + lost_questions)[:5],
+        'ok': not (malformed or duplicates or lost_answers or resurrected or lost_questions)
+              and len(rows) == expected_rows,
+    }
+
+
+async def run(args) -> Dict:
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="frontdesk-load-")
+    os.chdir(workdir)
+    unanswered, deletable = seed_knowledge_base(knowledge_manager.KNOWLEDGE_FILE, args.rows)
+
+    port = free_port()
+    web_ui = await start_web_ui(workdir, port, workers=args.workers)
+    test = LoadTest(f"http://127.0.0.1:{port}", parse_mix(args.mix), unanswered, deletable, rng)
+
+    connector = aiohttp.TCPConnector(limit=args.users)
+    started = time.monotonic()
+    deadline = started + args.duration
+    try:
+        async with aiohttp.ClientSession(connector=connector) as http:
+            await asyncio.gather(
+                test.agent_writes(deadline, args.agent_writes),
+                *(test.user(http, deadline, args.think_time) for _ in range(args.users))
+            )
+    finally:
+        elapsed = time.monotonic() - started
+        web_ui.terminate()
+        web_ui.wait()
+
+    endpoints = {}
+    for endpoint, latencies in sorted(test.latencies.items()):
+        stats = percentiles([l * 1000 for l in latencies], points=(0.5, 0.95, 0.99))
+        stats['rps'] = round(len(latencies) / elapsed, 1)
+        stats['errors'] = test.errors[endpoint]
+        endpoints[endpoint] = stats
+
+    total = sum(len(l) for l in test.latencies.values())
+    return {
+        'config': vars(args),
+        'workdir': workdir,
+        'seconds': round(elapsed, 2),
+        'requests': total,
+        'rps': round(total / elapsed, 1),
+        'all_ms': percentiles([l * 1000 for ls in test.latencies.values() for l in ls], points=(0.5, 0.95, 0.99)),
+        'endpoints_ms': endpoints,
+        'agent_questions_added': len(test.added),
+        'integrity': check_integrity(test, args.rows),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="Concurrent dashboard users")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run")
+    parser.add_argument("--rows", type=int, default=1000, help="Questions in the seeded knowledge base")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Traffic mix as endpoint=weight pairs")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean seconds between a user's requests")
+    parser.add_argument("--agent-writes", type=float, default=2.0, help="New questions per second from the agent side")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    integrity = report['integrity']
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"\n{report['requests']} requests in {report['seconds']}s ({report['rps']} req/s), {args.users} users")
+        print(f"{'endpoint':<12} {'count':>7} {'rps':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for endpoint, s in list(report['endpoints_ms'].items()) + [('all', dict(report['all_ms'], rps=report['rps'], errors=''))]:
+            if not s['count']:
+                continue
+            print(f"{endpoint:<12} {s['count']:>7} {s['rps']:>7} {s['p50']:>9} {s['p95']:>9} {s['p99']:>9} {s['errors']:>7}")
+        print(f"\nIntegrity of knowledge_base.csv: {'OK' if integrity['ok'] else 'FAILED'}")
+        print(f"  rows {integrity['rows']} (expected {integrity['expected_rows']}), "
+              f"malformed {integrity['malformed_rows']}, duplicates {integrity['duplicate_rows']}")
+        print(f"  lost answers {integrity['lost_answers']}, resurrected deletes {integrity['resurrected_deletes']}, "
+              f"lost agent questions {integrity['lost_questions']} of {report['agent_questions_added']}")
+        if integrity['examples']:
+            print(f"  e.g. {integrity['examples']}")
+        print(f"  scratch directory: {report['workdir']}")
+
+    return 0 if integrity['ok'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""
+Benchmarks for the knowledge layer's hot paths.
+
+For each knowledge base size, a synthetic CSV is generated in a temporary
+directory (half the questions answered) and every operation is timed
+against it. Results are written as JSON so runs can be compared; with
+--compare, any operation slower than the baseline by more than the
+threshold is flagged and the exit code is 1.
+
+Usage:
+    python benchmarks/run_benchmarks.py                            # 1k, 10k, 100k rows
+    python benchmarks/run_benchmarks.py --sizes 1000,10000,100000,1000000
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/baseline.json
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import knowledge_manager
+import rate_limit
+
+# These measure the knowledge base, not the rate limiter
+rate_limit.ENABLED = False
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# Each operation is repeated until it has run this long (or MAX_RUNS times)
+MIN_SECONDS = 1.0
+MAX_RUNS = 20
+
+# Slowdown versus the baseline that counts as a regression
+DEFAULT_THRESHOLD = 0.20
+
+
+def make_knowledge_base(path: str, rows: int) -> None:
+    """Write a knowledge base with `rows` questions; even rows are answered."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(knowledge_manager.FIELDNAMES)
+        for i in range(rows):
+            answered = i % 2 == 0
+            writer.writerow([
+                f"What is the policy for request number {i}?",
+                f"Policy {i} applies on weekdays." if answered else '',
+                'yes' if answered else 'no',
+                '2024-01-01 09:00:00',
+                f"+1555{i % 10000000:07d}",
+                'false',
+            ])
+
+
+def question(rows: int, answered: bool) -> str:
+    """A question near the end of the file, so lookups scan nearly every row."""
+    i = rows - 2 if answered else rows - 1
+    return f"What is the policy for request number {i}?"
+
+
+def time_runs(fn, setup=None):
+    """Run fn repeatedly (with untimed setup before each run); return durations in seconds."""
+    durations = []
+    started = time.perf_counter()
+    while len(durations) < MAX_RUNS and (not durations or time.perf_counter() - started < MIN_SECONDS):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - t0)
+    return durations
+
+
+def bench_size(rows: int, workdir: str):
+    """Time every operation against a knowledge base of `rows` questions."""
+    kb = os.path.join(workdir, "knowledge_base.csv")
+    pristine = os.path.join(workdir, "pristine.csv")
+    prompt_file = os.path.join(workdir, "prompts.py")
+    make_knowledge_base(pristine, rows)
+    knowledge_manager.KNOWLEDGE_FILE = kb
+
+    def reset():
+        shutil.copyfile(pristine, kb)
+
+    def reset_archive():
+        reset()
+        shutil.copyfile(os.path.join(ROOT, "prompts.py"), prompt_file)
+
+    counter = iter(range(10**9))
+    answered_q = question(rows, answered=True)
+    unanswered_q = question(rows, answered=False)
+
+    operations = {
+        'add_unknown_question': (lambda: knowledge_manager.add_unknown_question(f"Brand new question {next(counter)}?", "+15550000000"), reset),
+        'question_exists': (lambda: knowledge_manager.question_exists(unanswered_q), None),
+        'check_for_answer': (lambda: knowledge_manager.check_for_answer(answered_q), None),
+        'mark_question_answered': (lambda: knowledge_manager.mark_question_answered(answered_q, notify=False), reset),
+        'get_answered_questions': (knowledge_manager.get_answered_questions, None),
+        'load_additional_knowledge': (knowledge_manager.load_additional_knowledge, None),
+        'archive_answered_questions_to_prompt': (lambda: knowledge_manager.archive_answered_questions_to_prompt(prompt_file), reset_archive),
+    }
+
+    results = {}
+    reset()
+    for name, (fn, setup) in operations.items():
+        # The archive step prints every question it moves
+        with contextlib.redirect_stdout(io.StringIO()):
+            durations = time_runs(fn, setup)
+        results[name] = {
+            'runs': len(durations),
+            'median_ms': round(statistics.median(durations) * 1000, 3),
+            'min_ms': round(min(durations) * 1000, 3),
+            'max_ms': round(max(durations) * 1000, 3),
+        }
+        print(f"  {name:<38} {results[name]['median_ms']:>10.2f} ms  ({len(durations)} runs)")
+    return results
+
+
+def compare(results, baseline, threshold: float):
+    """List operations whose median got slower than baseline by more than threshold."""
+    regressions = []
+    for size, operations in results['sizes'].items():
+        for name, current in operations.items():
+            previous = baseline.get('sizes', {}).get(size, {}).get(name)
+            if not previous or not previous['median_ms']:
+                continue
+            change = current['median_ms'] / previous['median_ms'] - 1
+            if change > threshold:
+                regressions.append(
+                    f"{name} @ {size} rows: {previous['median_ms']:.2f} -> {current['median_ms']:.2f} ms (+{change:.0%})"
+                )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma-separated knowledge base sizes")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="Baseline results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown, e.g. 0.2 for 20%%")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    results = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'sizes': {},
+    }
+
+    for rows in sizes:
+        print(f"\n{rows:,} rows")
+        with tempfile.TemporaryDirectory() as workdir:
+            # The change feed is written next to the knowledge base, inside workdir
+            results['sizes'][str(rows)] = bench_size(rows, workdir)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions over {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print(f"\nNo regressions over {args.threshold:.0%} against {args.compare}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+"""
+Synthetic call load without live telephony.
+
+Runs N fake calls through telephony_agent.wait_for_answer (the same code a
+real call's hold tool runs) against a scratch knowledge base, while
+simulated staff answer questions through the web UI's /api/answer. The web
+UI runs as a separate process, as in production, so the two processes
+contend for the same CSV.
+
+SMS sending is disabled for the run; every other code path is the real one.
+
+Reports hold times, the lag between a staff answer and the caller hearing
+it, file contention errors, lost writes and throughput.
+
+Usage:
+    python benchmarks/simulate_calls.py --calls 50 --concurrency 10 --staff 2 --staff-latency 5
+    python benchmarks/simulate_calls.py --calls 200 --concurrency 40 --check-interval 0.5 --json
+"""
+import argparse
+import asyncio
+import contextlib
+import csv
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import aiohttp
+
+from common import ROOT, free_port, percentiles, start_web_ui
+
+sys.path.insert(0, ROOT)
+import async_knowledge
+import knowledge_manager
+import telephony_agent
+from prompts import CALLBACK_MESSAGE, FOLLOW_UP_MESSAGE, RATE_LIMITED_MESSAGE
+import rate_limit
+
+# Every simulated call adds questions far faster than a real caller; the limiter is not under test
+rate_limit.ENABLED = False
+
+# Answered questions seeded into the knowledge base before the run
+KNOWN_QUESTIONS = [
+    ("What are your opening hours?", "We're open 9am to 6pm, Monday to Saturday."),
+    ("Do you take walk-ins?", "Yes, walk-ins are welcome when a stylist is free."),
+    ("Where can I park?", "There's free parking behind the salon."),
+    ("Do you sell gift cards?", "Yes, in any amount at the front desk."),
+]
+
+# Unknown questions that several callers ask
+SHARED_QUESTIONS = [
+    "Do you do bridal packages?",
+    "Can I bring my dog?",
+    "Do you offer student discounts?",
+    "Is there a cancellation fee?",
+    "Do you use vegan products?",
+]
+
+
+class ErrorCounter:
+    """stdout replacement counting the errors knowledge_manager prints instead of raising."""
+
+    def __init__(self):
+        self.errors = 0
+        self.samples: List[str] = []
+
+    def write(self, text: str) -> int:
+        for line in text.splitlines():
+            if line.startswith("Error"):
+                self.errors += 1
+                if len(self.samples) < 5:
+                    self.samples.append(line)
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+class StaffResponder:
+    """Staff members answering questions from the dashboard."""
+
+    def __init__(self, base_url: str, staff: int, latency: float, miss_rate: float, rng: random.Random):
+        """
+        Args:
+            base_url: Dashboard URL
+            staff: Number of staff members answering in parallel
+            latency: Mean seconds a staff member takes to type an answer
+            miss_rate: Fraction of questions nobody answers
+            rng: Random source, for repeatable runs
+        """
+        self.base_url = base_url
+        self.staff = staff
+        self.latency = latency
+        self.miss_rate = miss_rate
+        self.rng = rng
+        self.claimed = set()
+        self.answered_at: Dict[str, float] = {}
+        self.answers: Dict[str, str] = {}
+        self.http_errors = 0
+
+    async def _heartbeat(self, http: aiohttp.ClientSession, session_id: str) -> None:
+        while True:
+            try:
+                await http.post(f"{self.base_url}/api/heartbeat", json={'session_id': session_id})
+            except aiohttp.ClientError:
+                self.http_errors += 1
+            await asyncio.sleep(5)
+
+    async def _work(self, http: aiohttp.ClientSession) -> None:
+        while True:
+            try:
+                async with http.get(f"{self.base_url}/api/unanswered") as response:
+                    waiting = await response.json() if response.status == 200 else []
+            except aiohttp.ClientError:
+                self.http_errors += 1
+                waiting = []
+
+            question = next((q['question'] for q in waiting if q['question'] not in self.claimed), None)
+            if question is None:
+                await asyncio.sleep(0.2)
+                continue
+
+            self.claimed.add(question)
+            await asyncio.sleep(self.rng.uniform(0.5, 1.5) * self.latency)
+            if self.rng.random() < self.miss_rate:
+                continue
+
+            answer = f"Answer to: {question}"
+            try:
+                async with http.post(f"{self.base_url}/api/answer", json={'question': question, 'answer': answer}) as response:
+                    if response.status == 200:
+                        self.answered_at[question] = time.monotonic()
+                        self.answers[question] = answer
+                    else:
+                        self.http_errors += 1
+            except aiohttp.ClientError:
+                self.http_errors += 1
+
+    async def run(self) -> None:
+        async with aiohttp.ClientSession() as http:
+            tasks = []
+            for i in range(self.staff):
+                tasks.append(asyncio.create_task(self._heartbeat(http, f"sim-staff-{i}")))
+                tasks.append(asyncio.create_task(self._work(http)))
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+
+def pick_question(i: int, rng: random.Random, known_ratio: float, shared_ratio: float) -> str:
+    r = rng.random()
+    if r < known_ratio:
+        return rng.choice(KNOWN_QUESTIONS)[0]
+    if r < known_ratio + shared_ratio:
+        return rng.choice(SHARED_QUESTIONS)
+    return f"Caller {i} asks: can you do appointment type {rng.randint(1, 10**6)}?"
+
+
+async def simulate(args) -> Dict:
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="frontdesk-sim-")
+    os.chdir(workdir)
+
+    with open(knowledge_manager.KNOWLEDGE_FILE, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(knowledge_manager.FIELDNAMES)
+        for question, answer in KNOWN_QUESTIONS:
+            writer.writerow([question, answer, 'yes', '2024-01-01 09:00:00', 'unknown', 'true'])
+
+    # Never text anyone from a simulation
+    sms_suppressed = {'count': 0}
+
+    def no_sms(*_args, **_kwargs):
+        sms_suppressed['count'] += 1
+        return True
+
+    async def no_notifications():
+        return None
+
+    knowledge_manager.send_sms = no_sms
+    async_knowledge.send_notification_for_unanswered = no_notifications
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    telephony_agent.WEB_UI_URL = base_url
+    telephony_agent.ANSWER_CHECK_INTERVAL = args.check_interval
+    web_ui = await start_web_ui(workdir, port)
+
+    staff = StaffResponder(base_url, args.staff, args.staff_latency, args.miss_rate, rng)
+    staff_task = asyncio.create_task(staff.run())
+    # Let the first heartbeats land so callers see staff online
+    await asyncio.sleep(0.5)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+    calls = []
+
+    async def call(i: int) -> None:
+        async with semaphore:
+            question = pick_question(i, rng, args.known_ratio, args.shared_ratio)
+            started = time.monotonic()
+            result = await telephony_agent.wait_for_answer(
+                question,
+                caller_phone=f"+1555{i:07d}",
+                max_wait_seconds=args.max_wait
+            )
+            ended = time.monotonic()
+            calls.append({'question': question, 'result': result, 'started': started, 'ended': ended})
+
+    errors = ErrorCounter()
+    run_started = time.monotonic()
+    try:
+        with contextlib.redirect_stdout(errors):
+            await asyncio.gather(*(call(i) for i in range(args.calls)))
+    finally:
+        run_seconds = time.monotonic() - run_started
+        staff_task.cancel()
+        web_ui.terminate()
+        web_ui.wait()
+
+    known = {question for question, _ in KNOWN_QUESTIONS}
+    answered = [c for c in calls if c['result'] not in (CALLBACK_MESSAGE, FOLLOW_UP_MESSAGE, RATE_LIMITED_MESSAGE)]
+    detection_lag = [
+        c['ended'] - staff.answered_at[c['question']]
+        for c in answered if c['question'] in staff.answered_at and c['ended'] >= staff.answered_at[c['question']]
+    ]
+
+    # Writes lost to concurrent rewrites of the CSV
+    rows = {row['question']: row for row in knowledge_manager.iter_questions()}
+    lost_questions = sorted({c['question'] for c in calls} - set(rows))
+    lost_answers = sorted(q for q, a in staff.answers.items() if rows.get(q, {}).get('answer') != a)
+
+    return {
+        'config': vars(args),
+        'workdir': workdir,
+        'calls': len(calls),
+        'run_seconds': round(run_seconds, 2),
+        'calls_per_minute': round(len(calls) / run_seconds * 60, 1) if run_seconds else 0,
+        'answered_on_hold': len(answered),
+        'answered_from_kb': sum(1 for c in answered if c['question'] in known),
+        'callbacks': sum(1 for c in calls if c['result'] == CALLBACK_MESSAGE),
+        'follow_ups': sum(1 for c in calls if c['result'] == FOLLOW_UP_MESSAGE),
+        'rate_limited': sum(1 for c in calls if c['result'] == RATE_LIMITED_MESSAGE),
+        'hold_seconds': percentiles([c['ended'] - c['started'] for c in calls]),
+        'hold_seconds_unknown': percentiles([c['ended'] - c['started'] for c in calls if c['question'] not in known]),
+        'answer_detection_lag': percentiles(detection_lag),
+        'staff_answers': len(staff.answers),
+        'staff_http_errors': staff.http_errors,
+        'file_errors': errors.errors,
+        'file_error_samples': errors.samples,
+        'lost_questions': len(lost_questions),
+        'lost_answers': len(lost_answers),
+        'sms_suppressed': sms_suppressed['count'],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50, help="Calls to simulate")
+    parser.add_argument("--concurrency", type=int, default=10, help="Calls on hold at once")
+    parser.add_argument("--staff", type=int, default=2, help="Staff members answering")
+    parser.add_argument("--staff-latency", type=float, default=5.0, help="Mean seconds staff take to answer")
+    parser.add_argument("--miss-rate", type=float, default=0.1, help="Fraction of questions nobody answers")
+    parser.add_argument("--known-ratio", type=float, default=0.3, help="Fraction of questions already in the knowledge base")
+    parser.add_argument("--shared-ratio", type=float, default=0.2, help="Fraction of questions several callers ask")
+    parser.add_argument("--check-interval", type=float, default=telephony_agent.ANSWER_CHECK_INTERVAL,
+                        help="Seconds between answer checks during a hold")
+    parser.add_argument("--max-wait", type=int, help="Hold budget in seconds (default: adaptive)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Show agent logs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+    report = asyncio.run(simulate(args))
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+
+    print(f"\n{report['calls']} calls in {report['run_seconds']}s ({report['calls_per_minute']} calls/min)")
+    print(f"  answered on hold:     {report['answered_on_hold']} ({report['answered_from_kb']} straight from the knowledge base)")
+    print(f"  callbacks:            {report['callbacks']}")
+    print(f"  errors (follow-up):   {report['follow_ups']}")
+    print(f"  rate limited:         {report['rate_limited']}")
+    print(f"  hold seconds:         {report['hold_seconds']}")
+    print(f"  hold (unknown q):     {report['hold_seconds_unknown']}")
+    print(f"  answer detection lag: {report['answer_detection_lag']}")
+    print(f"  staff answers:        {report['staff_answers']} ({report['staff_http_errors']} HTTP errors)")
+    print(f"  file errors:          {report['file_errors']} {report['file_error_samples'] or ''}")
+    print(f"  lost writes:          {report['lost_questions']} questions, {report['lost_answers']} answers")
+    print(f"  scratch directory:    {report['workdir']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""
+Per-call state shared by the agent's function tools.
+
+One CallSession is created for every call and handed to the AgentSession as
+userdata, so tools read the caller's details from RunContext instead of
+closures built per call. Slots keep each instance small and its memory bounded
+when one worker process hosts many concurrent calls.
+"""
+import json
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Questions a single call can have waiting on staff at once
+MAX_PENDING_QUESTIONS = 10
+
+
+class CallSession:
+    """State of one phone call."""
+
+    __slots__ = (
+        'call_id',
+        'room_name',
+        'caller_phone',
+        'metadata',
+        'started_at',
+        'timings',
+        'pending_questions',
+        'kb_version',
+        'tts_cache',
+        'holds',
+        'hold_seconds',
+        'answered_on_hold',
+        'cached_replies',
+        'tenant',
+    )
+
+    def __init__(self, call_id: str, room_name: str, caller_phone: str = "unknown",
+                 metadata: Optional[Dict] = None):
+        self.call_id = call_id
+        self.room_name = room_name
+        self.caller_phone = caller_phone
+        self.metadata = metadata or {}
+        self.started_at = time.monotonic()
+        # Seconds since the call started at which each milestone happened
+        self.timings: Dict[str, float] = {}
+        self.pending_questions: Deque[str] = deque(maxlen=MAX_PENDING_QUESTIONS)
+        self.kb_version: Optional[str] = None
+        self.tts_cache = None
+        self.holds = 0
+        self.hold_seconds = 0.0
+        self.answered_on_hold = 0
+        self.cached_replies = 0
+        # Salon branch this call is for; set once the callee's number is known
+        self.tenant = None
+
+    @classmethod
+    def from_job(cls, ctx) -> "CallSession":
+        """Build a session for a job whose room is connected, reading caller_phone from room metadata."""
+        room = ctx.room
+        metadata = {}
+        if room.metadata:
+            try:
+                metadata = json.loads(room.metadata)
+            except (TypeError, ValueError) as e:
+                logger.error(f"Error reading room metadata: {e}")
+            if not isinstance(metadata, dict):
+                logger.error(f"Ignoring room metadata that is not a JSON object: {room.metadata[:100]}")
+                metadata = {}
+        else:
+            logger.warning("No room metadata found, using 'unknown' for caller phone")
+
+        return cls(
+            call_id=ctx.job.id,
+            room_name=room.name,
+            caller_phone=metadata.get('caller_phone', 'unknown'),
+            metadata=metadata
+        )
+
+    def mark(self, milestone: str) -> None:
+        """Record when a milestone (connected, greeted, ...) was reached; first time wins."""
+        self.timings.setdefault(milestone, round(time.monotonic() - self.started_at, 3))
+
+    def start_hold(self, question: str) -> None:
+        self.pending_questions.append(question)
+        self.holds += 1
+
+    def end_hold(self, question: str, held_seconds: float, answered: bool) -> None:
+        try:
+            self.pending_questions.remove(question)
+        except ValueError:
+            pass
+        self.hold_seconds += held_seconds
+        if answered:
+            self.answered_on_hold += 1
+
+    @property
+    def callback(self) -> Optional[Dict[str, str]]:
+        """Question and answer to deliver when this is a callback call."""
+        if self.metadata.get('callback_question') and self.metadata.get('callback_answer'):
+            return {
+                'question': self.metadata['callback_question'],
+                'answer': self.metadata['callback_answer'],
+            }
+        return None
+
+    def summary(self) -> Dict:
+        """Per-call metrics, logged when the call ends."""
+        return {
+            'call_id': self.call_id,
+            'room': self.room_name,
+            'tenant': self.tenant.id if self.tenant else None,
+            'caller_phone': self.caller_phone,
+            'duration_seconds': round(time.monotonic() - self.started_at, 3),
+            'timings': self.timings,
+            'holds': self.holds,
+            'hold_seconds': round(self.hold_seconds, 3),
+            'answered_on_hold': self.answered_on_hold,
+            'cached_replies': self.cached_replies,
+            'pending_questions': list(self.pending_questions),
+            'kb_version': self.kb_version,
+        }
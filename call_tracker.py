@@ -0,0 +1,173 @@
+"""
+Event-based call state tracking.
+
+Call state transitions (ringing, answered, agent joined, disconnected) are
+recorded as they happen - from LiveKit webhooks received on a local endpoint,
+or from the SIP API itself - and exposed as awaitables with timestamps, so
+callers never poll list_participants to find out what a call is doing.
+"""
+import asyncio
+import logging
+import os
+import time
+from enum import Enum
+from typing import Dict, List, Optional
+
+from aiohttp import web
+from livekit import api
+
+logger = logging.getLogger(__name__)
+
+# Local endpoint LiveKit webhooks are delivered to
+WEBHOOK_HOST = os.getenv("CALL_WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("CALL_WEBHOOK_PORT", "8089"))
+WEBHOOK_PATH = "/livekit/webhook"
+
+
+class CallEvent(str, Enum):
+    DIALING = "dialing"
+    RINGING = "ringing"
+    ANSWERED = "answered"
+    AGENT_JOINED = "agent_joined"
+    DISCONNECTED = "disconnected"
+
+
+class CallStatus:
+    """Timestamps and waiters for one call (one room)."""
+
+    def __init__(self, room_name: str):
+        self.room_name = room_name
+        self.timestamps: Dict[CallEvent, float] = {}
+        self._events: Dict[CallEvent, asyncio.Event] = {event: asyncio.Event() for event in CallEvent}
+
+    def mark(self, event: CallEvent, timestamp: Optional[float] = None) -> None:
+        if event in self.timestamps:
+            return
+        self.timestamps[event] = timestamp if timestamp is not None else time.time()
+        self._events[event].set()
+
+        # Later states imply the earlier ones happened
+        if event == CallEvent.ANSWERED:
+            self._events[CallEvent.RINGING].set()
+        if event == CallEvent.DISCONNECTED:
+            for pending in CallEvent:
+                self._events[pending].set()
+
+    def has(self, event: CallEvent) -> bool:
+        return event in self.timestamps
+
+    async def wait_for(self, event: CallEvent, timeout: Optional[float] = None) -> Optional[float]:
+        """
+        Wait until the call reaches a state.
+
+        Returns:
+            The timestamp of the event, or None on timeout or if the call
+            disconnected before reaching it
+        """
+        try:
+            await asyncio.wait_for(self._events[event].wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return self.timestamps.get(event)
+
+    def connect_latency(self) -> Optional[float]:
+        """Seconds from dialing to the caller answering."""
+        if CallEvent.DIALING in self.timestamps and CallEvent.ANSWERED in self.timestamps:
+            return self.timestamps[CallEvent.ANSWERED] - self.timestamps[CallEvent.DIALING]
+        return None
+
+
+class CallTracker:
+    """Holds the status of every call this process is following."""
+
+    def __init__(self):
+        self._calls: Dict[str, CallStatus] = {}
+
+    def is_tracking(self, room_name: str) -> bool:
+        return room_name in self._calls
+
+    def call(self, room_name: str) -> CallStatus:
+        """Status for a room, created on first use."""
+        if room_name not in self._calls:
+            self._calls[room_name] = CallStatus(room_name)
+        return self._calls[room_name]
+
+    def mark(self, room_name: str, event: CallEvent, timestamp: Optional[float] = None) -> None:
+        logger.info(f"{room_name}: {event.value}")
+        self.call(room_name).mark(event, timestamp)
+
+    async def wait_for(self, room_name: str, event: CallEvent, timeout: Optional[float] = None) -> Optional[float]:
+        return await self.call(room_name).wait_for(event, timeout)
+
+    def forget(self, room_name: str) -> None:
+        """Drop a finished call."""
+        self._calls.pop(room_name, None)
+
+    def connect_latencies(self) -> List[float]:
+        return [latency for latency in (c.connect_latency() for c in self._calls.values()) if latency is not None]
+
+    def handle_webhook(self, event) -> None:
+        """Apply a LiveKit WebhookEvent to the tracked calls."""
+        room_name = event.room.name
+        # Rooms of other processes, and late events for calls already forgotten
+        if not room_name or not self.is_tracking(room_name):
+            return
+        timestamp = float(event.created_at) if event.created_at else None
+
+        if event.event == "room_finished":
+            self.mark(room_name, CallEvent.DISCONNECTED, timestamp)
+            return
+
+        participant = event.participant
+        is_caller = participant.identity.startswith("caller-")
+        is_agent = participant.kind == api.ParticipantInfo.Kind.AGENT or "agent" in participant.identity.lower()
+
+        if event.event == "participant_joined":
+            if is_agent:
+                self.mark(room_name, CallEvent.AGENT_JOINED, timestamp)
+            elif is_caller:
+                status = participant.attributes.get("sip.callStatus", "")
+                self.mark(room_name, CallEvent.ANSWERED if status == "active" else CallEvent.RINGING, timestamp)
+        elif event.event in ("participant_left", "participant_connection_aborted") and is_caller:
+            self.mark(room_name, CallEvent.DISCONNECTED, timestamp)
+
+
+async def start_webhook_server(tracker: CallTracker, host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT) -> web.AppRunner:
+    """
+    Receive LiveKit webhooks on a local endpoint and feed them to the tracker.
+
+    Point the project's webhook URL at http://<host>:<port>/livekit/webhook.
+
+    Returns:
+        The running server; call cleanup() on it to stop
+    """
+    receiver = api.WebhookReceiver(api.TokenVerifier(
+        os.getenv("LIVEKIT_API_KEY"),
+        os.getenv("LIVEKIT_API_SECRET")
+    ))
+
+    async def handle(request: web.Request) -> web.Response:
+        body = await request.text()
+        try:
+            event = receiver.receive(body, request.headers.get("Authorization", ""))
+        except Exception as e:
+            logger.warning(f"Rejected webhook: {e}")
+            return web.Response(status=401)
+        tracker.handle_webhook(event)
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+    except OSError:
+        await runner.cleanup()
+        raise
+    logger.info(f"Listening for LiveKit webhooks on {host}:{port}{WEBHOOK_PATH}")
+    return runner
+
+
+# Shared by every call placed from this process
+call_tracker = CallTracker()
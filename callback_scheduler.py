@@ -0,0 +1,290 @@
+"""
+Callback queue for questions whose caller hung up or timed out on hold.
+
+When wait_for_answer gives up, the question is queued here. Once staff answer
+it, the scheduler calls the customer back with the agent, which reads out the
+answer; if the call doesn't connect after a few attempts the answer is sent
+by SMS instead. Calls are never placed during quiet hours.
+
+While it runs, the scheduler keeps a heartbeat file fresh. The SMS sweep
+only leaves queued answers to the scheduler while that heartbeat is live,
+so answers are still texted when no scheduler is running.
+
+Usage:
+    python callback_scheduler.py          # run continuously
+    python callback_scheduler.py --once   # process due callbacks once and exit
+"""
+import argparse
+import asyncio
+import csv
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import tenants
+from file_lock import locked, temp_path
+
+logger = logging.getLogger(__name__)
+
+CALLBACK_FILE = "callback_queue.csv"
+CALLBACK_FIELDS = ['question', 'caller_phone', 'status', 'attempts', 'created_at', 'updated_at']
+
+# Queue entry statuses
+PENDING = "pending"
+DELIVERED_CALL = "delivered_call"
+DELIVERED_SMS = "delivered_sms"
+FAILED = "failed"
+
+# Call attempts before falling back to SMS
+MAX_CALL_ATTEMPTS = int(os.getenv("CALLBACK_MAX_ATTEMPTS", "2"))
+
+# Maximum callbacks dialed at once
+CALLBACK_CONCURRENCY = int(os.getenv("CALLBACK_CONCURRENCY", "2"))
+
+# Seconds between queue checks
+CALLBACK_INTERVAL = int(os.getenv("CALLBACK_INTERVAL", "60"))
+
+# No calls between these hours (local time); start > end wraps past midnight
+QUIET_HOURS_START = int(os.getenv("QUIET_HOURS_START", "21"))
+QUIET_HOURS_END = int(os.getenv("QUIET_HOURS_END", "9"))
+
+# Holds the time until which the running scheduler counts as active
+HEARTBEAT_FILE = os.getenv("CALLBACK_HEARTBEAT_FILE", "callback_scheduler.heartbeat")
+
+# Seconds between heartbeats; the scheduler counts as gone after three missed ones
+HEARTBEAT_INTERVAL = 30
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def callback_file() -> str:
+    """Callback queue CSV of the tenant being served (see tenants), or CALLBACK_FILE."""
+    return tenants.current().callback_file or CALLBACK_FILE
+
+
+def initialize_callback_queue():
+    """Create the callback queue CSV if it doesn't exist."""
+    if not os.path.exists(callback_file()):
+        with open(callback_file(), 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerow(CALLBACK_FIELDS)
+
+
+def _read_queue() -> List[Dict]:
+    initialize_callback_queue()
+    with open(callback_file(), 'r', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def _key(question: str, caller_phone: str) -> tuple:
+    return question.lower().strip(), caller_phone
+
+
+def _write_queue(rows: List[Dict]) -> None:
+    path = callback_file()
+    tmp_file = temp_path(path)
+    with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CALLBACK_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp_file, path)
+
+
+def enqueue_callback(question: str, caller_phone: str) -> bool:
+    """
+    Queue a callback for a question that couldn't be answered during the call.
+
+    Returns:
+        True if queued, False if the caller is unknown or already queued for it
+    """
+    if not caller_phone or caller_phone == "unknown":
+        return False
+
+    try:
+        with locked(callback_file()):
+            key = _key(question, caller_phone)
+            if any(row['status'] == PENDING and _key(row['question'], row['caller_phone']) == key
+                   for row in _read_queue()):
+                return False
+
+            with open(callback_file(), 'a', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerow([question, caller_phone, PENDING, 0, _now(), _now()])
+        logger.info(f"Queued callback to {caller_phone} for: {question}")
+        return True
+    except Exception as e:
+        logger.error(f"Error queueing callback: {e}")
+        return False
+
+
+def pending_callback_questions() -> set:
+    """Normalized questions that still have a callback waiting to be delivered."""
+    try:
+        if not os.path.exists(callback_file()):
+            return set()
+        return {row['question'].lower().strip() for row in _read_queue() if row['status'] == PENDING}
+    except Exception:
+        return set()
+
+
+def in_quiet_hours(now: Optional[datetime] = None) -> bool:
+    """Whether callbacks must wait until morning."""
+    hour = (now or datetime.now()).hour
+    if QUIET_HOURS_START == QUIET_HOURS_END:
+        return False
+    if QUIET_HOURS_START < QUIET_HOURS_END:
+        return QUIET_HOURS_START <= hour < QUIET_HOURS_END
+    return hour >= QUIET_HOURS_START or hour < QUIET_HOURS_END
+
+
+def _deliver_by_sms(row: Dict, answer: str) -> bool:
+    from knowledge_manager import send_sms
+
+    phone = row['caller_phone'] if row['caller_phone'].startswith('+') else f"+{row['caller_phone']}"
+    return send_sms(phone, (
+        f"Your question has been answered!\n\n"
+        f"Q: {row['question']}\n"
+        f"A: {answer}\n\n"
+        f"Thank you for your patience!"
+    ))
+
+
+async def process_due_callbacks(lkapi) -> Dict[str, int]:
+    """
+    Call back every caller whose queued question has been answered.
+
+    Args:
+        lkapi: LiveKit API client (or a stub with the same shape)
+
+    Returns:
+        Counts of callbacks delivered by call, by SMS, failed and still waiting
+    """
+    from campaign_dialer import CallRecord, CallState, CampaignDialer
+    from knowledge_manager import check_for_answer, mark_question_answered
+
+    counts = {'called': 0, 'sms': 0, 'failed': 0, 'waiting': 0}
+    due = []
+    for row in _read_queue():
+        if row['status'] != PENDING:
+            continue
+        answer = check_for_answer(row['question'])
+        if answer:
+            due.append((row, answer))
+        else:
+            counts['waiting'] += 1
+
+    if not due:
+        return counts
+
+    if in_quiet_hours():
+        logger.info(f"Quiet hours: holding {len(due)} answered callback(s) until morning")
+        counts['waiting'] += len(due)
+        return counts
+
+    records = [
+        CallRecord(
+            row['caller_phone'],
+            room_metadata={'callback_question': row['question'], 'callback_answer': answer, 'tenant': tenants.current().id}
+        )
+        for row, answer in due
+    ]
+    dialer = CampaignDialer(lkapi, concurrency=CALLBACK_CONCURRENCY)
+    await dialer.run_records(records)
+
+    # Dialing can take many minutes; updates are merged into the queue as it is by then (see below)
+    updates = {}
+    for (row, answer), record in zip(due, records):
+        row['attempts'] = str(int(row['attempts'] or 0) + 1)
+        row['updated_at'] = _now()
+
+        if record.state == CallState.COMPLETED:
+            row['status'] = DELIVERED_CALL
+            counts['called'] += 1
+        elif int(row['attempts']) >= MAX_CALL_ATTEMPTS:
+            if _deliver_by_sms(row, answer):
+                row['status'] = DELIVERED_SMS
+                counts['sms'] += 1
+            else:
+                row['status'] = FAILED
+                counts['failed'] += 1
+        else:
+            counts['waiting'] += 1
+        updates[_key(row['question'], row['caller_phone'])] = row
+
+        if row['status'] in (DELIVERED_CALL, DELIVERED_SMS):
+            # The caller has the answer; don't text it again
+            mark_question_answered(row['question'], answered_on_call=True, notify=False)
+
+    # Callbacks queued while dialing are kept: re-read the queue under its lock and update only these rows
+    with locked(callback_file()):
+        rows = _read_queue()
+        for row in rows:
+            update = updates.get(_key(row['question'], row['caller_phone']))
+            if row['status'] == PENDING and update is not None:
+                row.update(status=update['status'], attempts=update['attempts'], updated_at=update['updated_at'])
+        _write_queue(rows)
+    logger.info(f"Callbacks processed: {counts}")
+    return counts
+
+
+def scheduler_active() -> bool:
+    """Whether a callback scheduler is running and will deliver queued answers."""
+    try:
+        with open(HEARTBEAT_FILE, 'r', encoding='utf-8') as f:
+            return float(f.read().strip() or 0) > time.time()
+    except (OSError, ValueError):
+        return False
+
+
+async def _keep_heartbeat() -> None:
+    while True:
+        try:
+            with open(HEARTBEAT_FILE, 'w', encoding='utf-8') as f:
+                f.write(str(time.time() + 3 * HEARTBEAT_INTERVAL))
+        except OSError as e:
+            logger.error(f"Error writing scheduler heartbeat: {e}")
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+
+async def run_scheduler(interval: int = CALLBACK_INTERVAL, once: bool = False) -> None:
+    """Process the callback queue every interval seconds."""
+    from call_tracker import call_tracker, start_webhook_server
+    from make_outbound_call_with_agent import create_livekit_api
+
+    lkapi = create_livekit_api()
+    # Hang-ups arrive as webhooks, so answered callbacks finish as soon as the caller leaves
+    webhook_server = await start_webhook_server(call_tracker)
+    heartbeat = None if once else asyncio.create_task(_keep_heartbeat())
+    try:
+        while True:
+            # Each branch has its own queue; the callback is placed as that branch
+            for tenant in tenants.all_tenants():
+                try:
+                    with tenants.use(tenant):
+                        await process_due_callbacks(lkapi)
+                except Exception as e:
+                    logger.error(f"Error processing callbacks for tenant {tenant.id}: {e}")
+            if once:
+                break
+            await asyncio.sleep(interval)
+    finally:
+        if heartbeat is not None:
+            heartbeat.cancel()
+            try:
+                os.remove(HEARTBEAT_FILE)
+            except OSError:
+                pass
+        await webhook_server.cleanup()
+        await lkapi.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Call back customers once their questions are answered")
+    parser.add_argument("--once", action="store_true", help="Process due callbacks once and exit")
+    parser.add_argument("--interval", type=int, default=CALLBACK_INTERVAL, help="Seconds between queue checks")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_scheduler(args.interval, args.once))
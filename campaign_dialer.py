@@ -0,0 +1,306 @@
+"""
+Outbound campaign dialer.
+
+Places calls to a list of numbers concurrently through one shared LiveKit API
+client, tracks each call through its states and writes a report when done.
+
+Usage:
+    python campaign_dialer.py numbers.txt --concurrency 5 --pacing 2 --report report.csv
+    python campaign_dialer.py numbers.txt --dry-run     # against a local stub of the LiveKit API
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from types import SimpleNamespace
+from typing import Iterable, List, Optional
+
+from livekit import api
+
+from call_tracker import CallEvent, call_tracker, start_webhook_server
+from make_outbound_call_with_agent import create_livekit_api, make_room_name, place_call
+
+logger = logging.getLogger(__name__)
+
+
+class CallState(str, Enum):
+    QUEUED = "queued"
+    DIALING = "dialing"
+    RINGING = "ringing"
+    ANSWERED = "answered"
+    COMPLETED = "completed"
+    NO_ANSWER = "no_answer"
+    FAILED = "failed"
+
+
+# States a call can move to from each state
+TRANSITIONS = {
+    CallState.QUEUED: {CallState.DIALING, CallState.FAILED},
+    CallState.DIALING: {CallState.RINGING, CallState.ANSWERED, CallState.NO_ANSWER, CallState.FAILED},
+    CallState.RINGING: {CallState.ANSWERED, CallState.NO_ANSWER, CallState.FAILED},
+    CallState.ANSWERED: {CallState.COMPLETED, CallState.FAILED},
+    CallState.COMPLETED: set(),
+    CallState.NO_ANSWER: set(),
+    CallState.FAILED: set(),
+}
+
+FINAL_STATES = {CallState.COMPLETED, CallState.NO_ANSWER, CallState.FAILED}
+
+# SIP responses meaning the callee didn't pick up (timeout, unavailable, busy, cancelled, declined)
+NO_ANSWER_SIP_CODES = {"408", "480", "486", "487", "603"}
+
+
+@dataclass
+class CallRecord:
+    """State of one campaign call."""
+    phone_number: str
+    state: CallState = CallState.QUEUED
+    room_name: str = ""
+    sip_call_id: str = ""
+    error: str = ""
+    room_metadata: dict = field(default_factory=dict)
+    history: List[tuple] = field(default_factory=list)
+
+    def transition(self, new_state: CallState, error: str = "") -> None:
+        """Move to a new state, ignoring transitions the state machine doesn't allow."""
+        if new_state == self.state:
+            return
+        if new_state not in TRANSITIONS[self.state]:
+            logger.warning(f"{self.phone_number}: ignoring transition {self.state.value} -> {new_state.value}")
+            return
+        self.state = new_state
+        self.history.append((new_state.value, time.time()))
+        if error:
+            self.error = error
+        logger.info(f"{self.phone_number}: {new_state.value}")
+
+    def timestamp(self, state: CallState) -> Optional[float]:
+        """When the call entered a state, if it did."""
+        for name, ts in self.history:
+            if name == state.value:
+                return ts
+        return None
+
+    def report_row(self) -> dict:
+        dialed_at = self.timestamp(CallState.DIALING)
+        answered_at = self.timestamp(CallState.ANSWERED)
+        ended_at = self.history[-1][1] if self.state in FINAL_STATES and self.history else None
+        return {
+            'phone_number': self.phone_number,
+            'state': self.state.value,
+            'room_name': self.room_name,
+            'sip_call_id': self.sip_call_id,
+            'connect_seconds': round(answered_at - dialed_at, 2) if answered_at and dialed_at else '',
+            'duration_seconds': round(ended_at - answered_at, 2) if ended_at and answered_at else '',
+            'error': self.error,
+        }
+
+
+class CampaignDialer:
+    """Dials a list of numbers with a concurrency limit and pacing between call starts."""
+
+    def __init__(self, lkapi, concurrency: int = 5, pacing_seconds: float = 1.0,
+                 ring_timeout: float = 45, max_call_seconds: float = 600):
+        """
+        Args:
+            lkapi: LiveKit API client shared by every call (or a stub with the same shape)
+            concurrency: Maximum calls in progress at once
+            pacing_seconds: Minimum delay between two call starts
+            ring_timeout: Seconds to wait for an answer before giving up
+            max_call_seconds: Seconds after which an answered call stops being tracked
+        """
+        self.lkapi = lkapi
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.pacing_seconds = pacing_seconds
+        self.ring_timeout = ring_timeout
+        self.max_call_seconds = max_call_seconds
+        self._pace_lock = asyncio.Lock()
+        self._last_start = 0.0
+
+    async def _wait_for_pacing(self) -> None:
+        async with self._pace_lock:
+            delay = self._last_start + self.pacing_seconds - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last_start = time.monotonic()
+
+    async def _hang_up(self, record: CallRecord) -> None:
+        """Delete the room of an unanswered call, which also ends a SIP call still ringing."""
+        try:
+            await self.lkapi.room.delete_room(api.DeleteRoomRequest(room=record.room_name))
+        except Exception as e:
+            logger.debug(f"Couldn't delete room {record.room_name}: {e}")
+
+    async def _follow_ringing(self, record: CallRecord) -> None:
+        if await call_tracker.wait_for(record.room_name, CallEvent.RINGING, self.ring_timeout):
+            if record.state == CallState.DIALING:
+                record.transition(CallState.RINGING)
+
+    async def dial(self, record: CallRecord) -> CallRecord:
+        """Place and track a single call."""
+        async with self.semaphore:
+            await self._wait_for_pacing()
+            record.room_name = make_room_name(record.phone_number)
+            record.transition(CallState.DIALING)
+            ringing_task = asyncio.create_task(self._follow_ringing(record))
+            try:
+                _, sip_response = await asyncio.wait_for(
+                    place_call(self.lkapi, record.phone_number, room_metadata=record.room_metadata,
+                               room_name=record.room_name, wait_until_answered=True),
+                    self.ring_timeout
+                )
+                record.sip_call_id = sip_response.sip_call_id
+                record.transition(CallState.ANSWERED)
+            except asyncio.TimeoutError:
+                record.transition(CallState.NO_ANSWER)
+            except Exception as e:
+                metadata = getattr(e, 'metadata', None) or {}
+                sip_status = str(metadata.get('sip_status_code', ''))
+                if sip_status in NO_ANSWER_SIP_CODES:
+                    record.transition(CallState.NO_ANSWER, f"SIP {sip_status}")
+                else:
+                    logger.error(f"Call to {record.phone_number} failed: {e}")
+                    record.transition(CallState.FAILED, str(e))
+            finally:
+                ringing_task.cancel()
+
+            if record.state != CallState.ANSWERED:
+                # Otherwise the phone keeps ringing, or is picked up into a room nobody is following
+                await self._hang_up(record)
+            if record.state == CallState.ANSWERED:
+                await call_tracker.wait_for(record.room_name, CallEvent.DISCONNECTED, self.max_call_seconds)
+                record.transition(CallState.COMPLETED)
+            call_tracker.forget(record.room_name)
+        return record
+
+    async def run(self, phone_numbers: Iterable[str]) -> List[CallRecord]:
+        """Dial every number and return their final records."""
+        records = [CallRecord(number) for number in phone_numbers]
+        return await self.run_records(records)
+
+    async def run_records(self, records: List[CallRecord]) -> List[CallRecord]:
+        """Dial prepared call records (e.g. with room metadata) and return them."""
+        await asyncio.gather(*(self.dial(record) for record in records))
+        return records
+
+
+def read_phone_numbers(path: str) -> List[str]:
+    """
+    Read phone numbers from a text file (one per line) or a CSV with a phone_number column.
+
+    Blank lines, comments and numbers not in E.164 format are skipped.
+    """
+    numbers = []
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.csv'):
+            candidates = (row.get('phone_number', '') for row in csv.DictReader(f))
+        else:
+            candidates = (line for line in f)
+
+        for candidate in candidates:
+            number = candidate.strip()
+            if not number or number.startswith('#'):
+                continue
+            if not number.startswith('+') or not number[1:].isdigit():
+                logger.warning(f"Skipping invalid number: {number}")
+                continue
+            numbers.append(number)
+    return numbers
+
+
+def write_report(records: List[CallRecord], path: str) -> None:
+    """Write call results as CSV, or JSON when the path ends in .json."""
+    rows = [record.report_row() for record in records]
+    if path.endswith('.json'):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, indent=2)
+        return
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(CallRecord("").report_row().keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+class StubLiveKitAPI:
+    """
+    Local stand-in for LiveKitAPI: every call rings briefly, is answered and hangs up.
+
+    Exposes the same room / agent_dispatch / sip attributes used by place_call
+    and reports ringing and hang-up to the call tracker the way webhooks would,
+    so campaigns can be exercised without real telephony.
+    """
+
+    def __init__(self, ring_seconds: float = 1.0, talk_seconds: float = 2.0):
+        self.ring_seconds = ring_seconds
+        self.talk_seconds = talk_seconds
+        self.room = SimpleNamespace(create_room=self._create_room, delete_room=self._delete_room)
+        self.agent_dispatch = SimpleNamespace(create_dispatch=self._create_dispatch)
+        self.sip = SimpleNamespace(create_sip_participant=self._create_sip_participant)
+
+    async def _create_room(self, request):
+        return SimpleNamespace(name=request.name)
+
+    async def _delete_room(self, request):
+        call_tracker.mark(request.room, CallEvent.DISCONNECTED)
+
+    async def _create_dispatch(self, request):
+        return SimpleNamespace(agent_dispatch=SimpleNamespace(id=f"AD_{request.room}"))
+
+    async def _create_sip_participant(self, request):
+        room_name = request.room_name
+        call_tracker.mark(room_name, CallEvent.RINGING)
+        await asyncio.sleep(self.ring_seconds)
+        asyncio.get_running_loop().call_later(
+            self.talk_seconds, call_tracker.mark, room_name, CallEvent.DISCONNECTED
+        )
+        return SimpleNamespace(participant_id=f"PA_{room_name}", sip_call_id=f"SCL_{room_name}")
+
+    async def aclose(self):
+        pass
+
+
+async def run_campaign(numbers_file: str, report_file: str, concurrency: int, pacing: float,
+                       dry_run: bool = False) -> List[CallRecord]:
+    """Dial every number in numbers_file and write the report."""
+    phone_numbers = read_phone_numbers(numbers_file)
+    lkapi = StubLiveKitAPI() if dry_run else create_livekit_api()
+    webhook_server = None if dry_run else await start_webhook_server(call_tracker)
+
+    try:
+        dialer = CampaignDialer(lkapi, concurrency=concurrency, pacing_seconds=pacing)
+        records = await dialer.run(phone_numbers)
+    finally:
+        if webhook_server is not None:
+            await webhook_server.cleanup()
+        await lkapi.aclose()
+
+    write_report(records, report_file)
+    return records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Place outbound calls to a list of numbers")
+    parser.add_argument("numbers_file", help="Text file with one number per line, or CSV with a phone_number column")
+    parser.add_argument("--concurrency", type=int, default=5, help="Maximum calls in progress at once")
+    parser.add_argument("--pacing", type=float, default=1.0, help="Seconds between call starts")
+    parser.add_argument("--report", default="campaign_report.csv", help="Report file (.csv or .json)")
+    parser.add_argument("--dry-run", action="store_true", help="Use a local stub instead of LiveKit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    records = asyncio.run(run_campaign(args.numbers_file, args.report, args.concurrency, args.pacing, args.dry_run))
+
+    print("\n" + "="*60)
+    print("CAMPAIGN COMPLETE")
+    print("="*60)
+    for state in CallState:
+        count = sum(1 for r in records if r.state == state)
+        if count:
+            print(f"{state.value}: {count}")
+    print(f"Report written to {args.report}")
+    print("="*60)
@@ -0,0 +1,135 @@
+"""
+Append-only change feed for the knowledge base.
+
+Every change knowledge_manager makes is appended as one JSON line to a feed
+file next to the CSV. Readers tail the feed from a byte offset, so each poll
+costs one stat() plus reading only the new lines, and any number of monitors
+can follow it at once (they share the OS page cache rather than re-reading
+the CSV).
+
+The feed is rotated to FILE.1 once it passes CHANGE_FEED_MAX_BYTES; a reader
+finishes the rotated file before moving on to the new one.
+"""
+import json
+import os
+import time
+from typing import Dict, List
+
+from file_lock import locked
+
+# Rotate the feed once it grows past this size
+MAX_BYTES = int(os.getenv("CHANGE_FEED_MAX_BYTES", str(5 * 1024 * 1024)))
+
+# Event types
+ADDED = "added"
+ANSWERED = "answered"
+USED = "used"
+DELETED = "deleted"
+IMPORTED = "imported"
+ARCHIVED = "archived"
+EXPIRED = "expired"
+# A caller started or stopped waiting on hold for an answer
+HOLD_STARTED = "hold_started"
+HOLD_ENDED = "hold_ended"
+
+
+def feed_path(knowledge_file: str) -> str:
+    """Feed file for a knowledge base CSV, e.g. knowledge_base.changes.jsonl."""
+    return f"{os.path.splitext(knowledge_file)[0]}.changes.jsonl"
+
+
+def append(path: str, event: str, **fields) -> None:
+    """
+    Append one event to the feed.
+
+    Each event is written with a single write() in append mode, so lines from
+    the agent and the web UI never interleave. Rotation holds the feed's lock
+    and checks the size again, so two processes never both rotate and
+    overwrite FILE.1 with a nearly empty feed.
+    """
+    try:
+        if os.path.getsize(path) > MAX_BYTES:
+            with locked(path):
+                if os.path.getsize(path) > MAX_BYTES:
+                    os.replace(path, f"{path}.1")
+    except OSError:
+        pass
+
+    line = json.dumps({'event': event, 'ts': time.time(), **fields}, ensure_ascii=False) + "\n"
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(line)
+
+
+class FeedReader:
+    """Follows a change feed from a position, returning only events added since the last poll."""
+
+    def __init__(self, path: str, from_start: bool = False):
+        """
+        Args:
+            path: Feed file to follow (created if it does not exist yet)
+            from_start: Replay the whole feed instead of starting at its current end
+        """
+        self.path = path
+        self._file = None
+        self._partial = b""
+        self._open(seek_end=not from_start)
+
+    def _open(self, seek_end: bool) -> None:
+        try:
+            # Create the feed if needed, so the first events are never written to a file nobody is following
+            open(self.path, 'ab').close()
+            self._file = open(self.path, 'rb')
+        except OSError:
+            self._file = None
+            return
+        if seek_end:
+            self._file.seek(0, os.SEEK_END)
+
+    def _read_new(self) -> List[Dict]:
+        events = []
+        chunk = self._file.read()
+        if not chunk:
+            return events
+        lines = (self._partial + chunk).split(b"\n")
+        # The last element is an incomplete line (or empty); keep it for the next poll
+        self._partial = lines.pop()
+        for line in lines:
+            if line:
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return events
+
+    def _replaced(self) -> bool:
+        try:
+            return os.stat(self.path).st_ino != os.fstat(self._file.fileno()).st_ino
+        except FileNotFoundError:
+            return False
+
+    def poll(self) -> List[Dict]:
+        """Events appended since the previous poll, in order."""
+        if self._file is None:
+            self._open(seek_end=False)
+            if self._file is None:
+                return []
+
+        events = []
+        if os.fstat(self._file.fileno()).st_size != self._file.tell():
+            events.extend(self._read_new())
+
+        if self._replaced():
+            # Rotated: drain what's left of the old file, then follow the new one
+            events.extend(self._read_new())
+            self._file.close()
+            self._partial = b""
+            self._open(seek_end=False)
+            if self._file is not None:
+                events.extend(self._read_new())
+
+        return events
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
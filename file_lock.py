@@ -0,0 +1,73 @@
+"""
+Cross-process locks for the CSV files.
+
+The agent's call processes, the web UI, the callback scheduler and the
+command-line tools all read, modify and rewrite the same CSV files. Each
+read-modify-write holds an exclusive lock on FILE.lock next to the CSV, so a
+rewrite never drops rows another process appended or changed meanwhile.
+
+The lock is re-entrant within a thread: a locked function may call another
+one that locks the same file.
+"""
+import contextlib
+import os
+import tempfile
+import threading
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+_held = threading.local()
+
+
+def _acquire(f) -> None:
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _release(f) -> None:
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextlib.contextmanager
+def locked(path: str) -> Iterator[None]:
+    """Hold the exclusive lock of a file for the duration of the block."""
+    lock_path = os.path.abspath(f"{path}.lock")
+    counts = getattr(_held, 'counts', None)
+    if counts is None:
+        counts = _held.counts = {}
+
+    if counts.get(lock_path):
+        counts[lock_path] += 1
+        try:
+            yield
+        finally:
+            counts[lock_path] -= 1
+        return
+
+    with open(lock_path, 'a+b') as f:
+        _acquire(f)
+        counts[lock_path] = 1
+        try:
+            yield
+        finally:
+            del counts[lock_path]
+            _release(f)
+
+
+def temp_path(path: str) -> str:
+    """A new, uniquely named temporary file in the directory of path, to be swapped in with os.replace."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    os.close(fd)
+    return tmp
@@ -0,0 +1,181 @@
+"""
+Command-line tool for the front desk.
+
+Usage:
+    python frontdesk.py kb stats [--json]
+    python frontdesk.py kb list [--status answered|unanswered] [--limit N] [--offset N] [--json]
+    python frontdesk.py kb answer "question" "answer"
+    python frontdesk.py kb delete "question"
+    python frontdesk.py kb export FILE [--status answered|unanswered]   # .csv or .jsonl
+    python frontdesk.py kb import FILE                                   # .csv or .jsonl
+    python frontdesk.py kb watch [--from-start]                          # follow the change feed as JSON lines
+    python frontdesk.py kb expire [--days N] [--per-caller N] [--scan-limit N] [--dry-run] # move stale questions to cold storage
+    python frontdesk.py --tenant bandra kb list                          # a branch from tenants.json
+
+Listing streams rows from the knowledge base, so memory use stays constant
+however many questions it holds. --json prints one JSON object per line.
+"""
+import argparse
+import json
+import sys
+import time
+from itertools import islice
+
+import change_feed
+import knowledge_manager as km
+import tenants
+
+
+def cmd_stats(args) -> int:
+    stats = km.get_knowledge_stats()
+    if args.json:
+        print(json.dumps(stats))
+    else:
+        print(f"Total Questions: {stats['total']}")
+        print(f"Answered: {stats['answered']}")
+        print(f"Unanswered: {stats['unanswered']}")
+    return 0
+
+
+def cmd_list(args) -> int:
+    stop = args.offset + args.limit if args.limit else None
+    rows = islice(km.iter_questions(args.status), args.offset, stop)
+    for i, row in enumerate(rows, args.offset + 1):
+        if args.json:
+            print(json.dumps(row, ensure_ascii=False))
+        else:
+            print(f"{i}. [{'answered' if row['answered'].lower() == 'yes' else 'waiting'}] {row['question']}")
+            if row['answer']:
+                print(f"   A: {row['answer']}")
+            print(f"   From: {row['caller_phone']}  Time: {row['timestamp']}")
+    return 0
+
+
+def cmd_answer(args) -> int:
+    if not km.answer_question(args.question, args.answer):
+        print(f"Question not found: {args.question}", file=sys.stderr)
+        return 1
+    print(f"Answered: {args.question}")
+    return 0
+
+
+def cmd_delete(args) -> int:
+    if not km.delete_question(args.question):
+        print(f"Question not found: {args.question}", file=sys.stderr)
+        return 1
+    print(f"Deleted: {args.question}")
+    return 0
+
+
+def cmd_export(args) -> int:
+    report = km.export_knowledge(args.file, args.status)
+    print(f"Exported {report['exported']} rows to {args.file} ({report['rows_per_sec']} rows/sec)")
+    return 0
+
+
+def cmd_import(args) -> int:
+    report = km.import_knowledge(args.file)
+    print(
+        f"Imported {report['imported']} of {report['read']} rows from {args.file} "
+        f"({report['duplicates']} duplicates, {report['invalid']} invalid, {report['rows_per_sec']} rows/sec)"
+    )
+    return 0
+
+
+def cmd_expire(args) -> int:
+    report = km.expire_questions(args.days, args.per_caller, args.limit, dry_run=args.dry_run,
+                                 scan_limit=args.scan_limit)
+    if args.json:
+        print(json.dumps(report))
+    else:
+        verb = "Would expire" if args.dry_run else "Expired"
+        print(
+            f"{verb} {report['expired']} of {report['scanned']} unanswered questions scanned "
+            f"({report['expired_age']} by age, {report['expired_cap']} over the per-caller cap)"
+        )
+    return 0
+
+
+def cmd_watch(args) -> int:
+    feed = change_feed.FeedReader(change_feed.feed_path(km.knowledge_file()), from_start=args.from_start)
+    try:
+        while True:
+            for event in feed.poll():
+                print(json.dumps(event, ensure_ascii=False), flush=True)
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        feed.close()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="frontdesk", description="Front desk agent tools")
+    parser.add_argument("--tenant", help="Salon branch from tenants.json (default: the main salon)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    kb = commands.add_parser("kb", help="Manage the knowledge base").add_subparsers(dest="kb_command", required=True)
+
+    stats = kb.add_parser("stats", help="Show question counts")
+    stats.add_argument("--json", action="store_true", help="Print JSON")
+    stats.set_defaults(func=cmd_stats)
+
+    listing = kb.add_parser("list", help="List questions")
+    listing.add_argument("--status", choices=["answered", "unanswered"], help="Only rows with this status")
+    listing.add_argument("--limit", type=int, default=0, help="Maximum rows to print (0 = all)")
+    listing.add_argument("--offset", type=int, default=0, help="Rows to skip first")
+    listing.add_argument("--json", action="store_true", help="Print one JSON object per line")
+    listing.set_defaults(func=cmd_list)
+
+    answer = kb.add_parser("answer", help="Answer a question")
+    answer.add_argument("question")
+    answer.add_argument("answer")
+    answer.set_defaults(func=cmd_answer)
+
+    delete = kb.add_parser("delete", help="Delete a question")
+    delete.add_argument("question")
+    delete.set_defaults(func=cmd_delete)
+
+    export = kb.add_parser("export", help="Export rows to .csv or .jsonl")
+    export.add_argument("file")
+    export.add_argument("--status", choices=["answered", "unanswered"], help="Only rows with this status")
+    export.set_defaults(func=cmd_export)
+
+    imported = kb.add_parser("import", help="Import rows from .csv or .jsonl")
+    imported.add_argument("file")
+    imported.set_defaults(func=cmd_import)
+
+    expire = kb.add_parser("expire", help="Move stale unanswered questions to cold storage")
+    expire.add_argument("--days", type=float, default=km.RETENTION_DAYS, help="Expire questions older than this (0 = never)")
+    expire.add_argument("--per-caller", type=int, default=km.MAX_PENDING_PER_CALLER,
+                        help="Unanswered questions kept per caller (0 = no cap)")
+    expire.add_argument("--limit", type=int, default=0, help="Most questions to expire (0 = all)")
+    expire.add_argument("--scan-limit", type=int, default=0, help="Most unanswered questions to examine (0 = all)")
+    expire.add_argument("--dry-run", action="store_true", help="Only report what would expire")
+    expire.add_argument("--json", action="store_true", help="Print JSON")
+    expire.set_defaults(func=cmd_expire)
+
+    watch = kb.add_parser("watch", help="Print knowledge base changes as they happen")
+    watch.add_argument("--from-start", action="store_true", help="Replay the whole change feed first")
+    watch.add_argument("--interval", type=float, default=1.0, help="Seconds between polls")
+    watch.set_defaults(func=cmd_watch)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    tenant = tenants.get_tenant(args.tenant)
+    if tenant is None:
+        print(f"Unknown tenant: {args.tenant}", file=sys.stderr)
+        return 1
+    try:
+        with tenants.use(tenant):
+            return args.func(args)
+    except BrokenPipeError:
+        # Output piped into head or similar
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
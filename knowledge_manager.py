@@ -1,19 +1,22 @@
 """
 Knowledge management system for handling unknown questions and learning.
 """
+import contextlib
 import csv
 import os
 import logging
-from datetime import datetime
-from typing import Dict, List, Optional
-from twilio.rest import Client
-from dotenv import load_dotenv
+import re
+import heapq
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
 
-# Load environment variables
-load_dotenv()
+import change_feed
+import tenants
+from file_lock import locked, temp_path
+from rate_limit import RateLimitExceeded, get_question_limiter
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def send_sms(to_phone: str, message: str) -> bool:
@@ -28,6 +31,10 @@ def send_sms(to_phone: str, message: str) -> bool:
         bool: True if message was sent successfully, False otherwise
     """
     try:
+        # Imported here so reading the knowledge base never pays for the Twilio SDK
+        from dotenv import load_dotenv
+        load_dotenv()
+        
         account_sid = os.getenv('TWILIO_SID')
         auth_token = os.getenv('TWILIO_SECRET')
         from_phone = os.getenv('TWILIO_OUTBOUND')
@@ -35,7 +42,8 @@ def send_sms(to_phone: str, message: str) -> bool:
         if not all([account_sid, auth_token, from_phone]):
             logger.error("Missing Twilio credentials in environment variables")
             return False
-            
+        
+        from twilio.rest import Client
         client = Client(account_sid, auth_token)
         
         message = client.messages.create(
@@ -52,13 +60,28 @@ def send_sms(to_phone: str, message: str) -> bool:
         return False
 
 KNOWLEDGE_FILE = "knowledge_base.csv"
+FIELDNAMES = ['question', 'answer', 'answered', 'timestamp', 'caller_phone', 'answered_on_call']
+
+def knowledge_file() -> str:
+    """Knowledge base CSV of the tenant being served (see tenants), or KNOWLEDGE_FILE."""
+    return tenants.current().knowledge_file or KNOWLEDGE_FILE
+
+def record_change(event: str, **fields) -> None:
+    """Append an event to the knowledge base change feed (see change_feed)."""
+    try:
+        change_feed.append(change_feed.feed_path(knowledge_file()), event, **fields)
+    except Exception as e:
+        logger.error(f"Failed to record {event} in the change feed: {e}")
 
 def initialize_knowledge_base():
     """Create knowledge base CSV if it doesn't exist."""
-    if not os.path.exists(KNOWLEDGE_FILE):
-        with open(KNOWLEDGE_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow(['question', 'answer', 'answered', 'timestamp', 'caller_phone', 'answered_on_call'])
+    if os.path.exists(knowledge_file()):
+        return
+    with locked(knowledge_file()):
+        if not os.path.exists(knowledge_file()):
+            with open(knowledge_file(), 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(FIELDNAMES)
 
 def add_unknown_question(question: str, caller_phone: str = "unknown") -> bool:
     """
@@ -70,21 +93,46 @@ def add_unknown_question(question: str, caller_phone: str = "unknown") -> bool:
     
     Returns:
         True if added successfully
+    
+    Raises:
+        RateLimitExceeded: If the caller, or all callers together, are adding
+            questions faster than rate_limit allows
     """
+    if len(question) > MAX_QUESTION_CHARS:
+        logger.warning(f"Rejected a {len(question)} character question from {caller_phone}")
+        return False
+    
+    caller = caller_phone if caller_phone and caller_phone != 'unknown' else None
+    feed_file = change_feed.feed_path(knowledge_file())
+    limiter = get_question_limiter()
+    # Before the lock and the duplicate scan, so a refused flood costs neither
+    limiter.refresh(feed_file)
+    limiter.check(caller)
+    
     try:
         initialize_knowledge_base()
         
-        # Check if question already exists
-        if question_exists(question):
-            return False
-        
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        with open(KNOWLEDGE_FILE, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerow([question, '', 'no', timestamp, caller_phone, 'false'])
+        with locked(knowledge_file()):
+            # Check if question already exists
+            if question_exists(question):
+                return False
+            
+            # Again with the questions other processes added meanwhile; the ADDED event
+            # below spends the token, so it is written before the lock is released
+            limiter.refresh(feed_file)
+            limiter.check(caller)
+            
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            
+            with open(knowledge_file(), 'a', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow([question, '', 'no', timestamp, caller_phone, 'false'])
+            record_change(change_feed.ADDED, question=question, caller_phone=caller_phone, timestamp=timestamp)
         
+        limiter.allow()
         return True
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         print(f"Error adding question: {e}")
         return False
@@ -92,10 +140,10 @@ def add_unknown_question(question: str, caller_phone: str = "unknown") -> bool:
 def question_exists(question: str) -> bool:
     """Check if a question already exists in the knowledge base."""
     try:
-        if not os.path.exists(KNOWLEDGE_FILE):
+        if not os.path.exists(knowledge_file()):
             return False
         
-        with open(KNOWLEDGE_FILE, 'r', encoding='utf-8') as f:
+        with open(knowledge_file(), 'r', encoding='utf-8') as f:
             reader = csv.DictReader(f)
             for row in reader:
                 if row['question'].lower().strip() == question.lower().strip():
@@ -104,19 +152,31 @@ def question_exists(question: str) -> bool:
     except Exception:
         return False
 
+def iter_questions(status: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Stream rows from the knowledge base one at a time.
+    
+    Args:
+        status: 'answered', 'unanswered', or None for every row
+    
+    Yields:
+        Row dictionaries in file order
+    """
+    initialize_knowledge_base()
+    
+    with open(knowledge_file(), 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            is_answered = row['answered'].lower() == 'yes'
+            if status == 'answered' and not is_answered:
+                continue
+            if status == 'unanswered' and row['answered'].lower() != 'no':
+                continue
+            yield row
+
 def get_unanswered_questions() -> List[Dict]:
     """Get all unanswered questions."""
     try:
-        initialize_knowledge_base()
-        
-        unanswered = []
-        with open(KNOWLEDGE_FILE, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row['answered'].lower() == 'no':
-                    unanswered.append(row)
-        
-        return unanswered
+        return list(iter_questions('unanswered'))
     except Exception:
         return []
 
@@ -135,7 +195,7 @@ def get_answered_questions(include_answered_on_call: bool = None) -> Dict[str, s
         initialize_knowledge_base()
         
         result = {}
-        with open(KNOWLEDGE_FILE, 'r', encoding='utf-8') as f:
+        with open(knowledge_file(), 'r', encoding='utf-8') as f:
             reader = csv.DictReader(f)
             for row in reader:
                 if row['answered'].lower() == 'yes' and row['answer'].strip():
@@ -162,10 +222,10 @@ def check_for_answer(question: str) -> Optional[str]:
         The answer if found and answered=yes, None otherwise
     """
     try:
-        if not os.path.exists(KNOWLEDGE_FILE):
+        if not os.path.exists(knowledge_file()):
             return None
         
-        with open(KNOWLEDGE_FILE, 'r', encoding='utf-8') as f:
+        with open(knowledge_file(), 'r', encoding='utf-8') as f:
             reader = csv.DictReader(f)
             for row in reader:
                 if row['question'].lower().strip() == question.lower().strip():
@@ -176,74 +236,492 @@ def check_for_answer(question: str) -> Optional[str]:
     except Exception:
         return None
 
-def mark_question_answered(question: str, answered_on_call: bool = False) -> bool:
+def mark_question_answered(question: str, answered_on_call: bool = False, notify: bool = True) -> bool:
     """
     Mark a question as answered after the agent uses it.
     
     Args:
         question: The question to mark as answered
         answered_on_call: Whether the question was answered during a call
+        notify: Text the answer to the caller if it hasn't reached them on a call yet
     
     Returns:
         True if marked successfully
     """
     try:
-        if not os.path.exists(KNOWLEDGE_FILE):
+        if not os.path.exists(knowledge_file()):
             return False
-            
-        rows = []
-        fieldnames = []
         
-        # Read existing data
-        with open(KNOWLEDGE_FILE, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            fieldnames = reader.fieldnames
-            
-            for row in reader:
-                if row['question'] == question:
-                    # Store the old answered_on_call value before updating
-                    was_answered_on_call = row.get('answered_on_call', 'false').lower() == 'true'
-                    
-                    # Update the row
-                    row['answered'] = 'yes'
-                    row['answered_on_call'] = str(answered_on_call).lower()
-                    row['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    
-                    # If this question wasn't answered on call and has a valid phone number, send SMS
-                    if not was_answered_on_call and row.get('caller_phone') and row.get('answer'):
-                        phone = row['caller_phone']
-                        # Ensure phone number starts with a '+' for E.164 format
-                        if not phone.startswith('+'):
-                            phone = f"+{phone}"
-                        
-                        sms_message = (
-                            f"Your question has been answered!\n\n"
-                            f"Q: {row['question']}\n"
-                            f"A: {row['answer']}\n\n"
-                            f"Thank you for your patience!"
-                        )
-                        
-                        # Send SMS in a separate thread to not block the main process
-                        import threading
-                        threading.Thread(
-                            target=send_sms,
-                            args=(phone, sms_message),
-                            daemon=True
-                        ).start()
-                
-                rows.append(row)
-        
-        # Write back
-        with open(KNOWLEDGE_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(rows)
+        found = []
+        notifications = []
         
+        def update(row):
+            if row['question'] == question:
+                found.append(row['question'])
+                # Store the old answered_on_call value before updating
+                was_answered_on_call = row.get('answered_on_call', 'false').lower() == 'true'
+                
+                # Update the row
+                row['answered'] = 'yes'
+                row['answered_on_call'] = str(answered_on_call).lower()
+                row['timestamp'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                
+                # If this question wasn't answered on call and has a valid phone number, send SMS
+                if notify and not was_answered_on_call and row.get('caller_phone') and row.get('answer'):
+                    phone = row['caller_phone']
+                    # Ensure phone number starts with a '+' for E.164 format
+                    if not phone.startswith('+'):
+                        phone = f"+{phone}"
+                    
+                    notifications.append((phone, (
+                        f"Your question has been answered!\n\n"
+                        f"Q: {row['question']}\n"
+                        f"A: {row['answer']}\n\n"
+                        f"Thank you for your patience!"
+                    )))
+            return row
+        
+        _rewrite_rows(update)
+        
+        # Send SMS in a separate thread to not block the main process
+        import threading
+        for phone, sms_message in notifications:
+            threading.Thread(
+                target=send_sms,
+                args=(phone, sms_message),
+                daemon=True
+            ).start()
+        
+        if found:
+            record_change(change_feed.USED, question=question, answered_on_call=answered_on_call)
         return True
     except Exception as e:
         print(f"Error marking question as answered: {e}")
         return False
 
+def _rewrite_rows(update) -> bool:
+    """
+    Stream the knowledge base through update(row) into a new file and swap it in.
+    
+    update returns the row to keep (possibly modified) or None to drop it.
+    Memory use is constant regardless of the file size. The whole rewrite
+    holds the knowledge base lock, so rows other processes add or change
+    meanwhile are never lost.
+    
+    Returns:
+        True if update changed or dropped any row. Whether a row was found at
+        all is for update to track: rewriting a row to what it already was
+        changes nothing.
+    """
+    changed = False
+    path = knowledge_file()
+    
+    with locked(path):
+        tmp_file = temp_path(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as src, \
+                    open(tmp_file, 'w', newline='', encoding='utf-8') as dst:
+                reader = csv.DictReader(src)
+                writer = csv.DictWriter(dst, fieldnames=reader.fieldnames or FIELDNAMES)
+                writer.writeheader()
+                for row in reader:
+                    original = dict(row)
+                    new_row = update(row)
+                    if new_row is None or new_row != original:
+                        changed = True
+                    if new_row is not None:
+                        writer.writerow(new_row)
+            
+            if changed:
+                os.replace(tmp_file, path)
+        finally:
+            # Already gone once swapped in
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_file)
+    return changed
+
+def answer_question(question: str, answer: str) -> bool:
+    """
+    Store a staff answer for a question.
+    
+    Args:
+        question: The question to answer (matched case-insensitively)
+        answer: The answer text
+    
+    Returns:
+        True if the question was found and answered
+    """
+    return answer_questions([question], answer) > 0
+
+def answer_questions(questions: List[str], answer: str) -> int:
+    """
+    Store one staff answer for several questions in a single rewrite.
+    
+    Used to answer every variant in a cluster of similar questions at once.
+    
+    Args:
+        questions: Questions to answer (matched case-insensitively)
+        answer: The answer text
+    
+    Returns:
+        Number of questions found and answered
+    """
+    if not os.path.exists(knowledge_file()):
+        return 0
+    
+    keys = {question.lower().strip() for question in questions}
+    matched = []
+    changed = []
+    
+    def update(row):
+        if row['question'].lower().strip() in keys:
+            matched.append(row['question'])
+            # Saving the same answer again is still a success, just not a change
+            if row['answer'] != answer or row['answered'].lower() != 'yes':
+                row['answer'] = answer
+                row['answered'] = 'yes'
+                changed.append(row['question'])
+        return row
+    
+    _rewrite_rows(update)
+    for question in changed:
+        record_change(change_feed.ANSWERED, question=question, answer=answer)
+    return len(matched)
+
+def mark_notified(questions: List[str]) -> int:
+    """
+    Record that the answers to these questions reached their callers by SMS.
+    
+    Returns:
+        Number of rows updated
+    """
+    keys = set(questions)
+    updated = []
+    
+    def update(row):
+        if row['question'] in keys and row.get('answered_on_call', 'false').lower() != 'true':
+            row['answered_on_call'] = 'true'
+            updated.append(row['question'])
+        return row
+    
+    if keys and os.path.exists(knowledge_file()):
+        _rewrite_rows(update)
+    return len(updated)
+
+def delete_question(question: str) -> bool:
+    """
+    Remove a question from the knowledge base.
+    
+    Returns:
+        True if the question was found and removed
+    """
+    if not os.path.exists(knowledge_file()):
+        return False
+    
+    key = question.lower().strip()
+    if not _rewrite_rows(lambda row: None if row['question'].lower().strip() == key else row):
+        return False
+    record_change(change_feed.DELETED, question=question)
+    return True
+
+# Rows buffered per write during bulk import/export
+BULK_CHUNK_SIZE = int(os.getenv("KB_BULK_CHUNK_SIZE", "5000"))
+
+# New and imported questions longer than this are rejected
+MAX_QUESTION_CHARS = 1000
+
+# Unanswered questions older than this are expired by the retention sweeper (0 = keep forever)
+RETENTION_DAYS = float(os.getenv("QUESTION_RETENTION_DAYS", "30"))
+
+# Unanswered questions kept per caller; older ones are expired (0 = no cap)
+MAX_PENDING_PER_CALLER = int(os.getenv("MAX_PENDING_PER_CALLER", "20"))
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+_TIMESTAMP_RE = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+_NON_DIGITS_RE = re.compile(r"\D")
+
+def normalize_row(row: Dict, now: Optional[str] = None) -> Optional[Dict]:
+    """
+    Validate and normalize a row coming from outside the knowledge base.
+    
+    Collapses whitespace, maps yes/no style flags to the values the rest of
+    the code expects, and fills in missing fields.
+    
+    Args:
+        row: Mapping with at least a 'question' key
+        now: Timestamp for rows without a valid one
+    
+    Returns:
+        The normalized row, or None if it can't be used
+    """
+    question = " ".join(str(row.get('question') or '').split())
+    if not question or len(question) > MAX_QUESTION_CHARS:
+        return None
+    
+    answer = " ".join(str(row.get('answer') or '').split())
+    answered = str(row.get('answered') or '').strip().lower()
+    answered = 'yes' if answer and answered in ('', 'yes', 'y', 'true', '1') else 'no'
+    
+    timestamp = str(row.get('timestamp') or '').strip()
+    try:
+        # The regex pins the format; fromisoformat (much faster than strptime) checks the date is real
+        if not _TIMESTAMP_RE.fullmatch(timestamp):
+            raise ValueError(timestamp)
+        datetime.fromisoformat(timestamp)
+    except ValueError:
+        timestamp = now or datetime.now().strftime(TIMESTAMP_FORMAT)
+    
+    phone = str(row.get('caller_phone') or '').strip()
+    digits = _NON_DIGITS_RE.sub('', phone)
+    phone = (('+' if phone.startswith('+') else '') + digits) if digits else 'unknown'
+    
+    on_call = str(row.get('answered_on_call') or '').strip().lower() in ('true', 'yes', '1')
+    
+    return {
+        'question': question,
+        'answer': answer,
+        'answered': answered,
+        'timestamp': timestamp,
+        'caller_phone': phone,
+        'answered_on_call': str(on_call).lower(),
+    }
+
+def _read_rows(f, path: str) -> Iterator[Dict]:
+    """Rows from an open CSV or JSON lines file; malformed JSON lines come back as {}."""
+    import json
+    
+    if not path.endswith('.jsonl'):
+        yield from csv.DictReader(f)
+        return
+    for line in f:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row if isinstance(row, dict) else {}
+
+def _throughput(report: Dict, rows: int, started: float) -> Dict:
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    report['rows_per_sec'] = round(rows / report['seconds']) if report['seconds'] else rows
+    return report
+
+def export_knowledge(path: str, status: Optional[str] = None, chunk_size: int = BULK_CHUNK_SIZE) -> Dict:
+    """
+    Stream knowledge base rows to a CSV file, or JSON lines if path ends in .jsonl.
+    
+    Rows are written in chunks, so memory use doesn't grow with the file.
+    
+    Args:
+        path: Destination file
+        status: 'answered', 'unanswered', or None for every row
+        chunk_size: Rows buffered per write
+    
+    Returns:
+        Report with 'exported', 'seconds' and 'rows_per_sec'
+    """
+    import json
+    
+    started = time.perf_counter()
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        jsonl = path.endswith('.jsonl')
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES, extrasaction='ignore')
+        if not jsonl:
+            writer.writeheader()
+        
+        rows = iter_questions(status)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            if jsonl:
+                f.write("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in chunk))
+            else:
+                writer.writerows(chunk)
+            count += len(chunk)
+    
+    report = _throughput({'exported': count}, count, started)
+    logger.info(f"Exported {count} rows to {path} ({report['rows_per_sec']} rows/sec)")
+    return report
+
+def import_knowledge(path: str, chunk_size: int = BULK_CHUNK_SIZE) -> Dict:
+    """
+    Append rows from a CSV or JSON lines file of any size.
+    
+    Rows are normalized with normalize_row, invalid rows are skipped, and
+    questions already in the knowledge base (or earlier in the file) are
+    dropped. The input is read and written in chunks; only the set of
+    existing question keys is held in memory.
+    
+    Args:
+        path: CSV (with a header) or .jsonl file
+        chunk_size: Rows buffered per write
+    
+    Returns:
+        Report with 'read', 'imported', 'duplicates', 'invalid', 'seconds' and 'rows_per_sec'
+    """
+    started = time.perf_counter()
+    initialize_knowledge_base()
+    now = datetime.now().strftime(TIMESTAMP_FORMAT)
+    report = {'read': 0, 'imported': 0, 'duplicates': 0, 'invalid': 0}
+    
+    # Locked throughout, so rows added meanwhile are neither duplicated nor lost in a rewrite
+    with locked(knowledge_file()), \
+            open(path, 'r', newline='', encoding='utf-8') as src, \
+            open(knowledge_file(), 'a', newline='', encoding='utf-8') as dst:
+        existing = {" ".join(row['question'].split()).lower() for row in iter_questions()}
+        writer = csv.DictWriter(dst, fieldnames=FIELDNAMES)
+        rows = _read_rows(src, path)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            report['read'] += len(chunk)
+            
+            accepted = []
+            for row in chunk:
+                record = normalize_row(row, now)
+                if record is None:
+                    report['invalid'] += 1
+                    continue
+                key = record['question'].lower()
+                if key in existing:
+                    report['duplicates'] += 1
+                    continue
+                existing.add(key)
+                accepted.append(record)
+            
+            writer.writerows(accepted)
+            report['imported'] += len(accepted)
+    
+    _throughput(report, report['read'], started)
+    if report['imported']:
+        record_change(change_feed.IMPORTED, source=path, count=report['imported'])
+    logger.info(
+        f"Imported {report['imported']} of {report['read']} rows from {path} "
+        f"({report['duplicates']} duplicates, {report['invalid']} invalid, {report['rows_per_sec']} rows/sec)"
+    )
+    return report
+
+def expired_file() -> str:
+    """Cold storage for expired questions, e.g. knowledge_base.expired.csv."""
+    return f"{os.path.splitext(knowledge_file())[0]}.expired.csv"
+
+def expire_questions(max_age_days: float = RETENTION_DAYS, max_per_caller: int = MAX_PENDING_PER_CALLER,
+                     limit: int = 0, dry_run: bool = False, scan_limit: int = 0) -> Dict:
+    """
+    Move stale unanswered questions out of the knowledge base into expired_file().
+    
+    A question expires once it is older than max_age_days, or when its caller
+    has more than max_per_caller unanswered questions (the oldest go first).
+    Questions with a callback still waiting to be delivered never expire, and
+    callers without a known number are not capped.
+    
+    The scan stops after finding limit questions to expire, or after
+    scan_limit unanswered questions, so one sweep does bounded work however
+    much has piled up; the next sweep continues. Questions are appended as
+    they come in, so the oldest are scanned first. Within a bounded scan the
+    per-caller cap only counts the questions scanned: it may keep more than
+    max_per_caller, but never expires a question that is within the cap.
+    
+    Args:
+        max_age_days: Expire questions older than this (0 = never)
+        max_per_caller: Unanswered questions kept per caller (0 = no cap)
+        limit: Most questions expired by this call (0 = no limit)
+        dry_run: Only report what would expire
+        scan_limit: Most unanswered questions examined by this call (0 = no limit)
+    
+    Returns:
+        Report with 'scanned', 'expired_age', 'expired_cap', 'expired' and 'seconds'
+    """
+    started = time.perf_counter()
+    report = {'scanned': 0, 'expired_age': 0, 'expired_cap': 0, 'expired': 0}
+    if not os.path.exists(knowledge_file()) or not (max_age_days > 0 or max_per_caller > 0):
+        report['seconds'] = 0.0
+        return report
+    
+    # Timestamps in TIMESTAMP_FORMAT sort like the times they stand for
+    cutoff = (datetime.now() - timedelta(days=max_age_days)).strftime(TIMESTAMP_FORMAT) if max_age_days > 0 else None
+    # Answers for these are still on their way to the caller
+    from callback_scheduler import pending_callback_questions
+    awaiting_callback = pending_callback_questions()
+    expire: Dict[str, str] = {}
+    # caller -> min-heap of (timestamp, question) holding that caller's newest max_per_caller questions
+    newest: Dict[str, List] = {}
+    
+    for row in iter_questions('unanswered'):
+        if scan_limit and report['scanned'] >= scan_limit:
+            break
+        report['scanned'] += 1
+        if row['question'].lower().strip() in awaiting_callback:
+            continue
+        timestamp = row['timestamp']
+        if cutoff and _TIMESTAMP_RE.fullmatch(timestamp) and timestamp < cutoff:
+            expire[row['question']] = 'age'
+        elif max_per_caller > 0 and row['caller_phone'] not in ('', 'unknown'):
+            heap = newest.setdefault(row['caller_phone'], [])
+            heapq.heappush(heap, (timestamp, row['question']))
+            if len(heap) > max_per_caller:
+                expire[heapq.heappop(heap)[1]] = 'cap'
+        if limit and len(expire) >= limit:
+            break
+    
+    if expire and not dry_run:
+        expired_rows = []
+        
+        def update(row):
+            # Re-checked here: staff may have answered it, or a callback been queued, since the scan
+            if (row['question'] in expire and row['answered'].lower() == 'no'
+                    and row['question'].lower().strip() not in awaiting_callback):
+                expired_rows.append(row)
+                return None
+            return row
+        
+        # The scan runs unlocked; the rewrite and the move to cold storage hold the knowledge base lock
+        with locked(knowledge_file()):
+            awaiting_callback = pending_callback_questions()
+            _rewrite_rows(update)
+            expire = {row['question']: expire[row['question']] for row in expired_rows}
+            
+            if expired_rows:
+                path = expired_file()
+                is_new = not os.path.exists(path)
+                expired_at = datetime.now().strftime(TIMESTAMP_FORMAT)
+                with open(path, 'a', newline='', encoding='utf-8') as f:
+                    writer = csv.DictWriter(f, fieldnames=FIELDNAMES + ['expired_at', 'reason'], extrasaction='ignore')
+                    if is_new:
+                        writer.writeheader()
+                    for row in expired_rows:
+                        writer.writerow({**row, 'expired_at': expired_at, 'reason': expire[row['question']]})
+        for row in expired_rows:
+            record_change(change_feed.EXPIRED, question=row['question'], reason=expire[row['question']])
+    
+    report['expired_age'] = sum(1 for reason in expire.values() if reason == 'age')
+    report['expired_cap'] = sum(1 for reason in expire.values() if reason == 'cap')
+    report['expired'] = len(expire)
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    if report['expired'] and not dry_run:
+        logger.info(
+            f"Expired {report['expired']} questions to {expired_file()} "
+            f"({report['expired_age']} by age, {report['expired_cap']} over the per-caller cap)"
+        )
+    return report
+
+def get_knowledge_version() -> str:
+    """
+    Identify the current contents of the knowledge base without reading it.
+    
+    Returns:
+        A string that changes whenever the CSV is rewritten or appended to
+    """
+    try:
+        stat = os.stat(knowledge_file())
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+    except OSError:
+        return "missing"
+
 def load_additional_knowledge() -> str:
     """
     Load all answered questions and format them for the prompt.
@@ -262,17 +740,70 @@ def load_additional_knowledge() -> str:
     
     return knowledge_text
 
-def archive_answered_questions_to_prompt(prompt_file: str = "prompts.py") -> bool:
+PROMPT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts.py")
+
+_LEARNED_QA_RE = re.compile(r'LEARNED_QA = """(.*?)"""', re.DOTALL)
+
+def learned_qa_file() -> str:
+    """File holding the LEARNED_QA section of the tenant being served."""
+    return tenants.current().prompt_file or PROMPT_FILE
+
+def read_learned_qa(path: Optional[str] = None) -> str:
+    """Text of the LEARNED_QA section of a prompt file ('' if it has none)."""
+    try:
+        with open(path or learned_qa_file(), 'r', encoding='utf-8') as f:
+            match = _LEARNED_QA_RE.search(f.read())
+    except OSError:
+        return ""
+    return match.group(1) if match else ""
+
+def get_agent_instructions() -> str:
+    """
+    Full instructions for the tenant being served: its salon details and
+    learned knowledge plus every answered question in its knowledge base.
+    
+    Composed once per tenant and reused by every call until the knowledge
+    base or the learned knowledge changes.
+    """
+    import prompts
+    
+    tenant = tenants.current()
+    try:
+        prompt_mtime = os.stat(learned_qa_file()).st_mtime_ns
+    except OSError:
+        prompt_mtime = None
+    version = (get_knowledge_version(), prompt_mtime)
+    
+    cached = tenants.tenant_cache.get('instructions', lambda: (None, ""))
+    if cached[0] == version:
+        return cached[1]
+    
+    instructions = prompts.get_agent_instructions(
+        salon_name=tenant.name or prompts.SALON_NAME,
+        salon_address=tenant.address or prompts.SALON_ADDRESS,
+        salon_phone=tenant.phone or prompts.SALON_PHONE,
+        salon_hours=dict(tenant.hours) if tenant.hours else prompts.SALON_HOURS,
+        learned_qa=read_learned_qa(),
+    ) + load_additional_knowledge()
+    tenants.tenant_cache.put('instructions', (version, instructions))
+    return instructions
+
+def archive_answered_questions_to_prompt(prompt_file: Optional[str] = None) -> bool:
     """
     Move answered questions from CSV to the prompt file permanently.
     This clears answered questions from CSV and adds them to the agent's knowledge.
     
     Args:
-        prompt_file: Path to the prompts.py file
+        prompt_file: Path to the prompts.py file (defaults to the current tenant's)
     
     Returns:
         True if successful, False otherwise
     """
+    # Held from reading the answers to rewriting the CSV: an answer saved in between would be dropped
+    with locked(knowledge_file()):
+        return _archive_answered_questions(prompt_file or learned_qa_file())
+
+def _archive_answered_questions(prompt_file: str) -> bool:
     try:
         print("\n" + "="*50)
         print("STARTING KNOWLEDGE ARCHIVE PROCESS")
@@ -333,12 +864,12 @@ def archive_answered_questions_to_prompt(prompt_file: str = "prompts.py") -> boo
         
         # Now clear answered questions from CSV, keep only unanswered
         print("\nProcessing knowledge_base.csv:")
-        if not os.path.exists(KNOWLEDGE_FILE):
+        if not os.path.exists(knowledge_file()):
             print("  knowledge_base.csv not found")
             return True
         
         unanswered_rows = []
-        with open(KNOWLEDGE_FILE, 'r', encoding='utf-8') as f:
+        with open(knowledge_file(), 'r', encoding='utf-8') as f:
             reader = csv.DictReader(f)
             fieldnames = reader.fieldnames
             print(f"  Found columns: {', '.join(fieldnames)}")
@@ -352,11 +883,14 @@ def archive_answered_questions_to_prompt(prompt_file: str = "prompts.py") -> boo
         
         # Rewrite CSV with only unanswered questions
         print(f"\nWriting {len(unanswered_rows)} unanswered questions back to knowledge_base.csv")
-        with open(KNOWLEDGE_FILE, 'w', newline='', encoding='utf-8') as f:
+        tmp_file = temp_path(knowledge_file())
+        with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
             writer = csv.DictWriter(f, fieldnames=fieldnames)
             writer.writeheader()
             writer.writerows(unanswered_rows)
-            print("  Successfully updated knowledge_base.csv")
+        os.replace(tmp_file, knowledge_file())
+        print("  Successfully updated knowledge_base.csv")
+        record_change(change_feed.ARCHIVED, count=len(answered))
         
         print("\n" + "="*50)
         print(f"✅ ARCHIVE COMPLETE")
@@ -382,7 +916,7 @@ def get_knowledge_stats() -> Dict:
         answered_count = 0
         unanswered_count = 0
         
-        with open(KNOWLEDGE_FILE, 'r', encoding='utf-8') as f:
+        with open(knowledge_file(), 'r', encoding='utf-8') as f:
             reader = csv.DictReader(f)
             for row in reader:
                 total += 1
@@ -401,6 +935,8 @@ def get_knowledge_stats() -> Dict:
 
 # Example usage and testing
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    
     # Initialize
     initialize_knowledge_base()
     
@@ -0,0 +1,132 @@
+"""
+Logging setup for long-running processes (the telephony agent).
+
+- Structured JSON lines via structlog, or readable console lines; fields
+  passed as extra={...} become keys of the line
+- A QueueHandler, so the event loop never waits on log I/O
+- Size-rotating log files instead of one ever-growing file
+- Per-module levels and sampling of chatty debug/info loggers from env
+
+Environment:
+    LOG_LEVEL=INFO                                   # root level
+    LOG_LEVELS=sms_client=WARNING,livekit=INFO       # per-module levels
+    LOG_SAMPLING=sms_client=0.1                      # keep 10% of sms_client records below WARNING
+    LOG_FORMAT=json                                  # json or console
+    LOG_FILE_MAX_BYTES=10485760
+    LOG_FILE_BACKUPS=5
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from typing import Dict, Optional
+
+import structlog
+
+
+def _parse_pairs(value: str) -> Dict[str, str]:
+    """Parse 'a=1,b=2' into {'a': '1', 'b': '2'}."""
+    pairs = {}
+    for item in value.split(','):
+        if '=' in item:
+            name, setting = item.split('=', 1)
+            pairs[name.strip()] = setting.strip()
+    return pairs
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of records below WARNING from the configured loggers."""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        for name, rate in self.rates.items():
+            if record.name == name or record.name.startswith(f"{name}."):
+                return random.random() < rate
+        return True
+
+
+def configure_logging(log_file: Optional[str] = None) -> logging.handlers.QueueListener:
+    """
+    Route all logging through a background queue to the console and an optional rotating file.
+
+    Replaces any handlers already on the root logger.
+
+    Args:
+        log_file: Path of the rotating log file, or None for console only
+
+    Returns:
+        The running queue listener (stopped automatically at exit)
+    """
+    if os.getenv("LOG_FORMAT", "json").lower() == "console":
+        renderer = structlog.dev.ConsoleRenderer(colors=False)
+    else:
+        renderer = structlog.processors.JSONRenderer()
+
+    formatter = structlog.stdlib.ProcessorFormatter(
+        processor=renderer,
+        foreign_pre_chain=[
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.ExtraAdder(),
+            structlog.processors.TimeStamper(fmt="iso"),
+        ],
+    )
+
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=int(os.getenv("LOG_FILE_MAX_BYTES", str(10 * 1024 * 1024))),
+            backupCount=int(os.getenv("LOG_FILE_BACKUPS", "5")),
+            encoding='utf-8'
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    sampling = {name: float(rate) for name, rate in _parse_pairs(os.getenv("LOG_SAMPLING", "")).items()}
+    if sampling:
+        queue_handler.addFilter(SamplingFilter(sampling))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    for name, level in _parse_pairs(os.getenv("LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def configure_after_livekit(log_file: Optional[str] = None) -> None:
+    """
+    Apply configure_logging once livekit's CLI has set up its own logging.
+
+    cli.run_app calls livekit's setup_logging, which adds a blocking stdout
+    handler to the root logger and sets the root level from --log-level.
+    Configuring before run_app would leave that handler next to the queue
+    (every line printed twice, and written on the event loop) and LOG_LEVEL
+    overridden, so configure_logging runs right after it instead.
+    """
+    from livekit.agents.cli import cli as livekit_cli
+
+    livekit_setup_logging = livekit_cli.setup_logging
+
+    def setup_logging(*args, **kwargs):
+        livekit_setup_logging(*args, **kwargs)
+        configure_logging(log_file)
+
+    livekit_cli.setup_logging = setup_logging
@@ -0,0 +1,117 @@
+"""
+Event-loop lag and blocking-call detector.
+
+The loop that runs a call also drives its audio pipeline, so any callback
+that blocks it (file I/O, CPU-heavy work) is heard as a glitch. A heartbeat
+task on the loop measures how late it wakes up; a monitor thread notices
+when the heartbeat stops and captures the loop thread's stack while it is
+still blocked, so the offending code shows up in the logs.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# A loop that doesn't tick for this long counts as blocked
+BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100")) / 1000
+
+# Seconds between heartbeats
+HEARTBEAT_INTERVAL = 0.05
+
+# Lag samples kept for percentiles
+LAG_WINDOW = 200
+
+
+class LoopWatchdog:
+    """Watches one event loop for lag and blocking callbacks."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, threshold: float = BLOCK_THRESHOLD,
+                 on_lag: Optional[Callable[[float], None]] = None):
+        """
+        Args:
+            loop: The loop to watch; must be running in the current thread
+            threshold: Seconds without a heartbeat before the loop counts as blocked
+            on_lag: Called with every measured lag sample, in seconds
+        """
+        self.loop = loop
+        self.threshold = threshold
+        self.on_lag = on_lag
+        self.loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._lag: Deque[float] = deque(maxlen=LAG_WINDOW)
+        self._blocked_since: Optional[float] = None
+        self._stopped = threading.Event()
+        self.blocks = 0
+        self.longest_block = 0.0
+        self.last_stack = ""
+
+        self._heartbeat_task = loop.create_task(self._heartbeat())
+        self._monitor = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._monitor.start()
+
+    async def _heartbeat(self) -> None:
+        try:
+            while True:
+                started = time.monotonic()
+                await asyncio.sleep(HEARTBEAT_INTERVAL)
+                now = time.monotonic()
+                lag = max(0.0, now - started - HEARTBEAT_INTERVAL)
+                self._last_beat = now
+                self._lag.append(lag)
+                if self.on_lag is not None:
+                    self.on_lag(lag)
+        finally:
+            # Loop is shutting down: stop watching it
+            self._stopped.set()
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.threshold / 2):
+            silent_for = time.monotonic() - self._last_beat
+
+            if silent_for > self.threshold and self._blocked_since is None:
+                self._blocked_since = self._last_beat
+                frame = sys._current_frames().get(self.loop_thread_id)
+                self.last_stack = "".join(traceback.format_stack(frame)) if frame else ""
+                logger.warning(
+                    f"Event loop blocked for over {self.threshold * 1000:.0f}ms, stack of the blocking call:\n"
+                    f"{self.last_stack}"
+                )
+            elif silent_for <= self.threshold and self._blocked_since is not None:
+                duration = self._last_beat - self._blocked_since
+                self.blocks += 1
+                self.longest_block = max(self.longest_block, duration)
+                logger.warning(f"Event loop was blocked for {duration * 1000:.0f}ms")
+                self._blocked_since = None
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._heartbeat_task.cancel()
+
+    def metrics(self) -> Dict:
+        lag = sorted(self._lag)
+        return {
+            'lag_p50_ms': round(lag[len(lag) // 2] * 1000, 1) if lag else 0.0,
+            'lag_max_ms': round(lag[-1] * 1000, 1) if lag else 0.0,
+            'blocks': self.blocks,
+            'longest_block_ms': round(self.longest_block * 1000, 1),
+        }
+
+
+_watchdogs: Dict[int, LoopWatchdog] = {}
+
+
+def watch(on_lag: Optional[Callable[[float], None]] = None) -> LoopWatchdog:
+    """Start (or return) the watchdog for the running loop."""
+    loop = asyncio.get_running_loop()
+    watchdog = _watchdogs.get(id(loop))
+    if watchdog is None or watchdog.loop is not loop:
+        watchdog = LoopWatchdog(loop, on_lag=on_lag)
+        _watchdogs[id(loop)] = watchdog
+    return watchdog
@@ -1,101 +1,193 @@
 import asyncio
+import json
 import os
 import logging
+import time
+import uuid
+from typing import Dict, Optional, Tuple
 from dotenv import load_dotenv
 from livekit import api
 
-# Enable debug logging
-logging.basicConfig(level=logging.DEBUG)
+from call_tracker import WEBHOOK_PORT, CallEvent, call_tracker, start_webhook_server
+
 logger = logging.getLogger(__name__)
 
-load_dotenv()
+AGENT_NAME = "telephony_agent"  # Must match your agent
 
-async def make_outbound_call_with_agent(phone_number: str):
-    """
-    Make an outbound call with agent dispatch.
-    This version explicitly dispatches the agent to the room.
-    """
+# Seconds between list_participants checks when no webhook server is running
+POLL_INTERVAL = 5
+
+def create_livekit_api() -> api.LiveKitAPI:
+    """Create a LiveKit API client from environment variables."""
+    load_dotenv()
     livekit_url = os.getenv("LIVEKIT_URL")
     api_key = os.getenv("LIVEKIT_API_KEY")
     api_secret = os.getenv("LIVEKIT_API_SECRET")
-    sip_trunk_id = os.getenv("LIVEKIT_SIP_TRUNK_ID")
     
-    if not all([livekit_url, api_key, api_secret, sip_trunk_id]):
+    if not all([livekit_url, api_key, api_secret, os.getenv("LIVEKIT_SIP_TRUNK_ID")]):
         raise ValueError("Missing required environment variables")
     
-    lkapi = api.LiveKitAPI(
+    return api.LiveKitAPI(
         url=livekit_url,
         api_key=api_key,
         api_secret=api_secret
     )
+
+def make_room_name(phone_number: str) -> str:
+    """Unique room name for a call to phone_number."""
+    return f"outbound-{phone_number.replace('+', '')}-{int(time.time())}-{uuid.uuid4().hex[:6]}"
+
+async def place_call(
+    lkapi,
+    phone_number: str,
+    room_metadata: Optional[Dict] = None,
+    room_name: Optional[str] = None,
+    wait_until_answered: bool = False
+) -> Tuple[str, object]:
+    """
+    Create a room, dispatch the agent to it and dial the number.
+    
+    Args:
+        lkapi: LiveKit API client (shared between calls)
+        phone_number: Number to call in E.164 format
+        room_metadata: Extra metadata for the agent, merged with caller_phone
+        room_name: Room to use, generated if not given
+        wait_until_answered: Return only once the callee picks up; no-answer
+            and busy outcomes raise instead
+    
+    Returns:
+        Tuple of (room name, SIP participant response)
+    """
+    room_name = room_name or make_room_name(phone_number)
+    metadata = {"caller_phone": phone_number, **(room_metadata or {})}
+    
+    # Step 1: Create the room first
+    logger.info(f"Creating room: {room_name}")
+    room_request = api.CreateRoomRequest(
+        name=room_name,
+        empty_timeout=300,
+        max_participants=10,
+        metadata=json.dumps(metadata)
+    )
+    await lkapi.room.create_room(room_request)
     
+    # Step 2: Dispatch agent to the room
     try:
-        # Use a unique room name
-        import time
-        room_name = f"outbound-{phone_number.replace('+', '')}-{int(time.time())}"
+        dispatch_request = api.CreateAgentDispatchRequest(
+            room=room_name,
+            agent_name=AGENT_NAME,
+        )
+        dispatch_response = await lkapi.agent_dispatch.create_dispatch(dispatch_request)
+        logger.info(f"Agent dispatched to {room_name}: {dispatch_response.agent_dispatch.id}")
+    except Exception as dispatch_error:
+        logger.warning(f"Agent dispatch failed for {room_name}, agent may auto-join: {dispatch_error}")
+    
+    # Step 3: Make the SIP call
+    logger.info(f"Initiating call to {phone_number}...")
+    call_tracker.mark(room_name, CallEvent.DIALING)
+    sip_request = api.CreateSIPParticipantRequest(
+        sip_trunk_id=os.getenv("LIVEKIT_SIP_TRUNK_ID"),
+        sip_call_to=phone_number,
+        room_name=room_name,
+        participant_identity=f"caller-{phone_number}",
+        participant_name="Outbound Call",
+        play_ringtone=True,
+        wait_until_answered=wait_until_answered,
+    )
+    sip_response = await lkapi.sip.create_sip_participant(sip_request)
+    if wait_until_answered:
+        call_tracker.mark(room_name, CallEvent.ANSWERED)
+    
+    return room_name, sip_response
+
+async def poll_call_events(lkapi, room_name: str, caller_identity: str) -> None:
+    """
+    Mark agent-joined and disconnected from list_participants, for runs without webhooks.
+    
+    Args:
+        lkapi: LiveKit API client
+        room_name: Room of the call
+        caller_identity: Identity of the SIP participant
+    """
+    caller_seen = False
+    while True:
+        try:
+            response = await lkapi.room.list_participants(api.ListParticipantsRequest(room=room_name))
+        except Exception as e:
+            logger.info(f"Room {room_name} is gone: {e}")
+            call_tracker.mark(room_name, CallEvent.DISCONNECTED)
+            return
+        
+        identities = {p.identity for p in response.participants}
+        if any(p.kind == api.ParticipantInfo.Kind.AGENT for p in response.participants):
+            call_tracker.mark(room_name, CallEvent.AGENT_JOINED)
+        if caller_identity in identities:
+            caller_seen = True
+        elif caller_seen:
+            call_tracker.mark(room_name, CallEvent.DISCONNECTED)
+            return
         
+        await asyncio.sleep(POLL_INTERVAL)
+
+async def make_outbound_call_with_agent(phone_number: str, webhook_port: int = WEBHOOK_PORT):
+    """
+    Make an outbound call with agent dispatch.
+    This version explicitly dispatches the agent to the room.
+    
+    Args:
+        phone_number: Number to call in E.164 format
+        webhook_port: Port for LiveKit webhooks; 0, or a port already taken
+            (e.g. by callback_scheduler or a campaign), polls list_participants instead
+    """
+    lkapi = create_livekit_api()
+    webhook_server = None
+    if webhook_port:
+        try:
+            webhook_server = await start_webhook_server(call_tracker, port=webhook_port)
+        except OSError as e:
+            logger.warning(f"Can't listen for webhooks on port {webhook_port}, polling instead: {e}")
+    poll_task = None
+    
+    try:
         print("\n" + "="*60)
         print("OUTBOUND CALL WITH AGENT")
         print("="*60)
         
-        # Step 1: Create the room first
-        print(f"\n[1/3] Creating room: {room_name}")
-        room_request = api.CreateRoomRequest(
-            name=room_name,
-            empty_timeout=300,
-            max_participants=10,
-            metadata=f'{{"caller_phone": "{phone_number}"}}'
-        )
-        room = await lkapi.room.create_room(room_request)
-        print(f"✓ Room created: {room.name}")
-        
-        # Step 2: Dispatch agent to the room
-        print(f"\n[2/3] Dispatching agent to room...")
-        try:
-            # Create agent dispatch request
-            dispatch_request = api.CreateAgentDispatchRequest(
-                room=room_name,
-                agent_name="telephony_agent",  # Must match your agent
-            )
-            dispatch_response = await lkapi.agent_dispatch.create_dispatch(dispatch_request)
-            print(f"✓ Agent dispatched!")
-            print(f"  Dispatch ID: {dispatch_response.agent_dispatch.id}")
-        except Exception as dispatch_error:
-            print(f"⚠️  Agent dispatch failed: {dispatch_error}")
-            print("  Continuing anyway - agent may auto-join...")
-        
-        # Step 3: Make the SIP call
-        print(f"\n[3/3] Initiating call to {phone_number}...")
-        sip_request = api.CreateSIPParticipantRequest(
-            sip_trunk_id=sip_trunk_id,
-            sip_call_to=phone_number,
-            room_name=room_name,
-            participant_identity=f"caller-{phone_number}",
-            participant_name=f"Outbound Call",
-            play_ringtone=True,
-        )
-        
-        sip_response = await lkapi.sip.create_sip_participant(sip_request)
-        print(f"✓ Call initiated!")
+        print(f"\nCreating room, dispatching agent and calling {phone_number}...")
+        room_name, sip_response = await place_call(lkapi, phone_number, wait_until_answered=True)
+        print(f"✓ Call answered!")
         print(f"  Room: {room_name}")
         print(f"  Participant ID: {sip_response.participant_id}")
         print(f"  SIP Call ID: {sip_response.sip_call_id}")
         
-        # Wait and monitor
-        print(f"\n⏳ Monitoring call for 30 seconds...")
-        for i in range(6):
-            await asyncio.sleep(5)
-            
-            # Check participants
-            participants = await lkapi.room.list_participants(
-                api.ListParticipantsRequest(room=room_name)
-            )
-            
-            print(f"\n  [{(i+1)*5}s] Participants in room:")
-            for p in participants.participants:
-                state_name = {0: "JOINING", 1: "JOINED", 2: "ACTIVE", 3: "DISCONNECTED"}.get(p.state, "UNKNOWN")
-                is_agent = "🤖 AGENT" if "agent" in p.identity.lower() else "📞 CALLER"
-                print(f"    {is_agent} {p.identity}: {state_name}")
+        # Follow the call through its state transitions
+        call = call_tracker.call(room_name)
+        dialed_at = call.timestamps[CallEvent.DIALING]
+        events = [
+            (CallEvent.RINGING, 30),
+            (CallEvent.ANSWERED, 45),
+            (CallEvent.AGENT_JOINED, 15),
+            (CallEvent.DISCONNECTED, 600),
+        ]
+        if webhook_server is not None:
+            print(f"\n⏳ Following call events (webhooks on port {webhook_port})...")
+        else:
+            print(f"\n⏳ Following call events (polling every {POLL_INTERVAL}s)...")
+            poll_task = asyncio.create_task(poll_call_events(lkapi, room_name, f"caller-{phone_number}"))
+            # Ringing is only reported by webhooks
+            events = events[1:]
+        for event, timeout in events:
+            timestamp = await call.wait_for(event, timeout)
+            if timestamp is None:
+                print(f"  {event.value}: not observed")
+                if call.has(CallEvent.DISCONNECTED):
+                    break
+            else:
+                print(f"  {event.value}: +{timestamp - dialed_at:.2f}s")
+        
+        latency = call.connect_latency()
+        if latency is not None:
+            print(f"\n  Connect latency: {latency:.2f}s")
         
         print("\n" + "="*60)
         print("CALL MONITORING COMPLETE")
@@ -113,14 +205,22 @@ async def make_outbound_call_with_agent(phone_number: str):
         logger.error(f"Call failed: {e}", exc_info=True)
         raise
     finally:
+        if poll_task is not None:
+            poll_task.cancel()
+        if webhook_server is not None:
+            await webhook_server.cleanup()
         await lkapi.aclose()
 
 if __name__ == "__main__":
     import sys
     
+    # Enable debug logging
+    logging.basicConfig(level=logging.DEBUG)
+    
     if len(sys.argv) < 2:
-        print("Usage: python make_outbound_call_with_agent.py <phone_number>")
+        print("Usage: python make_outbound_call_with_agent.py <phone_number> [--webhook-port N]")
         print("Example: python make_outbound_call_with_agent.py +918208153112")
+        print("         --webhook-port 0 polls the room instead of listening for webhooks")
         sys.exit(1)
     
     phone_number = sys.argv[1]
@@ -129,4 +229,12 @@ if __name__ == "__main__":
         print("Error: Phone number must be in E.164 format (start with +)")
         sys.exit(1)
     
-    asyncio.run(make_outbound_call_with_agent(phone_number))
+    webhook_port = WEBHOOK_PORT
+    if "--webhook-port" in sys.argv:
+        try:
+            webhook_port = int(sys.argv[sys.argv.index("--webhook-port") + 1])
+        except (IndexError, ValueError):
+            print("Error: --webhook-port needs a port number")
+            sys.exit(1)
+    
+    asyncio.run(make_outbound_call_with_agent(phone_number, webhook_port))
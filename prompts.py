@@ -138,7 +138,15 @@ A: yes
 """
 
 # Main agent instructions
-AGENT_INSTRUCTIONS = f"""You are Rahul, the friendly AI receptionist for {SALON_NAME}, a premium beauty salon in Mumbai. You handle phone calls with warmth, professionalism, and efficiency.
+def get_agent_instructions(
+    salon_name: str = SALON_NAME,
+    salon_address: str = SALON_ADDRESS,
+    salon_phone: str = SALON_PHONE,
+    salon_hours: dict = SALON_HOURS,
+    learned_qa: str = LEARNED_QA
+) -> str:
+    """Agent instructions for one salon branch (see tenants); the defaults describe this salon."""
+    return f"""You are Rahul, the friendly AI receptionist for {salon_name}, a premium beauty salon in Mumbai. You handle phone calls with warmth, professionalism, and efficiency.
 
 YOUR ROLE:
 - Greet callers warmly and professionally
@@ -148,10 +156,10 @@ YOUR ROLE:
 - Handle inquiries with care and attention
 
 SALON INFORMATION:
-- Name: {SALON_NAME}
-- Location: {SALON_ADDRESS}
-- Phone: {SALON_PHONE}
-- Hours: Monday-Friday {SALON_HOURS['weekday']}, Saturday {SALON_HOURS['saturday']}, Sunday {SALON_HOURS['sunday']}
+- Name: {salon_name}
+- Location: {salon_address}
+- Phone: {salon_phone}
+- Hours: Monday-Friday {salon_hours['weekday']}, Saturday {salon_hours['saturday']}, Sunday {salon_hours['sunday']}
 
 OUR SERVICES & PRICING:
 
@@ -200,9 +208,9 @@ STRICT CONVERSATION GUIDELINES:
    - NEVER say "I don't know" or make up information
    - Say: "Let me check that for you, please hold for just a moment..."
    - Use the wait_for_answer tool - this will keep the customer on hold while our team provides the answer
-   - The tool will automatically wait up to 60 seconds for a human to type the answer
+   - The tool keeps the caller on hold, with short progress updates, while a human types the answer
    - If an answer is provided, share it with the customer immediately
-   - If no answer after 60 seconds, ask for their phone number to follow up
+   - If no answer arrives in time, ask for their phone number to follow up
 
 3. **IMMEDIATE ACKNOWLEDGMENT**: For EVERY response, start with a brief acknowledgment before providing the answer:
    - For simple questions: "Sure!" or "Absolutely!" then answer
@@ -234,7 +242,7 @@ TONE & STYLE:
 - Never leave long silences
 
 LEARNED KNOWLEDGE FROM PAST INTERACTIONS:
-{LEARNED_QA}
+{learned_qa}
 
 CRITICAL RULES:
 ❌ DO NOT make up services not listed above
@@ -246,20 +254,61 @@ CRITICAL RULES:
 ✅ DO stay within the provided information only
 """
 
+AGENT_INSTRUCTIONS = get_agent_instructions()
+
 # Greeting templates
-GREETING_MORNING = f"Good morning! Thank you for calling {SALON_NAME}. This is Rahul, your AI assistant. How may I help you today?"
-GREETING_AFTERNOON = f"Good afternoon! Thank you for calling {SALON_NAME}. This is Rahul, your AI assistant. How may I help you today?"
-GREETING_EVENING = f"Good evening! Thank you for calling {SALON_NAME}. This is Rahul, your AI assistant. How may I help you today?"
+GREETING_TEMPLATE = "{time_greeting}! Thank you for calling {salon_name}. This is Rahul, your AI assistant. How may I help you today?"
+GREETING_MORNING = GREETING_TEMPLATE.format(time_greeting="Good morning", salon_name=SALON_NAME)
+GREETING_AFTERNOON = GREETING_TEMPLATE.format(time_greeting="Good afternoon", salon_name=SALON_NAME)
+GREETING_EVENING = GREETING_TEMPLATE.format(time_greeting="Good evening", salon_name=SALON_NAME)
+
+# Fixed phrases spoken while handling unknown questions
+HOLD_MESSAGE = "Let me check that for you, please hold for just a moment..."
+CALLBACK_MESSAGE = "I've noted your question. Our team will call you back with the answer shortly. May I have your phone number?"
+FOLLOW_UP_MESSAGE = "I've noted your question. Our team will follow up with you soon."
+# Spoken when a question is refused by the rate limit: nothing was recorded, so nobody will follow up
+RATE_LIMITED_MESSAGE = "I'm sorry, I can't take any more questions right now. Please call us again a little later."
+
+# Short progress updates played periodically while the caller is on hold
+HOLD_UPDATES = [
+    "Thanks for holding, I'm still checking on that for you.",
+    "Still with me? Our team is looking into it right now.",
+    "Thank you for your patience, just a few more moments.",
+]
+
+# Every phrase that is always spoken word-for-word (pre-rendered by tts_cache)
+FIXED_PHRASES = [
+    GREETING_MORNING,
+    GREETING_AFTERNOON,
+    GREETING_EVENING,
+    HOLD_MESSAGE,
+    CALLBACK_MESSAGE,
+    FOLLOW_UP_MESSAGE,
+    RATE_LIMITED_MESSAGE,
+] + HOLD_UPDATES
+
+def get_greeting_text(time_greeting: str, salon_name: str = SALON_NAME) -> str:
+    """Return the greeting sentence for the given time of day."""
+    if time_greeting not in ("Good morning", "Good afternoon", "Good evening"):
+        time_greeting = "Good morning"
+    return GREETING_TEMPLATE.format(time_greeting=time_greeting, salon_name=salon_name)
+
+def get_fixed_phrases(salon_name: str = SALON_NAME) -> list:
+    """FIXED_PHRASES with the greetings of another salon branch."""
+    greetings = [get_greeting_text(time_greeting, salon_name)
+                 for time_greeting in ("Good morning", "Good afternoon", "Good evening")]
+    return greetings + FIXED_PHRASES[len(greetings):]
+
+def get_callback_instruction(question: str, answer: str, salon_name: str = SALON_NAME) -> str:
+    """Opening instruction for a call placed to deliver a queued answer."""
+    return f"""Say: 'Hello! This is Rahul from {salon_name}, calling back about your question: {question}'
+Then tell them the answer: '{answer}'
+Ask if there is anything else you can help them with. Speak warmly and professionally."""
 
 # Greeting instruction template
-def get_greeting_instruction(time_greeting: str) -> str:
+def get_greeting_instruction(time_greeting: str, salon_name: str = SALON_NAME) -> str:
     """Generate greeting instruction based on time of day."""
-    greeting_map = {
-        "Good morning": GREETING_MORNING,
-        "Good afternoon": GREETING_AFTERNOON,
-        "Good evening": GREETING_EVENING
-    }
-    greeting_text = greeting_map.get(time_greeting, GREETING_MORNING)
+    greeting_text = get_greeting_text(time_greeting, salon_name)
     
     return f"""Say: '{greeting_text}'
 Speak warmly, professionally, and with a welcoming tone. Sound genuinely happy to help them."""
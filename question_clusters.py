@@ -0,0 +1,187 @@
+"""
+Groups pending questions that ask the same thing.
+
+After a promotion goes out, dozens of callers ask variants of one question.
+Each question is embedded locally as a hashed bag of character trigrams and
+words (NumPy, no model download or network). It joins the cluster whose
+centroid it is most similar to, or starts a new one. Vectors are sparse
+(a question has a few dozen features) and the cluster sums form one
+feature-major matrix updated in place, so scoring a question reads only the
+rows of its features. Clustering is incremental: sync() embeds only
+questions it hasn't seen and drops those no longer pending, so refreshing
+the dashboard costs O(new questions x clusters x features per question).
+Each tenant (salon branch) has its own clusterer, kept in
+tenants.tenant_cache.
+"""
+import os
+import re
+import threading
+import zlib
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+import tenants
+
+# Embedding width; hashed features share buckets beyond this
+DIM = 1024
+
+# Cosine similarity to a cluster centroid needed to join it
+THRESHOLD = float(os.getenv("QUESTION_CLUSTER_THRESHOLD", "0.5"))
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# A sparse vector: feature indices and their weights
+SparseVector = Tuple[np.ndarray, np.ndarray]
+
+
+def features(text: str) -> List[int]:
+    """Hashed character-trigram and word features of a text."""
+    words = _WORD_RE.findall(text.lower())
+    padded = f" {' '.join(words)} "
+    grams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+    # Whole words count too, so shared vocabulary outweighs shared fragments
+    return [zlib.crc32(feature.encode('utf-8')) % DIM for feature in grams + [f"w:{w}" for w in words]]
+
+
+def embed(texts: List[str]) -> List[SparseVector]:
+    """L2-normalized hashed n-gram vectors, one sparse (indices, weights) pair per text."""
+    vectors = []
+    for text in texts:
+        indices, counts = np.unique(np.asarray(features(text), dtype=np.intp), return_counts=True)
+        weights = counts.astype(np.float32)
+        norm = np.linalg.norm(weights)
+        vectors.append((indices, weights / norm if norm else weights))
+    return vectors
+
+
+class QuestionClusterer:
+    """Incrementally maintained clusters of pending questions."""
+
+    def __init__(self, threshold: float = THRESHOLD, capacity: int = 64):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._vectors: Dict[str, SparseVector] = {}
+        self._rows: Dict[str, Dict] = {}
+        self._cluster_of: Dict[str, int] = {}
+        self._members: Dict[int, List[str]] = {}
+        # Unnormalized sum of member vectors, one column per cluster, updated in place;
+        # feature-major, so scoring a question reads only the rows of its features
+        self._sums = np.zeros((DIM, capacity), dtype=np.float32)
+        # Norm of each column (0 for a free one)
+        self._norms = np.zeros(capacity, dtype=np.float32)
+        self._column_of: Dict[int, int] = {}
+        self._cluster_at: Dict[int, int] = {}
+        self._free: List[int] = []
+        self._used = 0
+
+    def _new_column(self) -> int:
+        if self._free:
+            return self._free.pop()
+        if self._used == self._sums.shape[1]:
+            grown = np.zeros((DIM, self._used * 2), dtype=np.float32)
+            grown[:, :self._used] = self._sums
+            self._sums = grown
+            self._norms = np.concatenate([self._norms, np.zeros(self._used, dtype=np.float32)])
+        self._used += 1
+        return self._used - 1
+
+    def _add_to(self, column: int, vector: SparseVector, sign: float) -> None:
+        indices, weights = vector
+        self._sums[indices, column] += sign * weights
+        self._norms[column] = np.linalg.norm(self._sums[:, column])
+
+    def _assign(self, question: str, vector: SparseVector) -> None:
+        cluster_id = None
+        if self._column_of:
+            indices, weights = vector
+            dots = weights @ self._sums[indices, :self._used]
+            norms = self._norms[:self._used]
+            similarity = np.divide(dots, norms, out=np.full_like(dots, -1.0), where=norms > 0)
+            best = int(np.argmax(similarity))
+            if similarity[best] >= self.threshold:
+                cluster_id = self._cluster_at[best]
+
+        if cluster_id is None:
+            cluster_id = self._next_id
+            self._next_id += 1
+            self._members[cluster_id] = []
+            column = self._new_column()
+            self._column_of[cluster_id] = column
+            self._cluster_at[column] = cluster_id
+
+        self._members[cluster_id].append(question)
+        self._add_to(self._column_of[cluster_id], vector, 1.0)
+        self._cluster_of[question] = cluster_id
+
+    def _remove(self, question: str) -> None:
+        cluster_id = self._cluster_of.pop(question)
+        column = self._column_of[cluster_id]
+        self._members[cluster_id].remove(question)
+        self._rows.pop(question, None)
+        if self._members[cluster_id]:
+            self._add_to(column, self._vectors.pop(question), -1.0)
+            return
+        # Empty: clear the column exactly rather than leaving rounding residue, and reuse it
+        del self._vectors[question]
+        del self._members[cluster_id]
+        del self._column_of[cluster_id]
+        del self._cluster_at[column]
+        self._sums[:, column] = 0
+        self._norms[column] = 0
+        self._free.append(column)
+
+    def sync(self, rows: Iterable[Dict]) -> None:
+        """
+        Make the clusters match the given pending rows (dicts with at least 'question').
+
+        New questions are embedded in one batch, then each joins or starts a
+        cluster; CPU-bound, so async callers should run it on a worker thread.
+        """
+        with self._lock:
+            current = {row['question']: row for row in rows}
+            for question in [q for q in self._cluster_of if q not in current]:
+                self._remove(question)
+
+            new = [q for q in current if q not in self._cluster_of]
+            for question, vector in zip(new, embed(new)):
+                self._vectors[question] = vector
+                self._assign(question, vector)
+            self._rows = current
+
+    def approx_bytes(self) -> int:
+        with self._lock:
+            # Each feature of a question costs an index (8 bytes) and a weight (4 bytes)
+            vector_bytes = sum(indices.size * 12 + 200 for indices, _ in self._vectors.values())
+            return self._sums.nbytes + self._norms.nbytes + vector_bytes
+
+    def clusters(self) -> List[Dict]:
+        """
+        Current clusters, largest first.
+
+        Returns:
+            Dicts with 'id', 'question' (the most typical member), 'count',
+            'questions', 'callers' and 'first_asked'
+        """
+        with self._lock:
+            result = []
+            for cluster_id, members in self._members.items():
+                column = self._sums[:, self._column_of[cluster_id]]
+                scores = [float(weights @ column[indices]) for indices, weights in (self._vectors[q] for q in members)]
+                representative = members[int(np.argmax(scores))]
+                result.append({
+                    'id': cluster_id,
+                    'question': representative,
+                    'count': len(members),
+                    'questions': list(members),
+                    'callers': [self._rows[q].get('caller_phone', 'unknown') for q in members],
+                    'first_asked': min(self._rows[q].get('timestamp', '') for q in members),
+                })
+            result.sort(key=lambda c: (-c['count'], c['first_asked']))
+            return result
+
+
+def get_clusterer() -> QuestionClusterer:
+    """Clusterer of the tenant being served, shared by every dashboard request for it."""
+    return tenants.tenant_cache.get('clusters', QuestionClusterer)
@@ -0,0 +1,178 @@
+"""
+Orders pending questions by whether their answer can still reach a caller live.
+
+A question whose caller is on hold right now looks the same in the CSV as
+one left last week. wait_for_answer records the start and end of every hold
+in the change feed, along with the time the hold gives up. This module
+follows the feed and gives each pending question a live state:
+
+    on_hold           a caller is waiting for it; hold_remaining seconds left
+    callback_pending  the caller gave up and is queued for a callback
+    waiting           asked recently, nobody waiting on the line
+    stale             asked more than STALE_HOURS ago
+
+Questions are served most urgent first: on hold (least time left first),
+then callbacks, then waiting and stale questions (oldest first). Each tenant
+(salon branch) has its own queue, kept in tenants.tenant_cache.
+"""
+import heapq
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import change_feed
+import knowledge_manager
+import tenants
+from callback_scheduler import pending_callback_questions
+
+logger = logging.getLogger(__name__)
+
+# Questions asked longer ago than this are unlikely to matter to the caller any more
+STALE_HOURS = float(os.getenv("QUESTION_STALE_HOURS", "24"))
+
+# Live states, most urgent first
+ON_HOLD = "on_hold"
+CALLBACK_PENDING = "callback_pending"
+WAITING = "waiting"
+STALE = "stale"
+
+_STATE_RANK = {ON_HOLD: 0, CALLBACK_PENDING: 1, WAITING: 2, STALE: 3}
+
+
+def _key(question: str) -> str:
+    return question.lower().strip()
+
+
+def _asked_at(timestamp: str) -> float:
+    try:
+        return datetime.strptime(timestamp, knowledge_manager.TIMESTAMP_FORMAT).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class PendingQueue:
+    """Live state and priority order of pending questions."""
+
+    def __init__(self, stale_hours: float = STALE_HOURS):
+        self.stale_seconds = stale_hours * 3600
+        self._lock = threading.Lock()
+        self._feed: Optional[change_feed.FeedReader] = None
+        # normalized question -> {caller phone: time the hold gives up}
+        self._holds: Dict[str, Dict[str, float]] = {}
+
+    def _refresh(self, now: float) -> None:
+        feed_file = change_feed.feed_path(knowledge_manager.knowledge_file())
+        if self._feed is None or self._feed.path != feed_file:
+            if self._feed is not None:
+                self._feed.close()
+            # Replay once, so holds that started before this process did are known too
+            self._feed = change_feed.FeedReader(feed_file, from_start=True)
+            self._holds = {}
+
+        for event in self._feed.poll():
+            kind = event.get('event')
+            key = _key(event.get('question', ''))
+            if kind == change_feed.HOLD_STARTED:
+                self._holds.setdefault(key, {})[event.get('caller_phone', 'unknown')] = event.get('until', 0.0)
+            elif kind == change_feed.HOLD_ENDED:
+                callers = self._holds.get(key, {})
+                callers.pop(event.get('caller_phone', 'unknown'), None)
+                if not callers:
+                    self._holds.pop(key, None)
+            elif kind in (change_feed.ANSWERED, change_feed.DELETED, change_feed.EXPIRED):
+                self._holds.pop(key, None)
+
+        # A worker that died mid-hold never records the end; its deadline still passes
+        for key in list(self._holds):
+            callers = {phone: until for phone, until in self._holds[key].items() if until > now}
+            if callers:
+                self._holds[key] = callers
+            else:
+                del self._holds[key]
+
+    def approx_bytes(self) -> int:
+        return 1024 + 200 * sum(len(callers) for callers in self._holds.values())
+
+    def close(self) -> None:
+        with self._lock:
+            if self._feed is not None:
+                self._feed.close()
+                self._feed = None
+
+    def _rank(self, question: str, timestamp: str, now: float, callbacks: set) -> Tuple[Tuple, str, int]:
+        key = _key(question)
+        asked_at = _asked_at(timestamp)
+        holds = self._holds.get(key)
+        if holds:
+            remaining = max(0.0, min(holds.values()) - now)
+            return (_STATE_RANK[ON_HOLD], remaining), ON_HOLD, int(remaining)
+        if key in callbacks:
+            state = CALLBACK_PENDING
+        elif now - asked_at > self.stale_seconds:
+            state = STALE
+        else:
+            state = WAITING
+        return (_STATE_RANK[state], asked_at), state, 0
+
+    def prioritize(self, rows: List[Dict], limit: Optional[int] = None) -> List[Dict]:
+        """
+        Pending rows with their live state, most urgent first.
+
+        Args:
+            rows: Unanswered knowledge base rows
+            limit: Return only this many (cheaper than ordering them all)
+
+        Returns:
+            Copies of the rows with 'state' and 'hold_remaining' (seconds) added
+        """
+        now = time.time()
+        callbacks = pending_callback_questions()
+        with self._lock:
+            self._refresh(now)
+            heap = []
+            for i, row in enumerate(rows):
+                rank, state, remaining = self._rank(row['question'], row.get('timestamp', ''), now, callbacks)
+                heap.append((rank, i, {**row, 'state': state, 'hold_remaining': remaining}))
+
+        if limit is not None:
+            return [item[2] for item in heapq.nsmallest(limit, heap)]
+        heapq.heapify(heap)
+        return [heapq.heappop(heap)[2] for _ in range(len(heap))]
+
+    def prioritize_clusters(self, clusters: List[Dict], rows: List[Dict]) -> List[Dict]:
+        """
+        Order clusters of similar questions by their most urgent member.
+
+        Args:
+            clusters: Output of QuestionClusterer.clusters()
+            rows: The unanswered rows the clusters were built from
+
+        Returns:
+            Copies of the clusters with 'state' and 'hold_remaining' added,
+            most urgent first; larger clusters first within the same state
+        """
+        ranked = {row['question']: row for row in self.prioritize(rows)}
+        order = {question: i for i, question in enumerate(ranked)}
+        heap = []
+        for cluster in clusters:
+            members = [q for q in cluster['questions'] if q in order]
+            if not members:
+                continue
+            first = min(members, key=order.get)
+            row = ranked[first]
+            on_hold = sum(1 for q in members if ranked[q]['state'] == ON_HOLD)
+            heap.append((
+                (_STATE_RANK[row['state']], order[first] if row['state'] == ON_HOLD else -cluster['count'], order[first]),
+                cluster['id'],
+                {**cluster, 'state': row['state'], 'hold_remaining': row['hold_remaining'], 'on_hold': on_hold},
+            ))
+        heapq.heapify(heap)
+        return [heapq.heappop(heap)[2] for _ in range(len(heap))]
+
+
+def get_pending_queue() -> PendingQueue:
+    """Queue of the tenant being served, shared by every dashboard request for it."""
+    return tenants.tenant_cache.get('pending', PendingQueue)
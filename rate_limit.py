@@ -0,0 +1,209 @@
+"""
+Rate limits on new unknown questions.
+
+Every unknown question costs a scan of the knowledge base for duplicates, a
+write, a change feed event and a card on the staff dashboard. A prank caller,
+or an LLM stuck in a loop, can add them faster than staff can read them.
+add_unknown_question therefore checks two token buckets first: one per
+caller and one shared by every caller of the tenant (salon branch). The
+caller bucket holds QUESTION_BURST_PER_CALLER tokens and refills at
+QUESTION_RATE_PER_CALLER per minute; the global bucket does the same with the
+_GLOBAL settings.
+
+Each call may run in its own process, so the buckets are not charged in
+memory: every question recorded is an ADDED event, with its caller_phone, in
+the tenant's change feed, and each tenant's limiter replays the recent events
+and then follows that feed. A question refused, or found to be a duplicate,
+adds no event and so costs no token. Callers without a known number are only
+held to the global limit.
+"""
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Optional
+
+import change_feed
+import tenants
+
+# Set to 0 to accept every question (benchmarks set rate_limit.ENABLED = False)
+ENABLED = os.getenv("QUESTION_RATE_LIMIT", "1") != "0"
+
+# Questions per minute a single caller can keep adding, after an initial burst
+CALLER_RATE = float(os.getenv("QUESTION_RATE_PER_CALLER", "6"))
+CALLER_BURST = float(os.getenv("QUESTION_BURST_PER_CALLER", "5"))
+
+# Questions per minute from all callers together, after an initial burst
+GLOBAL_RATE = float(os.getenv("QUESTION_RATE_GLOBAL", "120"))
+GLOBAL_BURST = float(os.getenv("QUESTION_BURST_GLOBAL", "30"))
+
+# Caller buckets kept; the least recently seen is dropped beyond this
+MAX_TRACKED_CALLERS = 10000
+
+
+class RateLimitExceeded(Exception):
+    """A question was refused because its caller, or everyone together, is over the limit."""
+
+    def __init__(self, scope: str, retry_after: float):
+        self.scope = scope
+        self.retry_after = retry_after
+        super().__init__(f"{scope} question rate limit exceeded, retry in {retry_after:.1f}s")
+
+
+class TokenBucket:
+    """Holds up to capacity tokens, refilled continuously at rate tokens per second."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now: float) -> None:
+        # Events from other processes can arrive slightly out of order
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def take(self, now: float) -> None:
+        """Spend a token; may go below zero when processes raced for the last one."""
+        self.refill(now)
+        self.tokens -= 1
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available (0 if one is now)."""
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float('inf')
+
+
+class QuestionRateLimiter:
+    """Per-caller and global token buckets of one tenant, with counts of what was allowed and refused."""
+
+    def __init__(self, caller_rate: float = CALLER_RATE, caller_burst: float = CALLER_BURST,
+                 global_rate: float = GLOBAL_RATE, global_burst: float = GLOBAL_BURST,
+                 max_callers: int = MAX_TRACKED_CALLERS):
+        self.caller_rate = caller_rate / 60
+        self.caller_burst = caller_burst
+        self.max_callers = max_callers
+        # Events older than this have no effect: every bucket would have refilled since
+        self.horizon = max(
+            caller_burst / self.caller_rate if self.caller_rate > 0 else float('inf'),
+            global_burst * 60 / global_rate if global_rate > 0 else float('inf'),
+        )
+        self._lock = threading.Lock()
+        # Full as of the first event replayed
+        self._global = TokenBucket(global_rate / 60, global_burst, 0.0)
+        self._callers: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._feed: Optional[change_feed.FeedReader] = None
+        self.allowed = 0
+        self.limited_caller = 0
+        self.limited_global = 0
+        self._limited_by_caller: Counter = Counter()
+
+    def _caller_bucket(self, caller: str, now: float) -> TokenBucket:
+        bucket = self._callers.get(caller)
+        if bucket is None:
+            bucket = TokenBucket(self.caller_rate, self.caller_burst, now)
+            self._callers[caller] = bucket
+            while len(self._callers) > self.max_callers:
+                dropped, _ = self._callers.popitem(last=False)
+                self._limited_by_caller.pop(dropped, None)
+        else:
+            self._callers.move_to_end(caller)
+            bucket.refill(now)
+        return bucket
+
+    def _charge(self, caller: Optional[str], ts: float) -> None:
+        self._global.take(ts)
+        if caller:
+            self._caller_bucket(caller, ts).take(ts)
+
+    def refresh(self, feed_file: str) -> None:
+        """
+        Charge the buckets for the questions recorded in a change feed since the last refresh.
+
+        The first refresh replays the feed, and its rotated predecessor, so a
+        new process starts from the questions recent calls added.
+        """
+        if not ENABLED:
+            return
+        with self._lock:
+            events = []
+            if self._feed is None or self._feed.path != feed_file:
+                if self._feed is not None:
+                    self._feed.close()
+                rotated = f"{feed_file}.1"
+                if os.path.exists(rotated):
+                    reader = change_feed.FeedReader(rotated, from_start=True)
+                    events = reader.poll()
+                    reader.close()
+                self._feed = change_feed.FeedReader(feed_file, from_start=True)
+            events.extend(self._feed.poll())
+
+            oldest = time.time() - self.horizon
+            for event in events:
+                if event.get('event') != change_feed.ADDED or event.get('ts', 0) < oldest:
+                    continue
+                caller = event.get('caller_phone')
+                self._charge(caller if caller and caller != 'unknown' else None, event['ts'])
+
+    def check(self, caller: Optional[str]) -> None:
+        """
+        Make sure one more question may be added, without spending a token.
+
+        The token is spent when the question's ADDED event reaches the change
+        feed (see refresh), so call this after refresh and again, under the
+        knowledge base lock, right before recording the question.
+
+        Args:
+            caller: Phone number of the caller (None for callers without a known number)
+
+        Raises:
+            RateLimitExceeded: If the caller's or the global bucket is empty
+        """
+        if not ENABLED:
+            return
+        now = time.time()
+        with self._lock:
+            self._global.refill(now)
+            bucket = self._caller_bucket(caller, now) if caller else None
+
+            if bucket is not None and bucket.tokens < 1:
+                self.limited_caller += 1
+                self._limited_by_caller[caller] += 1
+                raise RateLimitExceeded('caller', bucket.wait_time())
+            if self._global.tokens < 1:
+                self.limited_global += 1
+                raise RateLimitExceeded('global', self._global.wait_time())
+
+    def allow(self) -> None:
+        """Count a question that passed check and was recorded."""
+        with self._lock:
+            self.allowed += 1
+
+    def approx_bytes(self) -> int:
+        return 1024 + 200 * len(self._callers)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._feed is not None:
+                self._feed.close()
+                self._feed = None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'allowed': self.allowed,
+                'limited_caller': self.limited_caller,
+                'limited_global': self.limited_global,
+                'tracked_callers': len(self._callers),
+                'top_limited_callers': dict(self._limited_by_caller.most_common(5)),
+            }
+
+
+def get_question_limiter(tenant: Optional[tenants.Tenant] = None) -> QuestionRateLimiter:
+    """Limiter of a tenant (the one being served by default); refresh it from the tenant's feed before checking."""
+    return tenants.tenant_cache.get('question_limits', QuestionRateLimiter, tenant=tenant)
@@ -0,0 +1,161 @@
+"""
+Cache of LLM replies to repeated caller questions.
+
+Many callers ask the same things (opening hours, prices). A reply is cached
+under the normalized question and the version of the instructions it was
+generated from. The instructions include every answered question from the
+knowledge base, so a change to the prompt or to the answers starts a new
+version and empties the cache. Calls still running on an older version
+bypass the cache rather than thrash it. Entries expire after
+RESPONSE_CACHE_TTL seconds, and the least recently used entry is evicted
+beyond RESPONSE_CACHE_SIZE.
+
+Each tenant (salon branch) has its own cache, kept in tenants.tenant_cache.
+The cache lives in the process hosting the call: only with
+AGENT_JOB_EXECUTOR=thread is it shared by different callers. With the default
+process-per-call executor a reply is only reused within the same call.
+
+Only a caller's opening question is cached, and only when it stands alone: a
+later turn may be an answer to the agent ("yes, Tuesday") or refer back to
+the conversation ("how much is that?"), and a turn whose reply called a tool
+always goes to the LLM.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional, Tuple
+
+import tenants
+
+# Replies kept at once
+MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_SIZE", "500"))
+
+# Seconds a cached reply stays valid
+TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+
+# Set to 0 to always ask the LLM
+ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") != "0"
+
+# Words that change nothing about what is being asked
+FILLER_WORDS = {
+    'um', 'uh', 'er', 'hmm', 'like', 'so', 'well', 'oh', 'okay', 'ok', 'hi', 'hello', 'hey',
+    'please', 'just', 'actually', 'basically', 'thanks', 'thank',
+}
+
+# Words that make a question depend on earlier turns
+CONTEXT_WORDS = {'it', 'its', 'that', 'this', 'those', 'these', 'them', 'they', 'he', 'she', 'him', 'her'}
+
+# Questions shorter than this (after normalizing) are too vague to share an answer
+MIN_WORDS = 2
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def normalize_question(text: str) -> Optional[str]:
+    """
+    Reduce a caller's question to a cache key.
+
+    Returns:
+        The normalized question, or None if it shouldn't be cached
+    """
+    words = [word.strip("'") for word in _WORD_RE.findall(text.lower())]
+    if any(word in CONTEXT_WORDS for word in words):
+        return None
+    words = [word for word in words if word and word not in FILLER_WORDS]
+    if len(words) < MIN_WORDS:
+        return None
+    return " ".join(words)
+
+
+def prompt_version(instructions: str) -> str:
+    """Identify the instructions (prompt plus answered knowledge) a reply was generated from."""
+    return hashlib.sha1(instructions.encode('utf-8')).hexdigest()[:16]
+
+
+class ResponseCache:
+    """LRU + TTL cache of replies, shared by every call hosted in the process."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, ttl: float = TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key -> (reply, stored at, seconds the LLM took to produce it)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, float, float]]" = OrderedDict()
+        self._version: Optional[str] = None
+        self._retired = deque(maxlen=100)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+
+    def _check_version(self, version: str) -> bool:
+        """Switch to a newly seen version; False for a version that has been superseded."""
+        if version == self._version:
+            return True
+        if version in self._retired:
+            return False
+        # New instructions make every older reply stale
+        if self._version is not None:
+            self._retired.append(self._version)
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+        self._version = version
+        return True
+
+    def get(self, question: str, version: str) -> Optional[str]:
+        """Cached reply for a normalized question, or None."""
+        with self._lock:
+            if not self._check_version(version):
+                self.misses += 1
+                return None
+            key = (version, question)
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry[2]
+            return entry[0]
+
+    def put(self, question: str, version: str, reply: str, llm_seconds: float) -> None:
+        with self._lock:
+            if not self._check_version(version):
+                return
+            key = (version, question)
+            self._entries[key] = (reply, time.monotonic(), llm_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def approx_bytes(self) -> int:
+        with self._lock:
+            return sum(len(question) + len(entry[0]) + 200 for (_, question), entry in self._entries.items())
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'llm_seconds_saved': round(self.saved_seconds, 2),
+            }
+
+
+def get_response_cache(tenant: Optional[tenants.Tenant] = None) -> ResponseCache:
+    """Cache of a tenant (the one being served by default), shared by every call to it hosted in this process."""
+    return tenants.tenant_cache.get('responses', ResponseCache, tenant=tenant)
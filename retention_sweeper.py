@@ -0,0 +1,86 @@
+"""
+Expires stale unanswered questions so the knowledge base holds only live ones.
+
+Questions nobody answered pile up: every listing, the monitor and the
+dashboard pay for them on each read. On every tick the sweeper moves, for
+each tenant, questions older than QUESTION_RETENTION_DAYS, and the oldest
+questions of callers with more than MAX_PENDING_PER_CALLER, into the cold
+storage file next to the knowledge base (knowledge_base.expired.csv).
+Questions still waiting for a callback are kept. Each tick expires at most
+RETENTION_BATCH questions per tenant and examines at most RETENTION_SCAN of
+them, so a large backlog is worked off over several ticks instead of in one
+long scan and rewrite. The rewrite holds the knowledge base lock, like every
+other writer.
+
+The web UI runs the sweeper in the background. It can also be run on its own:
+
+Usage:
+    python retention_sweeper.py             # run continuously
+    python retention_sweeper.py --once      # sweep once and exit
+    python retention_sweeper.py --dry-run   # report what would expire
+"""
+import argparse
+import asyncio
+import logging
+import os
+from typing import Dict
+
+import knowledge_manager
+import tenants
+
+logger = logging.getLogger(__name__)
+
+# Most questions expired per tenant per tick
+RETENTION_BATCH = int(os.getenv("RETENTION_BATCH", "1000"))
+
+# Most unanswered questions examined per tenant per tick, oldest first
+RETENTION_SCAN = int(os.getenv("RETENTION_SCAN", "20000"))
+
+# Seconds between sweeps
+RETENTION_INTERVAL = int(os.getenv("RETENTION_INTERVAL", "3600"))
+
+# Set to 0 when the web UI runs several workers, and run this module on its own instead
+SWEEP_IN_WEB_UI = os.getenv("RETENTION_IN_WEB_UI", "1") != "0"
+
+
+def sweep_once(dry_run: bool = False) -> Dict[str, Dict]:
+    """
+    Apply the retention policy to every tenant's knowledge base.
+
+    Returns:
+        Report of knowledge_manager.expire_questions per tenant id
+    """
+    reports = {}
+    for tenant in tenants.all_tenants():
+        try:
+            with tenants.use(tenant):
+                reports[tenant.id] = knowledge_manager.expire_questions(
+                    limit=RETENTION_BATCH, dry_run=dry_run, scan_limit=RETENTION_SCAN
+                )
+        except Exception as e:
+            logger.error(f"Error sweeping questions of tenant {tenant.id}: {e}")
+    return reports
+
+
+async def run_sweeper(interval: int = RETENTION_INTERVAL, once: bool = False, dry_run: bool = False) -> None:
+    """Sweep every interval seconds, on a worker thread so the event loop stays responsive."""
+    while True:
+        reports = await asyncio.to_thread(sweep_once, dry_run)
+        if once:
+            for tenant_id, report in reports.items():
+                print(f"{tenant_id}: {report}")
+            break
+        # A tick that hit the batch limit left more behind; continue soon instead of waiting a full interval
+        backlog = RETENTION_BATCH > 0 and any(report['expired'] >= RETENTION_BATCH for report in reports.values())
+        await asyncio.sleep(min(interval, 5) if backlog else interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Expire stale unanswered questions")
+    parser.add_argument("--once", action="store_true", help="Sweep once and exit")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would expire without changing anything")
+    parser.add_argument("--interval", type=int, default=RETENTION_INTERVAL, help="Seconds between sweeps")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_sweeper(args.interval, once=args.once or args.dry_run, dry_run=args.dry_run))
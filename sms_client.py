@@ -1,15 +1,15 @@
 import os
 import logging
-from twilio.rest import Client
-from dotenv import load_dotenv
 
-load_dotenv()
-
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class SMSClient:
     def __init__(self):
+        # Imported here so importing this module stays cheap until an SMS is actually sent
+        from dotenv import load_dotenv
+        from twilio.rest import Client
+        load_dotenv()
+        
         self.account_sid = os.getenv('TWILIO_SID')
         self.auth_token = os.getenv('TWILIO_SECRET')
         self.from_phone = os.getenv('TWILIO_OUTBOUND')
@@ -41,10 +41,12 @@ def send_notification_for_unanswered():
     import csv
     from datetime import datetime
     
-    KNOWLEDGE_FILE = "knowledge_base.csv"
+    from knowledge_manager import knowledge_file, mark_notified
+    
+    KNOWLEDGE_FILE = knowledge_file()
     
     try:
-        logger.info(f"Checking {KNOWLEDGE_FILE} for questions to notify...")
+        logger.debug(f"Checking {KNOWLEDGE_FILE} for questions to notify...")
         
         if not os.path.exists(KNOWLEDGE_FILE):
             logger.error(f"{KNOWLEDGE_FILE} not found!")
@@ -55,22 +57,25 @@ def send_notification_for_unanswered():
         with open(KNOWLEDGE_FILE, 'r', encoding='utf-8') as f:
             reader = csv.DictReader(f)
             rows = list(reader)
-            logger.info(f"Found {len(rows)} rows in {KNOWLEDGE_FILE}")
+            logger.debug(f"Found {len(rows)} rows in {KNOWLEDGE_FILE}")
         
-        notifications_sent = 0
+        notified = []
+        
+        # Answers for queued callbacks are delivered by callback_scheduler, if one is running
+        from callback_scheduler import pending_callback_questions, scheduler_active
+        awaiting_callback = pending_callback_questions() if scheduler_active() else set()
         
         for i, row in enumerate(rows, 1):
-            logger.info(f"\nChecking row {i}:")
-            logger.info(f"  Question: {row.get('question')}")
-            logger.info(f"  Answered: {row.get('answered')}")
-            logger.info(f"  Answer: {row.get('answer')}")
-            logger.info(f"  Phone: {row.get('caller_phone')}")
-            logger.info(f"  Answered on call: {row.get('answered_on_call')}")
+            logger.debug(
+                f"Checking row {i}: answered={row.get('answered')} "
+                f"answered_on_call={row.get('answered_on_call')} phone={row.get('caller_phone')}"
+            )
             
             if (row.get('answered', '').lower() == 'yes' and 
                 row.get('answered_on_call', 'false').lower() == 'false' and
                 row.get('caller_phone') and 
-                row.get('answer')):
+                row.get('answer') and
+                row.get('question', '').lower().strip() not in awaiting_callback):
                 
                 try:
                     message = (
@@ -80,13 +85,10 @@ def send_notification_for_unanswered():
                         "Thank you for your patience!"
                     )
                     
-                    logger.info(f"Sending SMS to {row['caller_phone']}...")
                     success = sms_client.send_sms(row['caller_phone'], message)
                     
                     if success:
-                        logger.info("SMS sent successfully!")
-                        row['answered_on_call'] = 'true'
-                        notifications_sent += 1
+                        notified.append(row['question'])
                     else:
                         logger.error("Failed to send SMS")
                         
@@ -95,20 +97,19 @@ def send_notification_for_unanswered():
                     import traceback
                     logger.error(traceback.format_exc())
         
-        if notifications_sent > 0:
+        if notified:
+            # Written back under the knowledge base lock, so changes made while sending are kept
             try:
-                with open(KNOWLEDGE_FILE, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.DictWriter(f, fieldnames=reader.fieldnames)
-                    writer.writeheader()
-                    writer.writerows(rows)
-                logger.info(f"Updated {KNOWLEDGE_FILE} with {notifications_sent} notification(s)")
+                mark_notified(notified)
+                logger.info(f"Updated {KNOWLEDGE_FILE} with {len(notified)} notification(s)")
             except Exception as e:
                 logger.error(f"Error updating {KNOWLEDGE_FILE}: {str(e)}")
         else:
-            logger.info("No notifications were sent")
+            logger.debug("No notifications were sent")
                 
     except Exception as e:
         logger.error(f"Error in send_notification_for_unanswered: {str(e)}")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     send_notification_for_unanswered()
@@ -0,0 +1,67 @@
+"""
+In-memory presence of staff dashboards.
+
+Each open dashboard sends a heartbeat with its session id; a session counts
+as present until its heartbeat is older than the TTL. Heartbeats and presence
+queries are amortized O(1): sessions are kept ordered by expiry, so expired
+ones are always at the front. Each tenant (salon branch) has its own
+registry, since only that branch's staff can answer its callers.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict
+
+# Seconds a dashboard stays present after its last heartbeat. Dashboards send one
+# every 10 seconds, but browsers throttle timers in background tabs to about
+# once a minute, so this must stay well above 60
+PRESENCE_TTL = float(os.getenv("STAFF_PRESENCE_TTL", "90"))
+
+
+class PresenceRegistry:
+    """Tracks which staff sessions are currently present."""
+
+    def __init__(self, ttl: float = PRESENCE_TTL):
+        self.ttl = ttl
+        self._expires_at: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        while self._expires_at:
+            session_id, expires_at = next(iter(self._expires_at.items()))
+            if expires_at > now:
+                break
+            del self._expires_at[session_id]
+
+    def heartbeat(self, session_id: str) -> None:
+        """Mark a session present for another TTL seconds."""
+        now = time.monotonic()
+        with self._lock:
+            self._expires_at[session_id] = now + self.ttl
+            self._expires_at.move_to_end(session_id)
+            self._prune(now)
+
+    def leave(self, session_id: str) -> None:
+        """Remove a session immediately, e.g. when the dashboard is closed."""
+        with self._lock:
+            self._expires_at.pop(session_id, None)
+
+    def count(self) -> int:
+        """Number of sessions currently present."""
+        with self._lock:
+            self._prune(time.monotonic())
+            return len(self._expires_at)
+
+
+# Shared by the dashboard process, one per tenant id; never evicted, so no heartbeat is lost
+_registries: Dict[str, PresenceRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def presence_for(tenant_id: str) -> PresenceRegistry:
+    """Presence registry of a tenant's staff."""
+    with _registries_lock:
+        if tenant_id not in _registries:
+            _registries[tenant_id] = PresenceRegistry()
+        return _registries[tenant_id]
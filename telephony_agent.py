@@ -2,7 +2,9 @@ import asyncio
 import logging
 import os
 import sys
+import time
 from datetime import datetime
+from typing import Callable, Optional
 from dotenv import load_dotenv
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -10,152 +12,353 @@ from livekit.agents import (
     Agent,
     AgentSession,
     JobContext,
+    JobExecutorType,
+    RunContext,
     WorkerOptions,
     cli,
-    function_tool
+    function_tool,
+    llm
 )
 from livekit.plugins import deepgram, cartesia, silero
-from prompts import AGENT_INSTRUCTIONS, get_greeting_instruction
-
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+from answer_stats import HOLD_ANSWERED, HOLD_TIMED_OUT
+from answer_waiter import answer_waiter
+from call_session import CallSession
+import async_knowledge as knowledge
+import loop_watchdog
+from logging_config import configure_after_livekit
+from response_cache import ENABLED as RESPONSE_CACHE_ENABLED, get_response_cache, normalize_question, prompt_version
+from rate_limit import RateLimitExceeded, get_question_limiter
+from prompts import (
+    CALLBACK_MESSAGE,
+    FOLLOW_UP_MESSAGE,
+    HOLD_UPDATES,
+    RATE_LIMITED_MESSAGE,
+    SALON_NAME,
+    get_callback_instruction,
+    get_fixed_phrases,
+    get_greeting_instruction,
+    get_greeting_text
 )
+from knowledge_manager import knowledge_file
+import tenants
+from tts_cache import TTSCache
+from worker_load import JOB_EXECUTOR, LOAD_THRESHOLD, compute_load, request_fnc, worker_load
+
 logger = logging.getLogger("telephony-agent")
 load_dotenv()
 
+# Text-to-Speech settings - also used as the pre-rendered audio cache key
+TTS_SETTINGS = {
+    "model": "sonic-2",
+    "voice": "a0e99841-438c-4a64-b679-ae501e7d6091",  # Professional female voice
+    "language": "en",
+    "speed": 1.0,
+    "sample_rate": 24000
+}
+
+# Seconds between progress updates while a caller is on hold
+HOLD_UPDATE_INTERVAL = int(os.getenv("HOLD_UPDATE_INTERVAL", "12"))
+
+# Seconds between checks for a staff answer while the caller is on hold
+ANSWER_CHECK_INTERVAL = float(os.getenv("ANSWER_CHECK_INTERVAL", "3"))
+
+# Dashboard used by staff to answer questions
+WEB_UI_URL = os.getenv("WEB_UI_URL", "http://localhost:8000")
+
+# How long a fetched staff count is reused
+STAFF_COUNT_TTL = 2
+
+# tenant id -> {"value": ..., "fetched_at": ...}
+_staff_count_cache = {}
+
+async def fetch_active_staff() -> Optional[int]:
+    """
+    Ask the dashboard how many of the current tenant's staff are present (sent a recent heartbeat).
+    
+    Returns:
+        Number of present staff sessions, or None if the dashboard can't be reached
+    """
+    now = time.monotonic()
+    tenant_id = tenants.current().id
+    cached = _staff_count_cache.get(tenant_id)
+    if cached and now - cached["fetched_at"] < STAFF_COUNT_TTL:
+        return cached["value"]
+    
+    value = None
+    try:
+        import aiohttp
+        timeout = aiohttp.ClientTimeout(total=0.5)
+        async with aiohttp.ClientSession(timeout=timeout) as http:
+            async with http.get(f"{WEB_UI_URL}/api/presence", params={"tenant": tenant_id}) as response:
+                if response.status == 200:
+                    value = int((await response.json())["online"])
+    except Exception as e:
+        logger.warning(f"Could not fetch active staff count: {e}")
+    
+    _staff_count_cache[tenant_id] = {"value": value, "fetched_at": now}
+    return value
+
 @function_tool
 async def get_current_time() -> str:
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-@function_tool
-async def wait_for_answer(question: str, caller_phone: str = "unknown", max_wait_seconds: int = 60) -> str:
+async def _play_hold_updates(on_hold_update: Callable[[int], None], interval: int) -> None:
+    """Call on_hold_update every interval seconds until cancelled."""
+    update_number = 0
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            on_hold_update(update_number)
+        except Exception as e:
+            logger.error(f"Error playing hold update: {e}")
+        update_number += 1
+
+async def wait_for_answer(
+    question: str,
+    caller_phone: str = "unknown",
+    max_wait_seconds: Optional[int] = None,
+    on_hold_update: Optional[Callable[[int], None]] = None
+) -> str:
+    """
+    Hold the caller while staff answer a question from the dashboard.
+    
+    Args:
+        question: The question that was asked
+        caller_phone: Phone number of the caller
+        max_wait_seconds: Hold budget; chosen from recent answer latencies if None
+        on_hold_update: Called with an increasing counter every
+            HOLD_UPDATE_INTERVAL seconds while the caller is waiting
+    
+    Returns:
+        The answer, or a fallback message for the caller
+    """
+    filler_task = None
+    on_hold = False
+    # Recorded when the hold ends, so later calls size their holds from it (see answer_stats)
+    hold_outcome = {}
     try:
-        from knowledge_manager import add_unknown_question, check_for_answer, mark_question_answered
-        import asyncio
+        check_interval = ANSWER_CHECK_INTERVAL
+        staff_online = await fetch_active_staff()
+        if max_wait_seconds is None:
+            max_wait_seconds = await knowledge.hold_budget(check_interval, staff_online)
+        
+        await knowledge.add_unknown_question(question, caller_phone)
+        asked_at = time.monotonic()
+        
+        if max_wait_seconds <= 0:
+            logger.info(f"No staff online, skipping hold for: {question}")
+            await knowledge.enqueue_callback(question, caller_phone)
+            return CALLBACK_MESSAGE
         
-        logger.info(f"Waiting for answer to: {question}")
-        add_unknown_question(question, caller_phone)
+        logger.info(f"Waiting up to {max_wait_seconds}s for answer to: {question}")
+        # Lets the dashboard put questions with a caller on the line first
+        await knowledge.record_hold_started(question, caller_phone, max_wait_seconds)
+        on_hold = True
         
-        check_interval = 3
-        max_checks = max_wait_seconds // check_interval
+        if on_hold_update is not None:
+            filler_task = asyncio.create_task(_play_hold_updates(on_hold_update, HOLD_UPDATE_INTERVAL))
+        
+        max_checks = int(max_wait_seconds // check_interval)
         
         for i in range(max_checks):
-            answer = check_for_answer(question)
+            answer = await knowledge.check_for_answer(question)
             
             if answer:
                 logger.info(f"Answer found: {answer}")
-                mark_question_answered(question, answered_on_call=False)
+                hold_outcome = {'outcome': HOLD_ANSWERED, 'latency': round(time.monotonic() - asked_at, 2),
+                                'staff_online': staff_online}
+                await knowledge.mark_question_answered(question, answered_on_call=False)
                 
                 try:
-                    from sms_client import send_notification_for_unanswered
                     logger.info("Sending SMS notification...")
-                    send_notification_for_unanswered()
+                    await knowledge.send_notification_for_unanswered()
                 except Exception as e:
                     logger.error(f"Error sending SMS notification: {e}")
                 
                 return f"Great news! {answer}"
             
-            await asyncio.sleep(check_interval)
+            # Returns early when staff answer this question (or its whole cluster)
+            await answer_waiter.wait(question, check_interval)
             
         logger.warning(f"Timeout waiting for answer to: {question}")
-        return "I've noted your question. Our team will call you back with the answer shortly. May I have your phone number?"
+        hold_outcome = {'outcome': HOLD_TIMED_OUT, 'staff_online': staff_online}
+        await knowledge.enqueue_callback(question, caller_phone)
+        return CALLBACK_MESSAGE
         
+    except RateLimitExceeded as e:
+        # No hold and no callback: the question was never recorded
+        logger.warning(f"Not recording question from {caller_phone}: {e}")
+        return RATE_LIMITED_MESSAGE
     except Exception as e:
         logger.error(f"Error in wait_for_answer: {e}")
-        return "I've noted your question. Our team will follow up with you soon."
+        return FOLLOW_UP_MESSAGE
+    finally:
+        if filler_task is not None:
+            filler_task.cancel()
+        if on_hold:
+            try:
+                await knowledge.record_hold_ended(question, caller_phone, **hold_outcome)
+            except Exception as e:
+                logger.error(f"Error recording end of hold: {e}")
 
-async def entrypoint(ctx: JobContext):
-    logger.info("Agent starting...")
-    logger.info("Entrypoint function called")
+@function_tool
+async def wait_for_answer_with_phone(context: RunContext[CallSession], question: str) -> str:
+    """
+    Put the caller on hold while staff answer a question the agent doesn't know.
     
-    import os
-    logger.info(f"Current working directory: {os.getcwd()}")
-    logger.info(f"Knowledge base path: {os.path.abspath('knowledge_base.csv')}")
+    Args:
+        question: The caller's question
     
-    kb_path = os.path.abspath('knowledge_base.csv')
-    if os.path.exists(kb_path):
-        logger.info("Knowledge base file exists")
-        with open(kb_path, 'r') as f:
-            content = f.read()
-            logger.info(f"Knowledge base content:\n{content}")
-    else:
-        logger.error("Knowledge base file does not exist")
+    Returns:
+        The answer if provided, or a fallback message
+    """
+    call = context.userdata
+    session = context.session
+    # Knowledge reads and writes below go to this call's branch
+    tenants.activate(call.tenant or tenants.DEFAULT_TENANT)
     
-    try:
-        logger.info("Attempting to import sms_client...")
-        from sms_client import send_notification_for_unanswered
-        logger.info("Successfully imported sms_client")
-        logger.info("Checking for questions to notify...")
-        import os
-        logger.info(f"Current working directory: {os.getcwd()}")
-        logger.info(f"Knowledge base path: {os.path.abspath('knowledge_base.csv')}")
+    def play_hold_update(update_number: int) -> None:
+        text = HOLD_UPDATES[update_number % len(HOLD_UPDATES)]
+        call.tts_cache.say(session, text, add_to_chat_ctx=False)
+    
+    call.mark("first_hold")
+    call.start_hold(question)
+    held_from = time.monotonic()
+    result = await wait_for_answer(
+        question,
+        caller_phone=call.caller_phone,
+        on_hold_update=play_hold_update
+    )
+    answered = result not in (CALLBACK_MESSAGE, FOLLOW_UP_MESSAGE, RATE_LIMITED_MESSAGE)
+    call.end_hold(question, time.monotonic() - held_from, answered)
+    
+    # Fixed fallback phrases are spoken from pre-rendered audio
+    if not answered:
+        call.tts_cache.say(session, result)
+        return f"You have already told the caller: '{result}'. Do not repeat it."
+    
+    return result
+
+def _opening_question(chat_ctx: llm.ChatContext) -> Optional[str]:
+    """
+    Text of the caller's first turn while it is the last item, i.e. not a tool result.
+    
+    Later turns depend on what was said before, so their replies can't be shared.
+    """
+    if not chat_ctx.items:
+        return None
+    item = chat_ctx.items[-1]
+    if item.type != "message" or item.role != "user":
+        return None
+    if any(other.type == "message" and other.role == "user" for other in chat_ctx.items[:-1]):
+        return None
+    return item.text_content
+
+class FrontDeskAgent(Agent):
+    """Agent that answers repeated opening questions from the response cache."""
+    
+    async def llm_node(self, chat_ctx, tools, model_settings):
+        question = _opening_question(chat_ctx) if RESPONSE_CACHE_ENABLED else None
+        key = normalize_question(question) if question else None
+        version = prompt_version(self.instructions)
+        response_cache = get_response_cache(self.session.userdata.tenant)
         
-        result = send_notification_for_unanswered()
-        logger.info(f"SMS notification function returned: {result}")
-    except ImportError as e:
-        logger.error(f"Failed to import sms_client: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
-    except Exception as e:
-        logger.error(f"Error in SMS notification: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
+        if key:
+            cached = response_cache.get(key, version)
+            if cached is not None:
+                self.session.userdata.cached_replies += 1
+                logger.debug(f"Response cache hit for: {key}")
+                yield cached
+                return
+        
+        started = time.monotonic()
+        parts = []
+        called_tool = False
+        async for chunk in Agent.default.llm_node(self, chat_ctx, tools, model_settings):
+            if isinstance(chunk, llm.ChatChunk) and chunk.delta is not None:
+                called_tool = called_tool or bool(chunk.delta.tool_calls)
+                if chunk.delta.content:
+                    parts.append(chunk.delta.content)
+            elif isinstance(chunk, str):
+                parts.append(chunk)
+            yield chunk
+        
+        # Only reached when the reply finished without being interrupted
+        if key and parts and not called_tool:
+            response_cache.put(key, version, "".join(parts), time.monotonic() - started)
+
+async def entrypoint(ctx: JobContext):
+    logger.info("Agent starting...")
+    logger.info("Entrypoint function called")
     
-    try:
-        from knowledge_manager import archive_answered_questions_to_prompt
-        import os
-        logger.info("Archiving learned knowledge...")
-        prompt_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prompts.py')
-        logger.info(f"Archiving to: {prompt_file}")
-        archive_answered_questions_to_prompt(prompt_file=prompt_file)
-        logger.info("Successfully archived knowledge")
-    except Exception as e:
-        logger.error(f"Error archiving knowledge: {e}")
-        import traceback
-        logger.error(traceback.format_exc())
+    # Watch this call's event loop for lag and blocking callbacks
+    worker_load.watch_loop()
     
     await ctx.connect()
     logger.info(f"Connected to room: {ctx.room.name}")
     
-    caller_phone = "unknown"
-    try:
-        if ctx.room.metadata:
-            import json
-            metadata = json.loads(ctx.room.metadata)
-            caller_phone = metadata.get('caller_phone', 'unknown')
-            logger.info(f"Caller's phone number from room metadata: {caller_phone}")
-        else:
-            logger.warning("No room metadata found, using 'unknown' for caller phone")
-    except Exception as e:
-        logger.error(f"Error reading room metadata: {e}")
+    call = CallSession.from_job(ctx)
+    call.mark("connected")
+    logger.info(f"Caller's phone number from room metadata: {call.caller_phone}")
     
     logger.info("Waiting for participant to join...")
     participant = await ctx.wait_for_participant()
+    call.mark("participant_joined")
     logger.info(f"Phone call connected from participant: {participant.identity}")
     
-    agent_context = {
-        "caller_phone": caller_phone
-    }
+    # One worker pool serves every branch: pick this call's from the room metadata or the dialed number
+    call.tenant = tenants.resolve(call.metadata, participant.attributes)
+    tenants.activate(call.tenant)
+    logger.info(f"Serving tenant: {call.tenant.id}")
     
-    from knowledge_manager import load_additional_knowledge
-    additional_knowledge = load_additional_knowledge()
+    kb_path = os.path.abspath(knowledge_file())
+    if not os.path.exists(kb_path):
+        logger.error(f"Knowledge base file does not exist: {kb_path}")
     
-    full_instructions = AGENT_INSTRUCTIONS + additional_knowledge
+    async def notify_and_archive():
+        try:
+            logger.info("Checking for questions to notify...")
+            result = await knowledge.send_notification_for_unanswered()
+            logger.info(f"SMS notification function returned: {result}")
+        except ImportError as e:
+            logger.error(f"Failed to import sms_client: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+        except Exception as e:
+            logger.error(f"Error in SMS notification: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+        
+        try:
+            logger.info("Archiving learned knowledge...")
+            await knowledge.archive_answered_questions_to_prompt()
+            logger.info("Successfully archived knowledge")
+        except Exception as e:
+            logger.error(f"Error archiving knowledge: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+    
+    # Shares the knowledge thread with the reads below, so they see the files before or after archiving, never halfway
+    housekeeping = asyncio.create_task(notify_and_archive())
     
-    @function_tool
-    async def wait_for_answer_with_phone(question: str) -> str:
-            The answer if provided, or a fallback message
-        """
-        return await wait_for_answer(question, caller_phone=agent_context["caller_phone"])
+    call.kb_version = await knowledge.get_knowledge_version()
+    full_instructions = await knowledge.get_agent_instructions()
     
-    agent = Agent(
+    agent = FrontDeskAgent(
         instructions=full_instructions,
         tools=[get_current_time, wait_for_answer_with_phone]
     )
     
+    # Text-to-Speech - Cartesia Sonic-2, with pre-rendered fixed phrases
+    tts = cartesia.TTS(**TTS_SETTINGS)
+    tts_cache = TTSCache(tts, TTS_SETTINGS)
+    call.tts_cache = tts_cache
+    
     # Configure the voice processing pipeline optimized for telephony
     session = AgentSession(
+        # Per-call state, available to tools as RunContext.userdata
+        userdata=call,
+        
         # Voice Activity Detection
         vad=silero.VAD.load(),
         
@@ -175,17 +378,37 @@ async def entrypoint(ctx: JobContext):
         llm="google/gemini-2.5-pro",
         
         # Text-to-Speech - Cartesia Sonic-2
-        tts=cartesia.TTS(
-            model="sonic-2",
-            voice="a0e99841-438c-4a64-b679-ae501e7d6091",  # Professional female voice
-            language="en",
-            speed=1.0,
-            sample_rate=24000
-        )
+        tts=tts
     )
     
+    async def log_call_summary():
+        logger.info("Call summary", extra={
+            'call': call.summary(),
+            'event_loop': loop_watchdog.watch().metrics(),
+            'response_cache': get_response_cache(call.tenant).stats(),
+            'tenant_cache': tenants.tenant_cache.stats(),
+            'question_rate_limits': get_question_limiter(call.tenant).stats(),
+        })
+        if not housekeeping.done():
+            await housekeeping
+    
+    ctx.add_shutdown_callback(log_call_summary)
+    session.on("metrics_collected", lambda event: worker_load.record_metrics(event.metrics))
+    
     # Start the agent session
     await session.start(agent=agent, room=ctx.room)
+    call.mark("session_started")
+    
+    salon_name = call.tenant.name or SALON_NAME
+    
+    # Callback placed by callback_scheduler: deliver the queued answer first
+    if call.callback:
+        await session.generate_reply(
+            instructions=get_callback_instruction(call.callback['question'], call.callback['answer'], salon_name)
+        )
+        call.mark("greeted")
+        tts_cache.warm_in_background(get_fixed_phrases(salon_name))
+        return
     
     # Generate personalized greeting based on time of day
     import datetime
@@ -197,22 +420,28 @@ async def entrypoint(ctx: JobContext):
     else:
         time_greeting = "Good evening"
     
-    await session.generate_reply(
-        instructions=get_greeting_instruction(time_greeting)
-    )
+    greeting_text = get_greeting_text(time_greeting, salon_name)
+    if await tts_cache.load(greeting_text):
+        # Pre-rendered greeting: no LLM or TTS round trip before first audio
+        tts_cache.say(session, greeting_text)
+    else:
+        await session.generate_reply(
+            instructions=get_greeting_instruction(time_greeting, salon_name)
+        )
+    call.mark("greeted")
+    
+    # Render any missing fixed phrases for the next callers
+    tts_cache.warm_in_background(get_fixed_phrases(salon_name))
 
 if __name__ == "__main__":
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler('telephony_agent.log', mode='w')
-        ]
-    )
+    configure_after_livekit(log_file='telephony_agent.log')
     
     # Run the agent with the name that matches your dispatch rule
     cli.run_app(WorkerOptions(
         entrypoint_fnc=entrypoint,
+        request_fnc=request_fnc,
+        load_fnc=compute_load,
+        load_threshold=LOAD_THRESHOLD,
+        job_executor_type=JobExecutorType(JOB_EXECUTOR),
         agent_name="telephony_agent"  # This must match your dispatch rule
     ))
\ No newline at end of file
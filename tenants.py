@@ -0,0 +1,328 @@
+"""
+Salon branches (tenants) served by one deployment.
+
+Each branch listed in TENANTS_FILE gets its own knowledge base, learned
+knowledge, callback queue and salon details, all kept under its data_dir:
+
+    {
+      "tenants": [
+        {
+          "id": "bandra",
+          "name": "Glamour Studio Bandra",
+          "address": "12 Hill Road, Bandra West, Mumbai",
+          "phone": "+91 820 815 3113",
+          "numbers": ["+918208153113"],
+          "data_dir": "tenants/bandra"
+        }
+      ]
+    }
+
+Without the file (or for calls that match no branch) the original single
+salon is served from prompts.py and knowledge_base.csv, so existing
+deployments keep working unchanged.
+
+The tenant being served is held in a context variable. A call's entrypoint
+activates it once, and everything that call does afterwards, including work
+handed to the knowledge I/O thread, reads and writes that tenant's files.
+Per-tenant in-memory state (prompt caches, suggestion indexes, clusters)
+lives in tenant_cache, which evicts the least recently used entries once
+their estimated size passes TENANT_CACHE_MB. An object larger than the whole
+budget is used but not cached.
+"""
+import contextvars
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TENANTS_FILE = os.getenv("TENANTS_FILE", "tenants.json")
+
+# Memory budget for per-tenant caches and indexes, across all tenants
+CACHE_BUDGET_BYTES = int(float(os.getenv("TENANT_CACHE_MB", "64")) * 1024 * 1024)
+
+# Seconds between re-estimates of a cached object's size when it is used (indexes grow in place)
+CACHE_RESIZE_SECONDS = float(os.getenv("TENANT_CACHE_RESIZE_SECONDS", "5"))
+
+DEFAULT_TENANT_ID = "default"
+
+_NON_DIGITS_RE = re.compile(r"\D")
+
+
+@dataclass(frozen=True)
+class Tenant:
+    """One salon branch. Unset details fall back to those in prompts.py."""
+
+    id: str
+    name: Optional[str] = None
+    address: Optional[str] = None
+    phone: Optional[str] = None
+    hours: Optional[Tuple[Tuple[str, str], ...]] = None
+    numbers: Tuple[str, ...] = ()
+    # None for the original salon, whose files live in the working directory
+    data_dir: Optional[str] = None
+
+    @property
+    def knowledge_file(self) -> Optional[str]:
+        return os.path.join(self.data_dir, "knowledge_base.csv") if self.data_dir else None
+
+    @property
+    def prompt_file(self) -> Optional[str]:
+        return os.path.join(self.data_dir, "learned_qa.py") if self.data_dir else None
+
+    @property
+    def callback_file(self) -> Optional[str]:
+        return os.path.join(self.data_dir, "callback_queue.csv") if self.data_dir else None
+
+
+DEFAULT_TENANT = Tenant(DEFAULT_TENANT_ID)
+
+_current: contextvars.ContextVar[Tenant] = contextvars.ContextVar("tenant", default=DEFAULT_TENANT)
+
+_loaded: Dict = {'mtime': None, 'tenants': {}, 'by_number': {}}
+_load_lock = threading.Lock()
+
+
+def _digits(number: str) -> str:
+    return _NON_DIGITS_RE.sub('', number or '')
+
+
+def _prepare(tenant: Tenant) -> None:
+    """Create a branch's data directory and an empty learned knowledge file."""
+    os.makedirs(tenant.data_dir, exist_ok=True)
+    if not os.path.exists(tenant.prompt_file):
+        with open(tenant.prompt_file, 'w', encoding='utf-8') as f:
+            f.write(f'"""\nLearned knowledge for {tenant.name or tenant.id}.\n"""\n\nLEARNED_QA = """\n"""\n')
+
+
+def load_tenants(path: Optional[str] = None) -> Dict[str, Tenant]:
+    """
+    Tenants configured in TENANTS_FILE, re-read whenever the file changes.
+
+    Returns:
+        Dict of tenant id to Tenant, always including the default tenant
+    """
+    path = path or TENANTS_FILE
+    with _load_lock:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == _loaded['mtime'] and _loaded['tenants']:
+            return _loaded['tenants']
+
+        tenants = {DEFAULT_TENANT_ID: DEFAULT_TENANT}
+        by_number = {}
+        if mtime is not None:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+                for entry in config.get('tenants', []):
+                    tenant = Tenant(
+                        id=entry['id'],
+                        name=entry.get('name'),
+                        address=entry.get('address'),
+                        phone=entry.get('phone'),
+                        hours=tuple(entry['hours'].items()) if entry.get('hours') else None,
+                        numbers=tuple(entry.get('numbers', [])),
+                        data_dir=entry.get('data_dir') or os.path.join("tenants", entry['id']),
+                    )
+                    _prepare(tenant)
+                    tenants[tenant.id] = tenant
+                    for number in tenant.numbers:
+                        by_number[_digits(number)] = tenant
+                logger.info(f"Loaded {len(tenants) - 1} tenants from {path}")
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.error(f"Error loading tenants from {path}: {e}")
+
+        _loaded.update(mtime=mtime, tenants=tenants, by_number=by_number)
+        return tenants
+
+
+def all_tenants() -> List[Tenant]:
+    return list(load_tenants().values())
+
+
+def get_tenant(tenant_id: Optional[str]) -> Optional[Tenant]:
+    """The tenant with this id (the default tenant for an empty id), or None if unknown."""
+    return load_tenants().get(tenant_id or DEFAULT_TENANT_ID)
+
+
+def resolve(metadata: Optional[Dict] = None, attributes: Optional[Dict] = None) -> Tenant:
+    """
+    Work out which branch a call is for.
+
+    Args:
+        metadata: Room or job metadata; 'tenant' names the branch directly,
+            otherwise 'dialed_number' is matched against each branch's numbers
+        attributes: SIP participant attributes, whose sip.trunkPhoneNumber is
+            the number the caller dialed
+
+    Returns:
+        The matching tenant, or the default tenant
+    """
+    metadata = metadata or {}
+    tenants = load_tenants()
+    if metadata.get('tenant'):
+        tenant = tenants.get(metadata['tenant'])
+        if tenant is not None:
+            return tenant
+        logger.warning(f"Unknown tenant in metadata: {metadata['tenant']}")
+
+    dialed = metadata.get('dialed_number') or (attributes or {}).get('sip.trunkPhoneNumber')
+    return _loaded['by_number'].get(_digits(dialed), DEFAULT_TENANT) if dialed else DEFAULT_TENANT
+
+
+def current() -> Tenant:
+    """The tenant being served in this context."""
+    return _current.get()
+
+
+def activate(tenant: Tenant) -> contextvars.Token:
+    """Serve this tenant for the rest of the current context (a call's task, a request)."""
+    return _current.set(tenant)
+
+
+@contextmanager
+def use(tenant: Tenant):
+    """Serve this tenant inside a with block."""
+    token = _current.set(tenant)
+    try:
+        yield tenant
+    finally:
+        _current.reset(token)
+
+
+def approx_bytes(value) -> int:
+    """Estimated memory held by a cached value; objects report their own through approx_bytes()."""
+    if hasattr(value, 'approx_bytes'):
+        return value.approx_bytes()
+    if isinstance(value, tuple):
+        return sum(sys.getsizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class TenantCache:
+    """LRU of per-tenant objects that shares one memory budget across every tenant."""
+
+    def __init__(self, budget_bytes: int = CACHE_BUDGET_BYTES, resize_seconds: float = CACHE_RESIZE_SECONDS):
+        self.budget_bytes = budget_bytes
+        self.resize_seconds = resize_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], object]" = OrderedDict()
+        self._sizes: Dict[Tuple[str, str], int] = {}
+        # When each entry's size was last estimated (time.monotonic())
+        self._measured: Dict[Tuple[str, str], float] = {}
+        # One lock per key, so each object is built once without holding up other lookups
+        self._building: Dict[Tuple[str, str], threading.Lock] = {}
+        self.evictions = 0
+        self.oversized = 0
+
+    def get(self, kind: str, build: Callable[[], object], tenant: Optional[Tenant] = None):
+        """
+        The current tenant's object of this kind, built on first use.
+
+        The build runs outside the cache lock. An object's size is estimated
+        when it is added, and again when it is used at least resize_seconds
+        after the last estimate, since indexes grow as they are used; older
+        entries are then evicted until the total fits the budget.
+        """
+        key = (kind, (tenant or current()).id)
+        value = self._lookup(key)
+        if value is not None:
+            if time.monotonic() - self._measured.get(key, 0.0) >= self.resize_seconds:
+                self._admit(key, value, replace=False)
+            return value
+
+        with self._lock:
+            building = self._building.setdefault(key, threading.Lock())
+        with building:
+            # Another thread may have built it while this one waited
+            value = self._lookup(key)
+            if value is not None:
+                return value
+            value = build()
+            self._admit(key, value)
+            return value
+
+    def put(self, kind: str, value, tenant: Optional[Tenant] = None) -> None:
+        key = (kind, (tenant or current()).id)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            self._sizes.pop(key, None)
+            if old is not None and old is not value:
+                self._close(old)
+        self._admit(key, value)
+
+    def _lookup(self, key: Tuple[str, str]):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def _admit(self, key: Tuple[str, str], value, replace: bool = True) -> None:
+        """
+        Record the size of an object (estimated outside the cache lock), caching it
+        if it fits the budget, then evict down to the budget.
+
+        With replace=False the entry is only re-measured if it is still the cached one.
+        """
+        size = approx_bytes(value)
+        with self._lock:
+            if not replace and self._entries.get(key) is not value:
+                return
+            self._measured[key] = time.monotonic()
+            if size > self.budget_bytes:
+                # Caching it would evict every other entry and then itself. Not closed: the caller is using it
+                self._entries.pop(key, None)
+                self._sizes.pop(key, None)
+                self.oversized += 1
+                logger.warning(
+                    f"Not caching {key[0]} of tenant {key[1]}: about {size} bytes, "
+                    f"over the {self.budget_bytes} byte budget"
+                )
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            self._evict(keep=key)
+
+    def _close(self, value) -> None:
+        close = getattr(value, 'close', None)
+        if close is not None:
+            close()
+
+    def _evict(self, keep: Tuple[str, str]) -> None:
+        while sum(self._sizes.values()) > self.budget_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            if key == keep:
+                self._entries.move_to_end(key)
+                key = next(iter(self._entries))
+            self._close(self._entries.pop(key))
+            del self._sizes[key]
+            self._measured.pop(key, None)
+            self.evictions += 1
+            logger.debug(f"Evicted {key[0]} of tenant {key[1]} from the tenant cache")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': sum(self._sizes.values()),
+                'budget_bytes': self.budget_bytes,
+                'evictions': self.evictions,
+                'oversized': self.oversized,
+            }
+
+
+# Shared by every call and dashboard request in this process
+tenant_cache = TenantCache()
@@ -0,0 +1,20 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from answer_suggestions import SuggestionIndex
+
+
+def test_suggests_from_single_entry_index(tmp_path, monkeypatch):
+    # With one entry every feature is in all entries; the rough pass must still score it
+    monkeypatch.chdir(tmp_path)
+    prompt_file = tmp_path / "prompts.py"
+    prompt_file.write_text(
+        'LEARNED_QA = """\nQ: Do you have parking available?\nA: Yes, free for two hours.\n"""\n',
+        encoding='utf-8',
+    )
+
+    suggestions = SuggestionIndex(prompt_file=str(prompt_file)).suggest("Do you have parking?")
+
+    assert [s['answer'] for s in suggestions] == ["Yes, free for two hours."]
@@ -0,0 +1,81 @@
+import os
+import sys
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import change_feed
+from change_feed import FeedReader
+from file_lock import locked
+
+
+def test_reader_follows_feed_across_rotation(tmp_path, monkeypatch):
+    monkeypatch.setattr(change_feed, 'MAX_BYTES', 200)
+    path = str(tmp_path / "kb.changes.jsonl")
+    reader = FeedReader(path)
+
+    for i in range(5):
+        change_feed.append(path, change_feed.ADDED, question=f"q{i}")
+    seen = [event['question'] for event in reader.poll()]
+
+    # Large enough to rotate on the next append
+    for i in range(5, 20):
+        change_feed.append(path, change_feed.ADDED, question=f"q{i}")
+        if i % 4 == 0:
+            seen += [event['question'] for event in reader.poll()]
+    seen += [event['question'] for event in reader.poll()]
+
+    assert os.path.exists(f"{path}.1")
+    assert seen == [f"q{i}" for i in range(20)]
+    reader.close()
+
+
+def test_concurrent_rotation_keeps_rotated_events(tmp_path, monkeypatch):
+    path = str(tmp_path / "kb.changes.jsonl")
+    for i in range(10):
+        change_feed.append(path, change_feed.ADDED, question=f"old{i}")
+    monkeypatch.setattr(change_feed, 'MAX_BYTES', 500)
+
+    # Every writer sees the oversized feed before any of them rotates it
+    writers = 4
+    barrier = threading.Barrier(writers)
+    checked = threading.local()
+    getsize = os.path.getsize
+
+    def getsize_then_wait(p):
+        size = getsize(p)
+        if not getattr(checked, 'done', False):
+            checked.done = True
+            barrier.wait(5)
+        return size
+
+    monkeypatch.setattr(change_feed.os.path, 'getsize', getsize_then_wait)
+    threads = [threading.Thread(target=change_feed.append, args=(path, change_feed.ADDED), kwargs={'question': f"new{i}"})
+               for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with open(f"{path}.1", encoding='utf-8') as f:
+        rotated = f.read()
+    assert all(f'"old{i}"' in rotated for i in range(10))
+
+
+def test_lock_is_reentrant_within_a_thread(tmp_path):
+    path = str(tmp_path / "kb.csv")
+    with locked(path):
+        with locked(path):
+            pass
+        # Still held by this thread after the inner block: another thread must wait
+        acquired = threading.Event()
+
+        def other():
+            with locked(path):
+                acquired.set()
+
+        thread = threading.Thread(target=other)
+        thread.start()
+        assert not acquired.wait(0.2)
+    thread.join(2)
+    assert acquired.is_set()
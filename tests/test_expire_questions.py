@@ -0,0 +1,100 @@
+import csv
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import callback_scheduler
+import knowledge_manager as km
+
+OLD = "2020-01-01 00:00:00"
+
+
+@pytest.fixture
+def kb(tmp_path, monkeypatch):
+    monkeypatch.setattr(km, 'KNOWLEDGE_FILE', str(tmp_path / "knowledge_base.csv"))
+    monkeypatch.setattr(callback_scheduler, 'CALLBACK_FILE', str(tmp_path / "callback_queue.csv"))
+
+    def write(rows):
+        with open(km.KNOWLEDGE_FILE, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(km.FIELDNAMES)
+            for question, timestamp, phone, answered in rows:
+                writer.writerow([question, 'yes' if answered == 'yes' else '', answered, timestamp, phone, 'false'])
+    return write
+
+
+def recent(minutes: int) -> str:
+    return (datetime.now() - timedelta(minutes=minutes)).strftime(km.TIMESTAMP_FORMAT)
+
+
+def remaining():
+    return [row['question'] for row in km.iter_questions()]
+
+
+def test_expires_old_unanswered_questions_only(kb):
+    kb([("old", OLD, "+1", "no"), ("old answered", OLD, "+1", "yes"), ("new", recent(1), "+1", "no")])
+
+    report = km.expire_questions(max_age_days=30, max_per_caller=0)
+
+    assert report['expired'] == report['expired_age'] == 1
+    assert remaining() == ["old answered", "new"]
+    with open(km.expired_file(), encoding='utf-8') as f:
+        expired = list(csv.DictReader(f))
+    assert [(row['question'], row['reason']) for row in expired] == [("old", "age")]
+
+
+def test_per_caller_cap_expires_oldest_first(kb):
+    kb([(f"q{i}", recent(10 - i), "+1", "no") for i in range(5)] + [("other", recent(1), "+2", "no")])
+
+    report = km.expire_questions(max_age_days=0, max_per_caller=2)
+
+    assert report['expired_cap'] == 3
+    assert remaining() == ["q3", "q4", "other"]
+
+
+def test_unknown_callers_are_not_capped(kb):
+    kb([(f"q{i}", recent(10 - i), "unknown", "no") for i in range(5)])
+
+    assert km.expire_questions(max_age_days=0, max_per_caller=2)['expired'] == 0
+
+
+def test_limit_bounds_questions_expired(kb):
+    kb([(f"q{i}", OLD, "+1", "no") for i in range(10)])
+
+    report = km.expire_questions(max_age_days=30, max_per_caller=0, limit=3)
+
+    assert report['expired'] == 3
+    assert len(remaining()) == 7
+
+
+def test_scan_limit_bounds_questions_examined(kb):
+    kb([(f"q{i}", OLD, "+1", "no") for i in range(10)])
+
+    report = km.expire_questions(max_age_days=30, max_per_caller=0, scan_limit=4)
+
+    assert report['scanned'] == 4 and report['expired'] == 4
+    assert remaining() == [f"q{i}" for i in range(4, 10)]
+
+
+def test_dry_run_changes_nothing(kb):
+    kb([("old", OLD, "+1", "no")])
+
+    report = km.expire_questions(max_age_days=30, max_per_caller=0, dry_run=True)
+
+    assert report['expired'] == 1
+    assert remaining() == ["old"]
+    assert not os.path.exists(km.expired_file())
+
+
+def test_keeps_questions_with_pending_callback(kb):
+    kb([("waiting", OLD, "+1", "no"), ("stale", OLD, "+2", "no")])
+    callback_scheduler.enqueue_callback("waiting", "+1")
+
+    report = km.expire_questions(max_age_days=30, max_per_caller=0)
+
+    assert report['expired'] == 1
+    assert remaining() == ["waiting"]
@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+import change_feed
+import knowledge_manager as km
+import rate_limit
+import tenants
+from rate_limit import QuestionRateLimiter, RateLimitExceeded, TokenBucket
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(1_000_000.0)
+    monkeypatch.setattr(time, 'time', clock)
+    monkeypatch.setattr(rate_limit, 'ENABLED', True)
+    return clock
+
+
+def add(feed: str, caller: str) -> None:
+    change_feed.append(feed, change_feed.ADDED, question="q", caller_phone=caller)
+
+
+def test_token_bucket_refills_up_to_capacity():
+    bucket = TokenBucket(rate=1.0, capacity=2, now=0.0)
+    bucket.take(0.0)
+    bucket.take(0.0)
+    assert bucket.wait_time() == pytest.approx(1.0)
+
+    bucket.refill(0.5)
+    assert bucket.tokens == pytest.approx(0.5)
+    # An earlier event arriving late neither refills nor rewinds the bucket
+    bucket.refill(0.2)
+    assert bucket.tokens == pytest.approx(0.5) and bucket.updated == 0.5
+
+    bucket.refill(100.0)
+    assert bucket.tokens == 2 and bucket.wait_time() == 0.0
+
+
+def test_caller_is_refused_after_burst_and_allowed_after_refill(tmp_path, clock):
+    feed = str(tmp_path / "kb.changes.jsonl")
+    limiter = QuestionRateLimiter(caller_rate=6, caller_burst=2, global_rate=600, global_burst=100)
+    add(feed, "+1")
+    add(feed, "+1")
+    limiter.refresh(feed)
+
+    with pytest.raises(RateLimitExceeded) as refused:
+        limiter.check("+1")
+    assert refused.value.scope == 'caller'
+    assert refused.value.retry_after == pytest.approx(10.0)
+    limiter.check("+2")
+
+    # 6 a minute: one token back after 10 seconds
+    clock.now += 10
+    limiter.check("+1")
+    assert limiter.stats()['limited_caller'] == 1
+
+
+def test_global_limit_covers_every_caller(tmp_path, clock):
+    feed = str(tmp_path / "kb.changes.jsonl")
+    limiter = QuestionRateLimiter(caller_rate=60, caller_burst=5, global_rate=60, global_burst=3)
+    for caller in ("+1", "+2", "unknown"):
+        add(feed, caller)
+    limiter.refresh(feed)
+
+    with pytest.raises(RateLimitExceeded) as refused:
+        limiter.check("+4")
+    assert refused.value.scope == 'global'
+
+
+def test_new_process_sees_recent_questions_only(tmp_path, clock):
+    feed = str(tmp_path / "kb.changes.jsonl")
+    add(feed, "+1")
+    clock.now += 600
+    add(feed, "+1")
+    add(feed, "+1")
+
+    # A fresh limiter, as in the next call's process, replays the feed
+    limiter = QuestionRateLimiter(caller_rate=6, caller_burst=3, global_rate=600, global_burst=100)
+    limiter.refresh(feed)
+    limiter.check("+1")
+    add(feed, "+1")
+    limiter.refresh(feed)
+    with pytest.raises(RateLimitExceeded):
+        limiter.check("+1")
+
+
+def test_duplicates_and_refusals_cost_no_token(tmp_path, monkeypatch, clock):
+    monkeypatch.setattr(km, 'KNOWLEDGE_FILE', str(tmp_path / "knowledge_base.csv"))
+    monkeypatch.setattr(tenants, 'tenant_cache', tenants.TenantCache())
+    tenants.tenant_cache.put('question_limits', QuestionRateLimiter(caller_burst=2))
+    assert km.add_unknown_question("Do you do nails?", "+1")
+    for _ in range(5):
+        assert not km.add_unknown_question("Do you do nails?", "+1")
+    assert km.add_unknown_question("Is there parking?", "+1")
+
+    with pytest.raises(RateLimitExceeded):
+        km.add_unknown_question("Are you open Sunday?", "+1")
+    assert [row['question'] for row in km.iter_questions()] == ["Do you do nails?", "Is there parking?"]
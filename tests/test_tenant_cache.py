@@ -0,0 +1,70 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from tenants import Tenant, TenantCache
+
+
+class Sized:
+    def __init__(self, size):
+        self.size = size
+        self.closed = False
+
+    def approx_bytes(self):
+        return self.size
+
+    def close(self):
+        self.closed = True
+
+
+TENANT = Tenant(id="bandra")
+
+
+def test_evicts_least_recently_used_to_fit_budget():
+    cache = TenantCache(budget_bytes=100)
+    first = cache.get('a', lambda: Sized(40), tenant=TENANT)
+    cache.get('b', lambda: Sized(40), tenant=TENANT)
+    # Using 'a' makes 'b' the least recently used
+    assert cache.get('a', lambda: Sized(40), tenant=TENANT) is first
+
+    cache.get('c', lambda: Sized(40), tenant=TENANT)
+
+    stats = cache.stats()
+    assert stats['entries'] == 2 and stats['bytes'] == 80 and stats['evictions'] == 1
+    assert cache.get('a', lambda: Sized(40), tenant=TENANT) is first
+
+
+def test_object_over_budget_is_not_cached_and_evicts_nothing():
+    cache = TenantCache(budget_bytes=100)
+    small = cache.get('small', lambda: Sized(30), tenant=TENANT)
+
+    huge = cache.get('huge', lambda: Sized(500), tenant=TENANT)
+
+    assert not huge.closed
+    assert cache.get('huge', lambda: Sized(500), tenant=TENANT) is not huge
+    assert cache.get('small', lambda: Sized(30), tenant=TENANT) is small
+    assert cache.stats()['evictions'] == 0
+    assert cache.stats()['oversized'] == 2
+
+
+def test_growth_is_noticed_on_access():
+    cache = TenantCache(budget_bytes=100, resize_seconds=0)
+    index = cache.get('index', lambda: Sized(30), tenant=TENANT)
+    other = cache.get('other', lambda: Sized(30), tenant=TENANT)
+
+    index.size = 90
+    cache.get('index', lambda: Sized(0), tenant=TENANT)
+
+    assert cache.stats()['bytes'] == 90
+    assert other.closed
+
+
+def test_size_is_not_re_estimated_within_resize_interval():
+    cache = TenantCache(budget_bytes=100, resize_seconds=3600)
+    index = cache.get('index', lambda: Sized(30), tenant=TENANT)
+
+    index.size = 90
+    cache.get('index', lambda: Sized(0), tenant=TENANT)
+
+    assert cache.stats()['bytes'] == 30
@@ -0,0 +1,229 @@
+"""
+Local cache of pre-synthesized audio for phrases the agent always speaks verbatim.
+
+Greetings and hold/fallback messages never change between calls, so they are
+synthesized once, stored as WAV files and streamed straight into the session.
+Time-to-first-audio then no longer depends on LLM + TTS latency.
+
+Files are read and checked on a worker thread before a phrase counts as
+cached; a truncated or corrupt file is deleted and rendered again, and the
+phrase is spoken with live TTS meanwhile.
+"""
+import asyncio
+import contextlib
+import hashlib
+import logging
+import os
+import wave
+from typing import AsyncIterator, Dict, Iterable, Optional
+
+from livekit import rtc
+
+logger = logging.getLogger(__name__)
+
+TTS_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_cache")
+
+# Frame size used when streaming cached audio back into the session
+FRAME_DURATION_MS = 20
+
+
+class TTSCache:
+    """
+    Disk-backed cache of synthesized phrases.
+
+    Entries are keyed by the TTS settings (model, voice, speed, language,
+    sample rate) and a hash of the text, so changing the voice or speed
+    never plays stale audio.
+    """
+
+    def __init__(self, tts, settings: Dict, cache_dir: str = TTS_CACHE_DIR):
+        """
+        Args:
+            tts: TTS plugin instance used to synthesize missing phrases
+            settings: The keyword arguments the TTS instance was built with
+            cache_dir: Directory holding the cached WAV files
+        """
+        self.tts = tts
+        self.settings = settings
+        self.cache_dir = cache_dir
+        self.sample_rate = int(settings.get('sample_rate', 24000))
+        self._pcm: Dict[str, bytes] = {}
+        self._warming: Dict[str, asyncio.Task] = {}
+
+    def key(self, text: str) -> str:
+        """Build the cache key for a phrase under the current TTS settings."""
+        parts = [
+            str(self.settings.get('model', '')),
+            str(self.settings.get('voice', '')),
+            str(self.settings.get('speed', '')),
+            str(self.settings.get('language', '')),
+            str(self.settings.get('sample_rate', '')),
+            text.strip(),
+        ]
+        return hashlib.sha256("|".join(parts).encode('utf-8')).hexdigest()[:32]
+
+    def _path(self, text: str) -> str:
+        return os.path.join(self.cache_dir, f"{self.key(text)}.wav")
+
+    def has(self, text: str) -> bool:
+        """Check whether a phrase is loaded and ready to play."""
+        return self.key(text) in self._pcm
+
+    def _read(self, path: str) -> Optional[bytes]:
+        """Read a cached WAV file, deleting it if it is truncated or not in the expected format."""
+        try:
+            with wave.open(path, 'rb') as wav:
+                if (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()) != (1, 2, self.sample_rate):
+                    raise wave.Error("unexpected audio format")
+                expected = wav.getnframes() * 2
+                pcm = wav.readframes(wav.getnframes())
+            if not pcm or len(pcm) != expected:
+                raise wave.Error(f"truncated ({len(pcm)} of {expected} bytes)")
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, wave.Error) as e:
+            logger.warning(f"Discarding unreadable TTS cache entry {path}: {e}")
+            with contextlib.suppress(OSError):
+                os.remove(path)
+            return None
+        return pcm
+
+    def _write(self, path: str, pcm: bytes) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        try:
+            with wave.open(tmp_path, 'wb') as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(self.sample_rate)
+                wav.writeframes(pcm)
+            os.replace(tmp_path, path)
+        except OSError:
+            # Don't leave a partial file behind
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    async def load(self, text: str) -> bool:
+        """
+        Load a rendered phrase from disk, off the event loop.
+
+        Returns:
+            True if the phrase is ready to play
+        """
+        key = self.key(text)
+        if key in self._pcm:
+            return True
+        pcm = await asyncio.to_thread(self._read, self._path(text))
+        if pcm is None:
+            return False
+        self._pcm[key] = pcm
+        return True
+
+    async def frames(self, text: str) -> AsyncIterator[rtc.AudioFrame]:
+        """Stream a loaded phrase as audio frames."""
+        pcm = self._pcm.get(self.key(text), b"")
+        sample_rate = self.sample_rate
+        samples_per_frame = sample_rate * FRAME_DURATION_MS // 1000
+        bytes_per_frame = samples_per_frame * 2  # mono, 16-bit
+
+        for offset in range(0, len(pcm), bytes_per_frame):
+            chunk = pcm[offset:offset + bytes_per_frame]
+            yield rtc.AudioFrame(
+                data=chunk,
+                sample_rate=sample_rate,
+                num_channels=1,
+                samples_per_channel=len(chunk) // 2
+            )
+
+    async def render(self, text: str) -> bool:
+        """
+        Synthesize a phrase and store it in the cache.
+
+        Returns:
+            True if the phrase is available in the cache afterwards
+        """
+        if await self.load(text):
+            return True
+
+        pcm = bytearray()
+        try:
+            async with self.tts.synthesize(text) as stream:
+                async for event in stream:
+                    frame = event.frame
+                    if frame.num_channels != 1:
+                        logger.warning("Skipping TTS cache for non-mono audio")
+                        return False
+                    pcm.extend(bytes(frame.data))
+        except Exception as e:
+            logger.error(f"Failed to pre-render phrase '{text[:40]}': {e}")
+            return False
+
+        if not pcm:
+            return False
+
+        try:
+            await asyncio.to_thread(self._write, self._path(text), bytes(pcm))
+        except OSError as e:
+            # A full disk or read-only cache directory
+            logger.error(f"Failed to store pre-rendered phrase '{text[:40]}': {e}")
+            return False
+
+        self._pcm[self.key(text)] = bytes(pcm)
+        logger.info(f"Pre-rendered phrase: '{text[:40]}...'")
+        return True
+
+    async def warm(self, texts: Iterable[str]) -> int:
+        """
+        Make sure every phrase is rendered.
+
+        Returns:
+            Number of phrases available in the cache
+        """
+        available = 0
+        for text in texts:
+            if await self.render(text):
+                available += 1
+        return available
+
+    def warm_in_background(self, texts: Iterable[str]) -> None:
+        """Load or render missing phrases without blocking the caller."""
+        missing = [text for text in texts if not self.has(text) and self.key(text) not in self._warming]
+        for text in missing:
+            key = self.key(text)
+            task = asyncio.create_task(self.render(text))
+            self._warming[key] = task
+            task.add_done_callback(lambda _t, k=key: self._warming.pop(k, None))
+
+    def say(self, session, text: str, **kwargs):
+        """
+        Speak a fixed phrase, using cached audio when available.
+
+        Falls back to live TTS when the phrase is not loaded, and loads or
+        renders it in the background so the next time hits the cache.
+        """
+        if self.has(text):
+            return session.say(text, audio=self.frames(text), **kwargs)
+
+        self.warm_in_background([text])
+        return session.say(text, **kwargs)
+
+
+async def _warm_all():
+    import aiohttp
+    from livekit.plugins import cartesia
+    from dotenv import load_dotenv
+    from prompts import FIXED_PHRASES
+    from telephony_agent import TTS_SETTINGS
+
+    load_dotenv()
+    async with aiohttp.ClientSession() as http_session:
+        tts = cartesia.TTS(**TTS_SETTINGS, http_session=http_session)
+        cache = TTSCache(tts, TTS_SETTINGS)
+        available = await cache.warm(FIXED_PHRASES)
+        print(f"{available}/{len(FIXED_PHRASES)} phrases cached in {cache.cache_dir}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_warm_all())
@@ -0,0 +1,114 @@
+"""
+Import-time budget check for every entry point.
+
+Runs `python -X importtime` on each entry module in a fresh interpreter and
+fails if one can't be imported, if its cumulative import time exceeds its
+budget, or if a lightweight entry point pulls in a heavy dependency (like
+the Twilio SDK) at import.
+
+Usage:
+    python utils/check_import_time.py          # exit code 1 on any failure or regression
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budget in milliseconds for each entry module (best of RUNS)
+BUDGETS_MS = {
+    'knowledge_manager': 60,
+    'sms_client': 60,
+    'manage_knowledge': 80,
+    'quick_answer': 80,
+    'monitor_questions': 80,
+    'frontdesk': 80,
+    'callback_scheduler': 200,
+    'web_ui': 1500,
+    'make_outbound_call_with_agent': 1500,
+    'campaign_dialer': 1500,
+    'telephony_agent': 6000,
+}
+
+# Modules an entry point must not import until it actually needs them
+FORBIDDEN_IMPORTS = {
+    'knowledge_manager': {'twilio', 'dotenv'},
+    'sms_client': {'twilio', 'dotenv'},
+    'manage_knowledge': {'twilio', 'dotenv'},
+    'quick_answer': {'twilio', 'dotenv'},
+    'monitor_questions': {'twilio', 'dotenv'},
+    'frontdesk': {'twilio', 'dotenv'},
+}
+
+RUNS = 3
+
+
+def measure(module: str):
+    """
+    Import a module in a fresh interpreter.
+
+    Returns:
+        Tuple of (cumulative import time in ms, set of top-level packages imported)
+    """
+    code = (
+        f"import sys; sys.path[:0] = [{ROOT!r}, {os.path.join(ROOT, 'utils')!r}]; "
+        f"import {module}"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=ROOT
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    cumulative_us = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = [part.strip() for part in line[len("import time:"):].split("|")]
+        if not parts[1].isdigit():
+            continue  # header line
+        name = parts[2]
+        imported.add(name.strip().split('.')[0])
+        if name == module:
+            cumulative_us = int(parts[1])
+
+    return (cumulative_us or 0) / 1000, imported
+
+
+def main() -> int:
+    failures = []
+    print(f"{'module':<32} {'ms':>9} {'budget':>9}")
+    for module, budget in BUDGETS_MS.items():
+        try:
+            runs = [measure(module) for _ in range(RUNS)]
+        except RuntimeError as e:
+            # A module that can't be imported is a failed entry point, not one within budget
+            print(f"{module:<32} {'FAILED':>9}   ({str(e).splitlines()[-1]})")
+            failures.append(f"{module} failed to import: {str(e).splitlines()[-1]}")
+            continue
+
+        best_ms = min(ms for ms, _ in runs)
+        imported = runs[0][1]
+        status = "ok" if best_ms <= budget else "OVER BUDGET"
+        print(f"{module:<32} {best_ms:>9.1f} {budget:>9}  {status}")
+        if best_ms > budget:
+            failures.append(f"{module} took {best_ms:.1f}ms (budget {budget}ms)")
+
+        forbidden = FORBIDDEN_IMPORTS.get(module, set()) & imported
+        if forbidden:
+            failures.append(f"{module} imports {', '.join(sorted(forbidden))} at import time")
+
+    if failures:
+        print("\nImport-time failures and regressions:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+
+    print("\nAll entry points within budget.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
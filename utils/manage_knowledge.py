@@ -4,8 +4,7 @@ Use this to view and answer questions.
 """
 import sys
 from knowledge_manager import (
-    get_unanswered_questions,
-    get_answered_questions,
+    iter_questions,
     get_knowledge_stats,
     initialize_knowledge_base
 )
@@ -23,38 +22,36 @@ def show_stats():
 
 def show_unanswered():
     """Display all unanswered questions."""
-    questions = get_unanswered_questions()
-    
     print("\n" + "="*60)
     print("UNANSWERED QUESTIONS")
     print("="*60)
     
-    if not questions:
+    i = 0
+    for i, q in enumerate(iter_questions('unanswered'), 1):
+        print(f"\n{i}. Question: {q['question']}")
+        print(f"   Asked by: {q['caller_phone']}")
+        print(f"   Time: {q['timestamp']}")
+        print("-" * 60)
+    
+    if not i:
         print("No unanswered questions! 🎉")
-    else:
-        for i, q in enumerate(questions, 1):
-            print(f"\n{i}. Question: {q['question']}")
-            print(f"   Asked by: {q['caller_phone']}")
-            print(f"   Time: {q['timestamp']}")
-            print("-" * 60)
     
     print()
 
 def show_answered():
     """Display all answered questions."""
-    answered = get_answered_questions()
-    
     print("\n" + "="*60)
     print("ANSWERED QUESTIONS (Active Knowledge)")
     print("="*60)
     
-    if not answered:
+    i = 0
+    for i, row in enumerate(iter_questions('answered'), 1):
+        print(f"\n{i}. Q: {row['question']}")
+        print(f"   A: {row['answer']}")
+        print("-" * 60)
+    
+    if not i:
         print("No answered questions yet.")
-    else:
-        for i, (question, answer) in enumerate(answered.items(), 1):
-            print(f"\n{i}. Q: {question}")
-            print(f"   A: {answer}")
-            print("-" * 60)
     
     print()
 
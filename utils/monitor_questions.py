@@ -4,54 +4,76 @@ Run this in the background to get alerted when customers ask questions.
 """
 import time
 import os
-from knowledge_manager import get_unanswered_questions
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import change_feed
+from knowledge_manager import iter_questions, knowledge_file
+
+# Seconds between checks of the change feed
+POLL_INTERVAL = 1.0
+
+def show_new_questions(questions):
+    """Print an alert for newly asked questions."""
+    print("\n" + "🔔 " * 20)
+    print("🚨 NEW QUESTION ALERT! 🚨")
+    print("🔔 " * 20)
+    
+    for q in questions:
+        print(f"\n❓ Question: {q['question']}")
+        print(f"📞 From: {q['caller_phone']}")
+        print(f"⏰ Time: {q['timestamp']}")
+        print("\n⚡ CUSTOMER IS WAITING! Answer now:")
+        print(f"   python quick_answer.py")
+    
+    print("\n" + "🔔 " * 20 + "\n")
+    
+    # Try to play a beep (Windows)
+    try:
+        import winsound
+        winsound.Beep(1000, 500)  # 1000 Hz for 500ms
+    except:
+        pass
 
 def monitor_questions():
-    """Monitor for new unanswered questions."""
+    """
+    Monitor for new unanswered questions.
+    
+    Follows the knowledge base change feed, so each check only reads the
+    events written since the previous one instead of re-parsing the CSV.
+    """
     print("\n" + "="*60)
     print("📢 QUESTION MONITOR - Watching for new questions...")
     print("="*60)
     print("Keep this running to see questions as they arrive!")
     print("Press Ctrl+C to stop\n")
     
-    last_count = 0
+    # Start following before listing what's already waiting, so nothing slips in between
+    feed = change_feed.FeedReader(change_feed.feed_path(knowledge_file()))
+    waiting = list(iter_questions('unanswered'))
+    if waiting:
+        show_new_questions(waiting)
+    already_shown = {q['question'] for q in waiting}
     
     try:
         while True:
-            unanswered = get_unanswered_questions()
-            current_count = len(unanswered)
-            
-            if current_count > last_count:
-                # New question(s) arrived!
-                new_questions = unanswered[last_count:]
-                
-                print("\n" + "🔔 " * 20)
-                print("🚨 NEW QUESTION ALERT! 🚨")
-                print("🔔 " * 20)
-                
-                for q in new_questions:
-                    print(f"\n❓ Question: {q['question']}")
-                    print(f"📞 From: {q['caller_phone']}")
-                    print(f"⏰ Time: {q['timestamp']}")
-                    print("\n⚡ CUSTOMER IS WAITING! Answer now:")
-                    print(f"   python quick_answer.py")
-                
-                print("\n" + "🔔 " * 20 + "\n")
-                
-                # Try to play a beep (Windows)
-                try:
-                    import winsound
-                    winsound.Beep(1000, 500)  # 1000 Hz for 500ms
-                except:
-                    pass
+            new_questions = []
+            for event in feed.poll():
+                if event['event'] == change_feed.ADDED and event['question'] not in already_shown:
+                    new_questions.append(event)
+                elif event['event'] == change_feed.ANSWERED:
+                    print(f"✅ Answered: {event['question']}")
             
-            last_count = current_count
+            if new_questions:
+                show_new_questions(new_questions)
+            already_shown.clear()
             
-            # Check every 2 seconds
-            time.sleep(2)
+            time.sleep(POLL_INTERVAL)
             
     except KeyboardInterrupt:
         print("\n\n👋 Monitoring stopped.\n")
+    finally:
+        feed.close()
 
 if __name__ == "__main__":
     monitor_questions()
@@ -1,58 +1,24 @@
 """
 Quick answer tool - Use this to answer questions in real-time while customer is on hold.
 """
-import csv
 import sys
 import os
 
-KNOWLEDGE_FILE = "knowledge_base.csv"
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from knowledge_manager import answer_question as save_answer, get_unanswered_questions
 
 def show_waiting_questions():
     """Show questions waiting for answers."""
-    if not os.path.exists(KNOWLEDGE_FILE):
-        print("No questions yet!")
-        return []
-    
-    waiting = []
-    with open(KNOWLEDGE_FILE, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row['answered'].lower() == 'no':
-                waiting.append(row)
-    
-    return waiting
+    return get_unanswered_questions()
 
 def answer_question(question: str, answer: str):
     """Answer a specific question."""
-    if not os.path.exists(KNOWLEDGE_FILE):
-        print("Knowledge base not found!")
-        return False
-    
-    # Read all rows
-    rows = []
-    found = False
-    with open(KNOWLEDGE_FILE, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        fieldnames = reader.fieldnames
-        for row in reader:
-            if row['question'].lower().strip() == question.lower().strip():
-                row['answer'] = answer
-                row['answered'] = 'yes'
-                found = True
-                print(f"\n✅ Answered: {question}")
-                print(f"   Answer: {answer}\n")
-            rows.append(row)
-    
-    if not found:
+    if not save_answer(question, answer):
         print(f"\n❌ Question not found: {question}\n")
         return False
     
-    # Write back
-    with open(KNOWLEDGE_FILE, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(rows)
-    
+    print(f"\n✅ Answered: {question}")
+    print(f"   Answer: {answer}\n")
     return True
 
 def interactive_mode():
@@ -1,28 +1,61 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from typing import List, Dict
-import csv
-import os
 from knowledge_manager import (
+    answer_question as save_answer,
+    answer_questions,
+    delete_question as remove_question,
     get_unanswered_questions,
     get_answered_questions,
     get_knowledge_stats,
     initialize_knowledge_base
 )
-
-app = FastAPI(title="Telephony Agent Q&A Manager")
-
-KNOWLEDGE_FILE = "knowledge_base.csv"
+from answer_suggestions import get_suggestion_index
+from question_clusters import get_clusterer
+from question_priority import get_pending_queue
+from retention_sweeper import SWEEP_IN_WEB_UI, run_sweeper
+from staff_presence import presence_for
+import tenants
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Keeps the knowledge bases free of stale questions (see retention_sweeper)
+    sweeper = asyncio.create_task(run_sweeper()) if SWEEP_IN_WEB_UI else None
+    yield
+    if sweeper is not None:
+        sweeper.cancel()
+
+app = FastAPI(title="Telephony Agent Q&A Manager", lifespan=lifespan)
+
+@app.middleware("http")
+async def select_tenant(request: Request, call_next):
+    # Each salon branch has its own dashboard: /?tenant=bandra (API calls carry the same parameter)
+    tenant_id = request.query_params.get('tenant') or request.headers.get('X-Tenant')
+    tenant = tenants.get_tenant(tenant_id)
+    if tenant is None:
+        return JSONResponse(status_code=404, content={'detail': f'Unknown tenant: {tenant_id}'})
+    with tenants.use(tenant):
+        return await call_next(request)
 
 class AnswerRequest(BaseModel):
     question: str
     answer: str
 
+class ClusterAnswerRequest(BaseModel):
+    questions: List[str]
+    answer: str
+
 class DeleteRequest(BaseModel):
     question: str
 
+class PresenceRequest(BaseModel):
+    session_id: str
+
 class StatsResponse(BaseModel):
     total: int
     answered: int
@@ -34,11 +67,30 @@ class QuestionItem(BaseModel):
     answered: str
     timestamp: str
     caller_phone: str
+    state: str
+    hold_remaining: int
 
 class AnsweredItem(BaseModel):
     question: str
     answer: str
 
+class SuggestionItem(BaseModel):
+    question: str
+    answer: str
+    source: str
+    score: float
+
+class ClusterItem(BaseModel):
+    id: int
+    question: str
+    count: int
+    questions: List[str]
+    callers: List[str]
+    first_asked: str
+    state: str
+    hold_remaining: int
+    on_hold: int
+
 @app.get("/", response_class=HTMLResponse)
 async def get_ui():
     html_content = """
@@ -233,6 +285,56 @@ async def get_ui():
             border-radius: 8px;
         }
 
+        .state-badge {
+            padding: 2px 10px;
+            border-radius: 10px;
+            font-size: 0.75em;
+            font-weight: 700;
+            margin-left: 10px;
+            white-space: nowrap;
+        }
+
+        .state-on_hold { background: #fee2e2; color: #991b1b; }
+        .state-callback_pending { background: #e0f2fe; color: #075985; }
+        .state-stale { background: #f3f4f6; color: #6b7280; }
+
+        .cluster-count {
+            background: #fef3c7;
+            color: #92400e;
+            padding: 2px 10px;
+            border-radius: 10px;
+            font-size: 0.75em;
+            font-weight: 700;
+            margin-left: 10px;
+            white-space: nowrap;
+        }
+
+        .cluster-variants {
+            margin: 0 0 15px 0;
+            padding-left: 20px;
+            font-size: 0.85em;
+            color: #6b7280;
+        }
+
+        .suggestions {
+            display: flex;
+            flex-wrap: wrap;
+            gap: 8px;
+            margin-bottom: 10px;
+        }
+
+        .suggestion {
+            background: #eef2ff;
+            color: #3730a3;
+            border: 1px solid #c7d2fe;
+            border-radius: 8px;
+            padding: 6px 10px;
+            font-size: 0.8em;
+            cursor: pointer;
+            text-align: left;
+            max-width: 100%;
+        }
+
         .meta-item {
             display: flex;
             align-items: center;
@@ -511,6 +613,41 @@ async def get_ui():
 
     <script>
         const API_BASE = '';
+        const TENANT = new URLSearchParams(window.location.search).get('tenant');
+
+        function api(path) {
+            if (!TENANT) {
+                return `${API_BASE}${path}`;
+            }
+            return `${API_BASE}${path}${path.includes('?') ? '&' : '?'}tenant=${encodeURIComponent(TENANT)}`;
+        }
+        const SESSION_ID = (crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random()}`);
+
+        async function sendHeartbeat() {
+            try {
+                await fetch(api(`/api/heartbeat`), {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json'
+                    },
+                    body: JSON.stringify({ session_id: SESSION_ID })
+                });
+            } catch (error) {
+                console.error('Error sending heartbeat:', error);
+            }
+        }
+
+        window.addEventListener('beforeunload', () => {
+            const body = new Blob([JSON.stringify({ session_id: SESSION_ID })], { type: 'application/json' });
+            navigator.sendBeacon(api(`/api/leave`), body);
+        });
+
+        // Timers in background tabs can be throttled to once a minute; report in as soon as the tab is shown again
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'visible') {
+                sendHeartbeat();
+            }
+        });
 
         async function loadAllData() {
             await Promise.all([
@@ -522,7 +659,7 @@ async def get_ui():
 
         async function loadStats() {
             try {
-                const response = await fetch(`${API_BASE}/api/stats`);
+                const response = await fetch(api(`/api/stats`));
                 const stats = await response.json();
                 
                 document.getElementById('stat-total').textContent = stats.total;
@@ -533,15 +670,18 @@ async def get_ui():
             }
         }
 
+        let currentClusters = {};
+
         async function loadUnanswered() {
             try {
-                const response = await fetch(`${API_BASE}/api/unanswered`);
-                const questions = await response.json();
+                const response = await fetch(api(`/api/clusters`));
+                const clusters = await response.json();
                 
                 const container = document.getElementById('unanswered-list');
-                document.getElementById('pending-count').textContent = questions.length;
+                document.getElementById('pending-count').textContent = clusters.reduce((total, c) => total + c.count, 0);
                 
-                if (questions.length === 0) {
+                if (clusters.length === 0) {
+                    currentClusters = {};
                     container.innerHTML = `
                         <div class="empty-state">
                             <p class="empty-state-text">No pending questions!</p>
@@ -551,46 +691,58 @@ async def get_ui():
                 }
                 
                 const savedValues = {};
-                questions.forEach(q => {
-                    const textareaId = `answer-${btoa(q.question)}`;
-                    const textarea = document.getElementById(textareaId);
+                Object.keys(currentClusters).forEach(id => {
+                    const textarea = document.getElementById(`answer-cluster-${id}`);
                     if (textarea) {
-                        savedValues[textareaId] = textarea.value;
+                        savedValues[id] = textarea.value;
                     }
                 });
                 
-                container.innerHTML = questions.map(q => `
+                currentClusters = {};
+                clusters.forEach(c => { currentClusters[c.id] = c; });
+                
+                // One card per group of similar questions; one answer goes to every caller in it
+                container.innerHTML = clusters.map(c => `
                     <div class="question-card">
                         <div class="question-header">
-                            <div class="question-text">${escapeHtml(q.question)}</div>
+                            <div class="question-text">${escapeHtml(c.question)}</div>
+                            ${stateBadge(c)}
+                            ${c.count > 1 ? `<span class="cluster-count">${c.count} callers</span>` : ''}
                         </div>
+                        ${c.count > 1 ? `
+                        <ul class="cluster-variants">
+                            ${c.questions.filter(q => q !== c.question).map(q => `<li>${escapeHtml(q)}</li>`).join('')}
+                        </ul>` : ''}
                         <div class="question-meta">
                             <div class="meta-item">
                                 <span class="meta-icon"></span>
-                                <span>${q.timestamp}</span>
+                                <span>${escapeHtml(c.first_asked)}</span>
                             </div>
                             <div class="meta-item">
                                 <span class="meta-icon"></span>
-                                <span>${q.caller_phone}</span>
+                                <span>${escapeHtml(c.callers.join(', '))}</span>
                             </div>
                         </div>
-                        <textarea id="answer-${btoa(q.question)}" placeholder="Type your answer here..."></textarea>
+                        <div class="suggestions" id="suggest-${c.id}"></div>
+                        <textarea id="answer-cluster-${c.id}" placeholder="Type your answer here..."></textarea>
                         <div class="btn-group">
-                            <button class="btn btn-primary" onclick="submitAnswer('${escapeHtml(q.question)}', 'answer-${btoa(q.question)}')">
-                                Submit Answer
+                            <button class="btn btn-primary" onclick="submitClusterAnswer(${c.id})">
+                                ${c.count > 1 ? `Answer All ${c.count}` : 'Submit Answer'}
                             </button>
-                            <button class="btn btn-danger" onclick="deleteQuestion('${escapeHtml(q.question)}')">
+                            <button class="btn btn-danger" onclick="deleteCluster(${c.id})">
                             </button>
                         </div>
                     </div>
                 `).join('');
                 
-                Object.keys(savedValues).forEach(textareaId => {
-                    const textarea = document.getElementById(textareaId);
-                    if (textarea && savedValues[textareaId]) {
-                        textarea.value = savedValues[textareaId];
+                Object.keys(savedValues).forEach(id => {
+                    const textarea = document.getElementById(`answer-cluster-${id}`);
+                    if (textarea && savedValues[id]) {
+                        textarea.value = savedValues[id];
                     }
                 });
+                
+                clusters.forEach(c => showSuggestions(c));
             } catch (error) {
                 console.error('Error loading unanswered questions:', error);
                 document.getElementById('unanswered-list').innerHTML = `
@@ -601,44 +753,53 @@ async def get_ui():
             }
         }
 
-        async function loadAnswered() {
+        function stateBadge(c) {
+            if (c.state === 'on_hold') {
+                const who = c.on_hold > 1 ? `${c.on_hold} on hold` : 'On hold';
+                return `<span class="state-badge state-on_hold">${who} · ${c.hold_remaining}s left</span>`;
+            }
+            if (c.state === 'callback_pending') {
+                return `<span class="state-badge state-callback_pending">Callback pending</span>`;
+            }
+            if (c.state === 'stale') {
+                return `<span class="state-badge state-stale">Stale</span>`;
+            }
+            return '';
+        }
+
+        // Suggestions per question, fetched once rather than on every refresh
+        const suggestionCache = {};
+
+        async function showSuggestions(cluster) {
             try {
-                const response = await fetch(`${API_BASE}/api/answered`);
-                const questions = await response.json();
-                
-                const container = document.getElementById('answered-list');
-                document.getElementById('answered-count').textContent = questions.length;
-                
-                if (questions.length === 0) {
-                    container.innerHTML = `
-                        <div class="empty-state">
-                            <p class="empty-state-text">No answered questions yet</p>
-                        </div>
-                    `;
+                if (!(cluster.question in suggestionCache)) {
+                    const response = await fetch(api(`/api/suggest?question=${encodeURIComponent(cluster.question)}`));
+                    suggestionCache[cluster.question] = response.ok ? await response.json() : [];
+                }
+                const container = document.getElementById(`suggest-${cluster.id}`);
+                if (!container) {
                     return;
                 }
-                
-                container.innerHTML = questions.map(q => `
-                    <div class="answered-item">
-                        <div class="answered-question">
-                            <span class="answer-icon"></span>
-                            <span>${escapeHtml(q.question)}</span>
-                        </div>
-                        <div class="answered-answer">${escapeHtml(q.answer)}</div>
-                    </div>
+                container.innerHTML = suggestionCache[cluster.question].map((s, i) => `
+                    <button class="suggestion" title="${escapeHtml(s.question)}" onclick="useSuggestion(${cluster.id}, ${i})">
+                        ${escapeHtml(s.answer)}
+                    </button>
                 `).join('');
             } catch (error) {
-                console.error('Error loading answered questions:', error);
-                document.getElementById('answered-list').innerHTML = `
-                    <div class="empty-state">
-                        <p style="color: #dc3545;">Error loading answers</p>
-                    </div>
-                `;
+                console.error('Error loading suggestions:', error);
             }
         }
 
-        async function submitAnswer(question, textareaId) {
-            const textarea = document.getElementById(textareaId);
+        function useSuggestion(clusterId, index) {
+            const cluster = currentClusters[clusterId];
+            const textarea = document.getElementById(`answer-cluster-${clusterId}`);
+            textarea.value = suggestionCache[cluster.question][index].answer;
+            textarea.focus();
+        }
+
+        async function submitClusterAnswer(clusterId) {
+            const cluster = currentClusters[clusterId];
+            const textarea = document.getElementById(`answer-cluster-${clusterId}`);
             const answer = textarea.value.trim();
             
             if (!answer) {
@@ -647,21 +808,21 @@ async def get_ui():
             }
             
             try {
-                const response = await fetch(`${API_BASE}/api/answer`, {
+                const response = await fetch(api(`/api/clusters/answer`), {
                     method: 'POST',
                     headers: {
                         'Content-Type': 'application/json'
                     },
-                    body: JSON.stringify({ question, answer })
+                    body: JSON.stringify({ questions: cluster.questions, answer })
                 });
                 
                 const result = await response.json();
                 
                 if (result.success) {
-                    showNotification('Answer submitted successfully!', 'success');
+                    showNotification(result.message, 'success');
                     await loadAllData();
                 } else {
-                    showNotification(result.error || 'Failed to submit answer', 'error');
+                    showNotification(result.detail || 'Failed to submit answer', 'error');
                 }
             } catch (error) {
                 console.error('Error submitting answer:', error);
@@ -669,34 +830,82 @@ async def get_ui():
             }
         }
 
-        async function deleteQuestion(question) {
-            if (!confirm('Are you sure you want to delete this question?')) {
+        async function deleteCluster(clusterId) {
+            const cluster = currentClusters[clusterId];
+            const prompt = cluster.count > 1
+                ? `Are you sure you want to delete these ${cluster.count} questions?`
+                : 'Are you sure you want to delete this question?';
+            if (!confirm(prompt)) {
                 return;
             }
             
             try {
-                const response = await fetch(`${API_BASE}/api/delete`, {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({ question })
-                });
-                
-                const result = await response.json();
-                
-                if (result.success) {
+                const failed = [];
+                for (const question of cluster.questions) {
+                    try {
+                        const response = await fetch(api(`/api/delete`), {
+                            method: 'POST',
+                            headers: {
+                                'Content-Type': 'application/json'
+                            },
+                            body: JSON.stringify({ question })
+                        });
+                        if (!response.ok) {
+                            failed.push(question);
+                        }
+                    } catch (error) {
+                        failed.push(question);
+                    }
+                }
+                if (failed.length === 0) {
                     showNotification('Question deleted successfully!', 'success');
-                    await loadAllData();
                 } else {
-                    showNotification(result.error || 'Failed to delete question', 'error');
+                    console.error('Failed to delete:', failed);
+                    showNotification(`Could not delete ${failed.length} of ${cluster.questions.length}: ${failed.join('; ')}`, 'error');
                 }
+                await loadAllData();
             } catch (error) {
                 console.error('Error deleting question:', error);
                 showNotification('Error deleting question', 'error');
             }
         }
 
+        async function loadAnswered() {
+            try {
+                const response = await fetch(api(`/api/answered`));
+                const questions = await response.json();
+                
+                const container = document.getElementById('answered-list');
+                document.getElementById('answered-count').textContent = questions.length;
+                
+                if (questions.length === 0) {
+                    container.innerHTML = `
+                        <div class="empty-state">
+                            <p class="empty-state-text">No answered questions yet</p>
+                        </div>
+                    `;
+                    return;
+                }
+                
+                container.innerHTML = questions.map(q => `
+                    <div class="answered-item">
+                        <div class="answered-question">
+                            <span class="answer-icon"></span>
+                            <span>${escapeHtml(q.question)}</span>
+                        </div>
+                        <div class="answered-answer">${escapeHtml(q.answer)}</div>
+                    </div>
+                `).join('');
+            } catch (error) {
+                console.error('Error loading answered questions:', error);
+                document.getElementById('answered-list').innerHTML = `
+                    <div class="empty-state">
+                        <p style="color: #dc3545;">Error loading answers</p>
+                    </div>
+                `;
+            }
+        }
+
         function showNotification(message, type) {
             const notification = document.createElement('div');
             notification.className = `notification ${type}`;
@@ -718,7 +927,9 @@ async def get_ui():
         }
 
         setInterval(loadAllData, 5000);
+        setInterval(sendHeartbeat, 10000);
 
+        sendHeartbeat();
         loadAllData();
     </script>
 </body>
@@ -726,24 +937,72 @@ async def get_ui():
     """
     return HTMLResponse(content=html_content)
 
+# Endpoints that read or rewrite the CSV files are plain functions, run in the thread pool:
+# waiting on the knowledge base lock during an import or expiry must not stall presence heartbeats
 @app.get("/api/stats", response_model=StatsResponse)
-async def get_stats():
+def get_stats():
     stats = get_knowledge_stats()
     return stats
 
 @app.get("/api/unanswered", response_model=List[QuestionItem])
-async def get_unanswered():
-    questions = get_unanswered_questions()
-    return questions
+def get_unanswered():
+    # Questions with a caller on hold first, then callbacks, then the rest oldest first
+    return get_pending_queue().prioritize(get_unanswered_questions())
+
+@app.get("/api/clusters", response_model=List[ClusterItem])
+def get_clusters():
+    rows = get_unanswered_questions()
+    clusterer = get_clusterer()
+    clusterer.sync(rows)
+    return get_pending_queue().prioritize_clusters(clusterer.clusters(), rows)
+
+@app.post("/api/clusters/answer")
+def answer_cluster(request: ClusterAnswerRequest):
+    answer = request.answer.strip()
+    questions = [q.strip() for q in request.questions if q.strip()]
+    
+    if not questions or not answer:
+        raise HTTPException(status_code=400, detail="Questions and answer are required")
+    
+    answered = answer_questions(questions, answer)
+    if not answered:
+        raise HTTPException(status_code=404, detail="Questions not found")
+    
+    return {'success': True, 'answered': answered, 'message': f'Answer saved for {answered} questions'}
+
+@app.get("/api/suggest", response_model=List[SuggestionItem])
+def suggest_answers(question: str, k: int = 3):
+    if not question.strip():
+        raise HTTPException(status_code=400, detail="Question is required")
+    return get_suggestion_index().suggest(question, k=max(1, min(k, 10)))
+
+@app.get("/api/presence")
+async def get_presence():
+    return {'online': presence_for(tenants.current().id).count()}
+
+@app.post("/api/heartbeat")
+async def heartbeat(request: PresenceRequest):
+    presence = presence_for(tenants.current().id)
+    presence.heartbeat(request.session_id)
+    return {'success': True, 'online': presence.count()}
+
+@app.post("/api/leave")
+async def leave(request: PresenceRequest):
+    presence_for(tenants.current().id).leave(request.session_id)
+    return {'success': True}
+
+@app.get("/api/tenants")
+async def get_tenants():
+    return [{'id': t.id, 'name': t.name or t.id} for t in tenants.all_tenants()]
 
 @app.get("/api/answered", response_model=List[AnsweredItem])
-async def get_answered():
+def get_answered():
     questions = get_answered_questions()
     result = [{'question': q, 'answer': a} for q, a in questions.items()]
     return result
 
 @app.post("/api/answer")
-async def answer_question(request: AnswerRequest):
+def answer_question(request: AnswerRequest):
     try:
         question = request.question.strip()
         answer = request.answer.strip()
@@ -751,32 +1010,9 @@ async def answer_question(request: AnswerRequest):
         if not question or not answer:
             raise HTTPException(status_code=400, detail="Question and answer are required")
         
-        # Read all rows
-        rows = []
-        found = False
-        
-        if not os.path.exists(KNOWLEDGE_FILE):
-            initialize_knowledge_base()
-        
-        with open(KNOWLEDGE_FILE, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            fieldnames = reader.fieldnames
-            for row in reader:
-                if row['question'].lower().strip() == question.lower().strip():
-                    row['answer'] = answer
-                    row['answered'] = 'yes'
-                    found = True
-                rows.append(row)
-        
-        if not found:
+        if not save_answer(question, answer):
             raise HTTPException(status_code=404, detail="Question not found")
         
-        # Write back
-        with open(KNOWLEDGE_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(rows)
-        
         return {'success': True, 'message': 'Answer saved successfully'}
         
     except HTTPException:
@@ -785,38 +1021,16 @@ async def answer_question(request: AnswerRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/delete")
-async def delete_question(request: DeleteRequest):
+def delete_question(request: DeleteRequest):
     try:
         question = request.question.strip()
         
         if not question:
             raise HTTPException(status_code=400, detail="Question is required")
         
-        # Read all rows except the one to delete
-        rows = []
-        found = False
-        
-        if not os.path.exists(KNOWLEDGE_FILE):
-            raise HTTPException(status_code=404, detail="Knowledge base not found")
-        
-        with open(KNOWLEDGE_FILE, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            fieldnames = reader.fieldnames
-            for row in reader:
-                if row['question'].lower().strip() == question.lower().strip():
-                    found = True
-                    continue  # Skip this row (delete it)
-                rows.append(row)
-        
-        if not found:
+        if not remove_question(question):
             raise HTTPException(status_code=404, detail="Question not found")
         
-        # Write back
-        with open(KNOWLEDGE_FILE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(rows)
-        
         return {'success': True, 'message': 'Question deleted successfully'}
         
     except HTTPException:
@@ -826,7 +1040,9 @@ async def delete_question(request: DeleteRequest):
 
 if __name__ == "__main__":
     import uvicorn
-    initialize_knowledge_base()
+    for tenant in tenants.all_tenants():
+        with tenants.use(tenant):
+            initialize_knowledge_base()
     print("Starting Telephony Agent Q&A Manager...")
     print("📱 Open http://localhost:8000 in your browser")
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,174 @@
+"""
+Load reporting and capacity control for the agent worker.
+
+LiveKit dispatch stops sending calls to a worker whose reported load reaches
+LOAD_THRESHOLD, so the load reported here rises towards 1.0 as any of these
+saturates:
+- active calls relative to MAX_CONCURRENT_CALLS
+- machine CPU use relative to CPU_BUDGET, sampled by the worker; this
+  covers VAD inference in the calls' own processes
+- with AGENT_JOB_EXECUTOR=thread only: CPU time spent in VAD inference and
+  event-loop lag of the calls hosted in the worker process itself
+
+LiveKit calls load_fnc from a thread pool, and with the default process
+executor every call runs in its own process, whose VAD and lag samples the
+worker never sees. Those two signals are therefore only used when calls
+share the worker process.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+import loop_watchdog
+
+logger = logging.getLogger(__name__)
+
+# Calls a single worker process accepts at once
+MAX_CONCURRENT_CALLS = int(os.getenv("MAX_CONCURRENT_CALLS", "4"))
+
+# Load at which LiveKit marks the worker full; LiveKit requires it below 1.0 in production
+LOAD_THRESHOLD = float(os.getenv("WORKER_LOAD_THRESHOLD", "0.9"))
+
+# "process" runs each call in its own process, "thread" hosts calls in the worker process
+JOB_EXECUTOR = os.getenv("AGENT_JOB_EXECUTOR", "process")
+
+# Event-loop lag at which audio starts to suffer
+LOOP_LAG_BUDGET = float(os.getenv("LOOP_LAG_BUDGET_MS", "100")) / 1000
+
+# Share of the machine's cores VAD inference may use before the worker counts as full
+VAD_CPU_BUDGET = float(os.getenv("VAD_CPU_BUDGET", "0.5"))
+
+# Share of the machine's CPU in use at which the worker counts as full
+CPU_BUDGET = float(os.getenv("WORKER_CPU_BUDGET", "0.8"))
+
+# Seconds of history considered for CPU, VAD time and loop lag
+WINDOW_SECONDS = 10
+
+# Samples kept per signal, whatever the window holds (loop lag alone arrives 20 times a second)
+MAX_SAMPLES = 1000
+
+# Seconds each CPU sample is measured over
+CPU_SAMPLE_SECONDS = 0.5
+
+
+class WorkerLoad:
+    """Collects load signals of the worker and of the calls hosted in its process."""
+
+    def __init__(self, in_process: bool = JOB_EXECUTOR == "thread"):
+        """
+        Args:
+            in_process: Whether calls run in this process, so their VAD and lag samples count
+        """
+        self.in_process = in_process
+        self._lock = threading.Lock()
+        self._vad_samples: Deque[Tuple[float, float]] = deque(maxlen=MAX_SAMPLES)
+        self._lag_samples: Deque[Tuple[float, float]] = deque(maxlen=MAX_SAMPLES)
+        self._cpu_samples: Deque[Tuple[float, float]] = deque(maxlen=MAX_SAMPLES)
+        self._cpu_thread: Optional[threading.Thread] = None
+        # Calls running, as last seen by load(), plus calls accepted since
+        self.active_calls = 0
+        self.accepted = 0
+
+    def _prune(self, samples: Deque[Tuple[float, float]], now: float) -> None:
+        while samples and samples[0][0] < now - WINDOW_SECONDS:
+            samples.popleft()
+
+    def record_metrics(self, metrics) -> None:
+        """Feed a metrics_collected payload from an AgentSession; only VAD metrics are used."""
+        if not self.in_process or type(metrics).__name__ != "VADMetrics":
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._vad_samples.append((now, metrics.inference_duration_total))
+            self._prune(self._vad_samples, now)
+
+    def record_lag(self, lag_seconds: float) -> None:
+        if not self.in_process:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._lag_samples.append((now, lag_seconds))
+            self._prune(self._lag_samples, now)
+
+    def _sample_cpu(self) -> None:
+        from livekit.agents.utils.hw import get_cpu_monitor
+
+        monitor = get_cpu_monitor()
+        while True:
+            share = monitor.cpu_percent(interval=CPU_SAMPLE_SECONDS)
+            now = time.monotonic()
+            with self._lock:
+                self._cpu_samples.append((now, share))
+                self._prune(self._cpu_samples, now)
+
+    def cpu_share(self) -> float:
+        """Average share of the machine's CPU in use over the window (sampled from the first call on)."""
+        with self._lock:
+            if self._cpu_thread is None:
+                self._cpu_thread = threading.Thread(target=self._sample_cpu, name="worker-cpu-load", daemon=True)
+                self._cpu_thread.start()
+            self._prune(self._cpu_samples, time.monotonic())
+            if not self._cpu_samples:
+                return 0.0
+            return sum(share for _, share in self._cpu_samples) / len(self._cpu_samples)
+
+    def vad_cpu_share(self) -> float:
+        """Fraction of all cores spent in VAD inference over the window."""
+        now = time.monotonic()
+        with self._lock:
+            self._prune(self._vad_samples, now)
+            busy = sum(duration for _, duration in self._vad_samples)
+        return busy / (WINDOW_SECONDS * (os.cpu_count() or 1))
+
+    def loop_lag(self) -> float:
+        """Worst event-loop lag over the window, in seconds."""
+        now = time.monotonic()
+        with self._lock:
+            self._prune(self._lag_samples, now)
+            return max((lag for _, lag in self._lag_samples), default=0.0)
+
+    def watch_loop(self) -> loop_watchdog.LoopWatchdog:
+        """Start measuring lag on the running event loop (once per loop)."""
+        return loop_watchdog.watch(on_lag=self.record_lag)
+
+    def load(self, active_calls: int) -> float:
+        """Combined load in [0, 1]."""
+        with self._lock:
+            self.active_calls = active_calls
+            # Calls accepted before this are now among the active ones
+            self.accepted = 0
+        components = {
+            'calls': active_calls / max(1, MAX_CONCURRENT_CALLS),
+            'cpu': self.cpu_share() / CPU_BUDGET,
+        }
+        if self.in_process:
+            components['vad'] = self.vad_cpu_share() / VAD_CPU_BUDGET
+            components['loop_lag'] = self.loop_lag() / LOOP_LAG_BUDGET
+        load = min(1.0, max(components.values()))
+        logger.debug(f"Worker load {load:.2f}: {components}")
+        return load
+
+
+# Shared by the worker and every call hosted in this process
+worker_load = WorkerLoad()
+
+
+def compute_load(server) -> float:
+    """load_fnc for WorkerOptions; LiveKit calls it from a thread pool."""
+    return worker_load.load(len(server.active_jobs))
+
+
+async def request_fnc(request) -> None:
+    """request_fnc for WorkerOptions: refuse calls beyond MAX_CONCURRENT_CALLS."""
+    with worker_load._lock:
+        calls = worker_load.active_calls + worker_load.accepted
+        if calls < MAX_CONCURRENT_CALLS:
+            worker_load.accepted += 1
+    if calls >= MAX_CONCURRENT_CALLS:
+        logger.warning(f"At capacity ({calls} calls), rejecting job {request.id}")
+        await request.reject()
+        return
+    await request.accept()